@@ -4,30 +4,43 @@ from fastapi.responses import StreamingResponse, FileResponse, JSONResponse
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 import uvicorn
+import asyncio
 import os
 import json
 import tempfile
 import io
 import re
-import uuid
 import time
-import random
 import pandas as pd
-from typing import Any
 import subprocess
 import sys
 import traceback
-try:
-    from curl_cffi.requests import AsyncSession
-    curl_cffi_installed = True
-except ImportError:
-    curl_cffi_installed = False   
-    AsyncSession = None   
-from utils.llm_client import call_llm, call_llm_stream, acall_llm, acall_llm_stream
-from utils.file_parser import parse_file
+from contextlib import aclosing, asynccontextmanager
+from utils.llm_client import acall_llm, acall_llm_stream
+from utils.llm_cache import response_cache
+from utils.http_pool import http_pools
+from utils.llm_ratelimit import rate_limiters
+from utils import llm_hedge
+from utils.prompt_cache import prompt_cache_stats
+from utils.llm_metrics import EndpointLabelMiddleware, llm_metrics
+from utils.file_parser import parse_file, shutdown_pdf_pool
 from utils.chat_analyzer import analyze_chat_style
+from utils.chat_context import fit_messages
+from utils.sse import SSE_HEADERS, format_event, sse_stream
+from utils.batch import BatchRun, active_batches
+from utils.search_cache import search_cache
+from utils.search_http import search_sessions
+from utils.search_health import engine_health
+from utils.search_prefetch import search_prefetcher
+from utils.search_query import canonical_query
+from utils.search_deep import deep_answer_messages, fetch_sources, format_references, page_fetcher
+from utils.web_search import ResultMerger, fan_out_search, resolve_dependencies, shutdown_ddg_pool, stream_search
+from config import (
+    BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, BATCH_MAX_JOBS, CHAT_CONTEXT_STRATEGY, SEARCH_DEADLINE,
+    SEARCH_DEEP_DEADLINE, SEARCH_DEEP_MAX_TOP_K, SEARCH_DEEP_TOKEN_BUDGET, SEARCH_DEEP_TOP_K, SEARCH_NEAR_DUPLICATES,
+)
 from utils.local_scanner import scan_qq_logs
 
 # ── Default config from environment variables (keep API key on server side) ──
@@ -39,8 +52,42 @@ def resolve_api_key(key: str) -> str:
     """当前端未提供 API Key 时，回退到环境变量中的默认值。"""
     return key.strip() if key and key.strip() else DEFAULT_API_KEY
 
+def llm_stream_response(chunks, stream_format: str = "text", usage: dict | None = None,
+                        headers: dict | None = None) -> StreamingResponse:
+    """将 LLM 文本流包装为纯文本（默认，兼容旧前端）或 SSE 事件流。"""
+    if stream_format == "sse":
+        return StreamingResponse(
+            sse_stream(chunks, usage=usage),
+            media_type="text/event-stream",
+            headers={**SSE_HEADERS, **(headers or {})},
+        )
+
+    async def event_generator():
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except Exception as e:
+            yield f"Error: {str(e)}"
+
+    return StreamingResponse(event_generator(), media_type="text/plain", headers=headers)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动 / 关闭 LLM 上游长连接池、搜索会话、预取任务与搜索线程池。"""
+    await http_pools.start()
+    search_deps, _ = resolve_dependencies()
+    await search_sessions.start(search_deps)
+    try:
+        yield
+    finally:
+        await http_pools.aclose()
+        await search_prefetcher.aclose()
+        await search_sessions.aclose()
+        shutdown_ddg_pool()
+        shutdown_pdf_pool()
+
 # Initialize FastAPI app
-app = FastAPI(title="Office AI Mate API", version="2.0", description="By 昨夜提灯看雪")
+app = FastAPI(title="Office AI Mate API", version="2.0", description="By 昨夜提灯看雪", lifespan=lifespan)
 
 # Enable CORS (Cross-Origin Resource Sharing)
 app.add_middleware(
@@ -49,8 +96,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[
+        "X-Context-Tokens-Sent", "X-Context-Tokens-Saved", "X-Context-Dropped-Messages", "X-Batch-Id",
+        "X-Deep-Sources", "X-Deep-Fetch-Ms", "X-Deep-Extract-Ms",
+    ],
 )
 
+# Label LLM call metrics with the API path that triggered them
+app.add_middleware(EndpointLabelMiddleware)
+
 # Global Exception Handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
@@ -69,6 +123,14 @@ class SearchRequest(BaseModel):
     model: str = "gpt-3.5-turbo" 
     api_key: str = ""
     base_url: str | None = None
+    collapse_duplicates: bool = SEARCH_NEAR_DUPLICATES  # Fold mirrored / reposted results (MinHash)
+
+class SearchStreamRequest(SearchRequest):
+    stream_format: str = "ndjson"  # "ndjson" (one JSON event per line) | "sse" (Server-Sent Events)
+
+class DeepSearchRequest(SearchRequest):
+    top_k: int = Field(SEARCH_DEEP_TOP_K, ge=1, le=SEARCH_DEEP_MAX_TOP_K)  # Result pages fetched and read in full
+    stream_format: str = "text"  # "text" (raw deltas) | "sse" (Server-Sent Events)
 
 class ChatRequest(BaseModel):
     messages: list[dict]
@@ -76,6 +138,9 @@ class ChatRequest(BaseModel):
     model: str = "google/gemini-2.0-flash-exp:free"
     api_key: str = ""
     base_url: str | None = None
+    stream_format: str = "text"  # "text" (raw deltas) | "sse" (Server-Sent Events)
+    context_budget: int | None = None  # Max prompt tokens (defaults to CHAT_CONTEXT_BUDGET)
+    context_strategy: str = CHAT_CONTEXT_STRATEGY  # "truncate" | "summarize"
 
 class PPTRequest(BaseModel):
     topic: str
@@ -95,6 +160,7 @@ class CreativeRequest(BaseModel):
     model: str = "gpt-3.5-turbo"
     api_key: str = ""
     base_url: str | None = None
+    stream_format: str = "text"  # "text" (raw deltas) | "sse" (Server-Sent Events)
 
 class CodeRequest(BaseModel):
     task: str
@@ -104,9 +170,14 @@ class CodeRequest(BaseModel):
     model: str = "gpt-3.5-turbo"
     api_key: str = ""
     base_url: str | None = None
+    stream_format: str = "text"  # "text" (raw deltas) | "sse" (Server-Sent Events)
 
 
 
+class BatchRequest(BaseModel):
+    jobs: list[CreativeRequest | CodeRequest]
+    concurrency: int = BATCH_CONCURRENCY  # Capped at BATCH_MAX_CONCURRENCY
+
 class SystemRequest(BaseModel):
     query: str
     provider: str = "OpenRouter"
@@ -130,11 +201,6 @@ class SystemExecuteRequest(BaseModel):
     code: str
 
 
-# --- Global Search Cache ---
-# Format: { "query_str": { "ts": timestamp, "results": [list_of_dicts] } }
-SEARCH_CACHE = {}
-CACHE_TTL = 600 # 10 minutes
-
 # --- API Endpoints ---
 
 @app.get("/api/health")
@@ -150,383 +216,151 @@ async def get_defaults():
         "has_default_key": bool(DEFAULT_API_KEY)
     }
 
+@app.get("/api/search/cache/stats")
+async def search_cache_stats():
+    """返回搜索结果缓存的命中率、淘汰次数与内存占用。"""
+    return search_cache.stats()
+
+@app.get("/api/search/prefetch/stats")
+async def search_prefetch_stats():
+    """返回搜索后台预取任务的计数。"""
+    return search_prefetcher.stats()
+
+@app.get("/api/search/engines/stats")
+async def search_engine_stats():
+    """返回各搜索引擎的熔断状态、健康分、成功率与延迟（按健康分排序）。"""
+    return engine_health.stats()
+
+@app.get("/api/search/deep/stats")
+async def search_deep_stats():
+    """返回深度搜索网页抓取的计数与限流状态。"""
+    return page_fetcher.stats()
+
+@app.get("/api/search/pool/stats")
+async def search_pool_stats():
+    """返回搜索引擎长连接会话的状态与请求数。"""
+    return search_sessions.stats()
+
+@app.get("/api/llm/cache/stats")
+async def llm_cache_stats():
+    """返回 LLM 响应缓存的命中 / 未命中统计。"""
+    return response_cache.stats()
+
+@app.get("/api/llm/pool/stats")
+async def llm_pool_stats():
+    """返回 LLM 上游连接池的连接复用统计。"""
+    return http_pools.stats()
+
+@app.get("/api/llm/ratelimit/stats")
+async def llm_ratelimit_stats():
+    """返回各 provider 限流器的排队深度、并发上限与 429 计数。"""
+    return rate_limiters.stats()
+
+@app.get("/api/llm/hedge/stats")
+async def llm_hedge_stats():
+    """返回对冲策略配置（不含 API Key）及对冲 / 故障转移计数。"""
+    policy = llm_hedge.hedge_policy
+    return {
+        "enabled": policy is not None,
+        "secondary": {k: v for k, v in policy.items() if k != "api_key"} if policy else None,
+        **llm_hedge.hedge_stats,
+    }
+
+@app.get("/api/llm/prompt-cache/stats")
+async def llm_prompt_cache_stats():
+    """返回各 provider / 模型的提示词缓存读取与写入 token 统计。"""
+    return prompt_cache_stats.stats()
+
+@app.get("/api/llm/metrics")
+async def llm_call_metrics(provider: str | None = None, model: str | None = None):
+    """返回按 provider / 模型 / 端点聚合的调用耗时、TTFT、token 间隔与生成速度直方图。"""
+    return {"series": llm_metrics.stats(provider=provider, model=model)}
+
+async def cached_search_page(request: SearchRequest):
+    """查搜索缓存（规范化查询，可近似命中；当前页正在预取时等待）。
+
+    返回 (缓存键, 缓存结果, 可直接返回的当前页或 None)。第 1 页缓存不足一页时视为未命中：
+    重新搜索并以本次查询替换该条目。
+    """
+    # Keyed by the canonical query (case / width / whitespace / traditional-simplified folded);
+    # a near-identical recent query may be served instead (cache_key is then that query's key)
+    query_key = canonical_query(request.query)
+    cache_key, cached = search_cache.lookup(query_key)
+    # A background prefetch may be fetching exactly this page: wait for it instead of racing it
+    if await search_prefetcher.wait_for_page(cache_key, request.page, SEARCH_DEADLINE):
+        cached = search_cache.peek(cache_key)
+
+    if cached:
+        start_idx = (request.page - 1) * request.max_results
+        end_idx = start_idx + request.max_results
+
+        # If we have enough items in cache, return them
+        if len(cached) >= end_idx:
+            print(f"INFO: Serving Page {request.page} from CACHE ({len(cached)} items cached)")
+            schedule_search_prefetch(request, cache_key)
+            return cache_key, cached, list(cached[start_idx:end_idx])
+        print(f"INFO: Cache exhausted for Page {request.page} (only {len(cached)} items). Will try to fetch more.")
+        if request.page == 1:
+            return query_key, None, None  # too short to serve page 1: search again and replace it
+    return cache_key, cached, None
+
+def search_needed_count(request: SearchRequest, page: int) -> int:
+    # Page 1 over-fetches (60) from DuckDuckGo to warm the cache for the following pages.
+    start_index = (page - 1) * request.max_results
+    return 60 if page == 1 else (start_index + request.max_results + 5)
+
+async def fetch_search_page(request: SearchRequest, key: str, page: int, cached: tuple[dict, ...] | None):
+    """向各引擎查询一页结果（排除该查询已缓存的结果），新结果追加到缓存条目 key。"""
+    deps, _ = resolve_dependencies()
+    results, errors = await fan_out_search(
+        deps, request.query, page, request.max_results, search_needed_count(request, page),
+        exclude=cached or (), near_duplicates=request.collapse_duplicates,
+    )
+    if cached:
+        # New items extend the cached list (copy-on-write) so later pages can be served from it
+        search_cache.extend(key, results)
+    return results, errors
+
+def schedule_search_prefetch(request: SearchRequest, key: str):
+    """在后台预取当前页之后的几页，写入搜索缓存条目 key。"""
+    async def fetch(page: int):
+        cached = search_cache.peek(key)
+        if cached is None:
+            return []
+        results, _ = await fetch_search_page(request, key, page, cached)
+        return results
+
+    search_prefetcher.schedule(key, request.max_results, request.page + 1, fetch)
+
 @app.post("/api/search")
 async def search(request: SearchRequest, raw_request: Request):
     print(f"INFO: Search Request: {request.query} (Page {request.page})")
     print(f"DEBUG: Processing Page {request.page} with Max Results {request.max_results}")
     optimized_query = request.query
-    optimized_query = request.query
-    
-    # --- Cache Lookup ---
-    # Clean old cache
-    current_time = time.time()
-    # Create list of keys to remove first to avoid runtime error
-    keys_to_remove = [k for k, v in SEARCH_CACHE.items() if current_time - v['ts'] > CACHE_TTL]
-    for k in keys_to_remove:
-        del SEARCH_CACHE[k]
-
-    cached_data = SEARCH_CACHE.get(optimized_query)
-    
-    # If loading more (page > 1) and we have cache, try to serve from it
-    if request.page > 1 and cached_data:
-        start_idx = (request.page - 1) * request.max_results
-        end_idx = start_idx + request.max_results
-        
-        # If we have enough items in cache, return them
-        if len(cached_data['results']) >= end_idx:
-            print(f"INFO: Serving Page {request.page} from CACHE ({len(cached_data['results'])} items cached)")
-            return {"results": cached_data['results'][start_idx:end_idx], "optimized_query": optimized_query}
-        else:
-             print(f"INFO: Cache exhausted for Page {request.page} (only {len(cached_data['results'])} items). Will try to fetch more.")
-             # We let it fall through to fetch more, but we should carry over existing results to filter duplicates?
-             # Simple approach: just try to fetch new items and APPEPEND to cache?
-             pass 
-
-    results = []
-    errors = []
-    seen_urls = set()
-    
-    # Pre-fill seen_urls from cache if expanding
-    if cached_data:
-        for r in cached_data['results']:
-            seen_urls.add(r['href'])
-
-    # helper
-    def add_result(title, href, body):
-        if not href or href in seen_urls: return
-        # Filter relative links that accidentally got through
-        if not href.startswith("http"): return 
-        
-        # Deduplicate by title similarity (simple)
-        for r in results:
-            if r['title'] == title.strip(): return
-        
-        # Also check against cache if we are extending it
-        if cached_data:
-             for r in cached_data['results']:
-                 if r['title'] == title.strip(): return
-
-        seen_urls.add(href)
-        item = {
-            "title": title.strip(),
-            "href": href.strip(),
-            "body": body.strip()
-        }
-        results.append(item)
-        if cached_data:
-             cached_data['results'].append(item)
-
-    # --- 0. Dependency Check ---
-    global curl_cffi_installed
-    global AsyncSession
-    httpx_module = None
-    bs4_module = None
-    ddgs_module = None 
-    
-    # Try Import All
-    try:
-        import httpx
-        from bs4 import BeautifulSoup
-        from duckduckgo_search import DDGS
-        httpx_module = httpx
-        bs4_module = BeautifulSoup
-        ddgs_module = DDGS
-        
-        # If curl_cffi was already installed but not yet imported in this thread
-        if not curl_cffi_installed:
-            try:
-                import curl_cffi.requests
-                AsyncSession = curl_cffi.requests.AsyncSession
-                curl_cffi_installed = True
-            except ImportError:
-                pass
-                
-    except ImportError:
-        pass
-
-    # Forced Install if anyone is missing
-    if not (httpx_module and bs4_module and curl_cffi_installed and ddgs_module):
-        print("DEBUG: Missing critical dependencies, attempting auto-install...")
-        try:
-            import sys
-            import subprocess
-            print("INFO: Installing curl_cffi, httpx, beautifulsoup4, duckduckgo-search...")
-            subprocess.check_call([sys.executable, "-m", "pip", "install", "curl_cffi", "httpx", "beautifulsoup4", "duckduckgo-search"])
-            import httpx
-            from bs4 import BeautifulSoup
-            import curl_cffi.requests
-            from duckduckgo_search import DDGS
-            
-            httpx_module = httpx
-            bs4_module = BeautifulSoup
-            AsyncSession = curl_cffi.requests.AsyncSession
-            curl_cffi_installed = True
-            ddgs_module = DDGS
-        except Exception as install_e:
-            err_msg = f"Dependency Install Failed: {install_e}"
-            print(f"ERROR: {err_msg}")
-            errors.append(err_msg)
-
-
-    # Random User-Agent Pool (High Quality Real UAs)
-    USER_AGENTS_POOL = [
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
-        "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:123.0) Gecko/20100101 Firefox/123.0",
-        "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-    ]
-
-    # Base Headers
-    BASE_HEADERS = {
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
-        "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-        "Accept-Encoding": "gzip, deflate, br",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "User-Agent": USER_AGENTS_POOL[0]  # Ensure a default UA is present
-    }
-    
-    # --- Helper: Generic Parser ---
-    def generic_parse(html, source_name):
-        soup = bs4_module(html, "html.parser")
-        found = []
-        
-        # 1. Try Common Search Result Containers
-        # Baidu: .result, .c-container, .new-pmd
-        # Sogou: .vrwrap, .rb, .result
-        # 360: .res-list, .result
-        # Bing: .b_algo
-        potential_items = soup.select(".result, .c-result, .c-container, .vrwrap, .rb, .res-list, .b_algo, .lib-box, li")
-        
-        for item in potential_items:
-            # Title is usually in h3 > a or h2 > a
-            title_tag = item.select_one("h3 a, h2 a, h3, h2")
-            if not title_tag: continue
-            
-            # If title tag is h3/h2 itself, check if it has 'a' child, or text
-            if title_tag.name in ['h3', 'h2']:
-                if title_tag.find('a'):
-                    title_tag = title_tag.find('a')
-                else:
-                    # Sometimes the h3 itself is usable? No, usually needs a link.
-                    continue
-
-            link = title_tag.get("href", "")
-            if not link or link.startswith("javascript") or link == "#": continue
-            
-            title = title_tag.get_text(strip=True)
-            if not title: continue
-
-            # Body/Snippet
-            snippet_cat = item.select_one(".c-abstract, .text-layout, .res-desc, .b_caption p, .b_snippet, .content-right_8Zs40, .ft, p")
-            body = snippet_cat.get_text(strip=True) if snippet_cat else ""
-            
-            # Fix Relative Links
-            if source_name == "Sogou" and link.startswith("/link"): link = "https://www.sogou.com" + link
-            if source_name == "Baidu" and link.startswith("/"): link = "https://www.baidu.com" + link
-            
-            found.append({'title': title, 'href': link, 'body': body})
-            
-        return found
-
-    # --- 0.5. DuckDuckGo (Priority, Robust Multi-Backend) ---
-    # DDGS has multiple backends (api, html, lite). If one fails (e.g. rate limit), try others.
-    # We fetch a large batch (60 items) to cover pages 1-6 if possible.
-    
-    start_index = (request.page - 1) * request.max_results
-    # If page 1, we try to fetch 60 (cache warm up). If page > 1, we fetch what we need.
-    needed_count = 60 if request.page == 1 else (start_index + request.max_results + 5)
-    
-    if ddgs_module:
-        ddg_backends = ['api', 'html', 'lite']
-        ddg_success = False
-        
-        for backend in ddg_backends:
-            if ddg_success: break
-            try:
-                print(f"INFO: Trying DuckDuckGo (Backend: {backend}) for '{optimized_query}' (Need {needed_count})...")
-                with ddgs_module() as ddgs:
-                    ddgs_results = ddgs.text(
-                        optimized_query, 
-                        region='wt-wt', 
-                        safesearch='moderate', 
-                        timelimit='y', 
-                        max_results=needed_count,
-                        backend=backend
-                    )
-                    
-                    if ddgs_results:
-                        valid_items_found = 0
-                        # Manually slice for pagination correctness
-                        current_idx = 0
-                        
-                        # Store all results in cache if page 1
-                        all_found_items = []
-
-                        for r in ddgs_results:
-                            item_title = r.get('title', '')
-                            item_href = r.get('href', '')
-                            item_body = r.get('body', '')
-                            
-                            if not item_href: continue
-
-                            # Collect everything for cache
-                            all_found_items.append({
-                                "title": item_title,
-                                "href": item_href,
-                                "body": item_body
-                            })
-
-                            # Process for current page return
-                            current_idx += 1
-                            if current_idx <= start_index: continue # Skip previous pages
-                            
-                            add_result(item_title, item_href, item_body)
-                            if len(results) >= request.max_results: 
-                                # Don't break here, we want to finish collecting for cache if page 1? 
-                                # Actually, add_result adds to 'results' list which is returned.
-                                # But we also have 'SEARCH_CACHE' logic below.
-                                # To keep it simple: just fill 'results' for NOW, and let existing Cache Logic handle the rest.
-                                pass 
-                        
-                        if results:
-                            ddg_success = True
-                            print(f"INFO: DuckDuckGo ({backend}) success. Found {len(results)} items for current page.")
-                            
-                        # If we fetched a lot (Page 1), ensure we pass them to the cache logic
-                        # The existing cache logic uses `results` list. 
-                        # IF we are on page 1, `add_result` will populate `results`.
-                        # But `add_result` stops adding to `results` once `request.max_results` is reached due to the check I removed above?
-                        # Wait, I removed the break above to allow collecting more for cache?
-                        # No, `add_result` doesn't check limit. The calling loop usually checked `if len(results) >= max: break`.
-                        
-            except Exception as ddg_e:
-                 print(f"WARN: DuckDuckGo ({backend}) failed: {ddg_e}")
-                 errors.append(f"DDG-{backend}: {str(ddg_e)}")
-    
-    # Prune results to max_results if we over-fetched for cache purposes
-    # (Only needed if I removed the break logic)
-    # Actually, let's keep the break logic in the loop for the *response* results, 
-    # but we might want to populate cache with MORE.
-    # The current Architecture makes it hard to decouple "response" from "cache population" without big refactor.
-    # Let's stick to: "Fetch what we need, return what we need". 
-    # The cache will naturally build up if we fetch 60 and add them to `results`? 
-    # NO, `results` is what is returned to user.
-    
-    # Correct Logic:
-    # 1. We have `results` list which goes to user.
-    # 2. We have `SEARCH_CACHE` which stores *everything*.
-    # 3. `add_result` appends to BOTH `results` (unconditionally?) and `SEARCH_CACHE['results']`.
-    # 4. Wait, `add_result` does: `results.append(...)`, `if cached_data: cached_data['results'].append(...)`.
-    
-    # So if we want to populate cache with 60 items but only return 10 to user:
-    # We should NOT break the loop. We should iterate all 60.
-    # BUT `results` will grow to 60.
-    # So at the END of the function, we must slice `results` before returning.
-    # The existing code at the bottom does: `final_results = results[:request.max_results]` if Page 1.
-    # PERFECT. So we just need to NOT break the loop.
-
-
-    # --- 1. Bing Global (Priority Fallback) ---
-    if len(results) < request.max_results and bs4_module:
-        try:
-            page = int(request.page)
-            first = (page - 1) * 10 + 1
-            params = {"q": optimized_query, "first": first, "count": 10, "setmkt": "en-US"}
-            print(f"DEBUG: Bing Params: {params}")
-            headers = BASE_HEADERS.copy()
-            # headers["User-Agent"] = ... # Already in BASE_HEADERS
-            
-            resp_text = ""
-            if curl_cffi_installed:
-                try:
-                    async with AsyncSession(impersonate="chrome120", verify=False, timeout=15) as client:
-                        resp = await client.get("https://www.bing.com/search", params=params, headers=headers)
-                        resp_text = resp.text
-                except Exception as cf_e:
-                     errors.append(f"Bing (curl_cffi error): {str(cf_e)}")
-
-            if not resp_text and httpx_module:
-                headers["User-Agent"] = random.choice(USER_AGENTS_POOL)
-                async with httpx_module.AsyncClient(timeout=10, verify=False) as client:
-                    resp = await client.get("https://www.bing.com/search", params=params, headers=headers)
-                    resp_text = resp.text
-
-            if resp_text:
-                items = generic_parse(resp_text, "Bing")
-                for item in items:
-                    add_result(item['title'], item['href'], item['body'])
-                    if len(results) >= request.max_results: break
-                if not results:
-                     errors.append(f"Bing: No results (Len: {len(resp_text)})")
-            else:
-                errors.append("Bing: No response text")
-                 
-        except Exception as e:
-            errors.append(f"Bing: {str(e)}")
-
-    # --- 2. Baidu (Fallback) ---
-    if len(results) < request.max_results and bs4_module:
-        try:
-            time.sleep(random.uniform(0.5, 1.5))
-            page = request.page
-            params: dict[str, Any] = {"wd": optimized_query}
-            headers = BASE_HEADERS.copy()
-            headers["Host"] = "www.baidu.com"
-            if page > 1: params["pn"] = (page - 1) * 10
-            
-            resp_text = ""
-            if curl_cffi_installed:
-                try:
-                    async with AsyncSession(impersonate="chrome120", verify=False, timeout=10) as client:
-                        resp = await client.get("https://www.baidu.com/s", params=params, headers=headers)
-                        resp_text = resp.text
-                except Exception as cf_e:
-                    errors.append(f"Baidu (curl_cffi error): {str(cf_e)}")
-            
-            # Fallback to httpx if curl_cffi failed or not installed
-            if not resp_text and httpx_module:
-                headers["User-Agent"] = random.choice(USER_AGENTS_POOL)
-                async with httpx_module.AsyncClient(timeout=6, verify=False) as client:
-                    resp = await client.get("https://www.baidu.com/s", params=params, headers=headers)
-                    resp_text = resp.text
-
-            if len(resp_text) > 2000:
-                items = generic_parse(resp_text, "Baidu")
-                if items:
-                    for item in items:
-                        add_result(item['title'], item['href'], item['body'])
-                        if len(results) >= request.max_results: break
-                else:
-                    errors.append(f"Baidu: Parsed 0 items (Len: {len(resp_text)})")
-            elif resp_text:
-                snippet = resp_text[:100].replace("\n", " ")
-                errors.append(f"Baidu: Blocked (Len: {len(resp_text)}, Content: {snippet}...)")
-            else:
-                errors.append("Baidu: No response text")
-
-        except Exception as e:
-            errors.append(f"Baidu (General): {str(e)}")
 
-        except Exception as e:
-             errors.append(f"Bing: {str(e)}")
+    # --- Cache Lookup ---
+    cache_key, cached, page_results = await cached_search_page(request)
+    if page_results is not None:
+        return {"results": page_results, "original_query": request.query, "optimized_query": optimized_query}
 
+    # --- 0. Dependencies (imported once, cached; missing ones are reported as errors) ---
+    _, errors = resolve_dependencies()
 
+    # --- 1. Query all engines concurrently ---
+    results, engine_errors = await fetch_search_page(request, cache_key, request.page, cached)
+    errors.extend(engine_errors)
 
-    # --- 5. Error Reporting ---
+    # --- 2. Error Reporting ---
     if not results:
         all_errors = "; ".join(errors)
         print(f"ERROR: All search attempts failed. {all_errors}")
-        
+
         friendly_body = "搜索服务暂不可用 (所有引擎均失败)"
         if "No results" in all_errors:
              friendly_body += " - 访问成功但无法解析内容 (反爬/验证码)"
-        if "timeout" in all_errors or "ConnectError" in all_errors:
+        if "timeout" in all_errors or "ConnectError" in all_errors or "Deadline" in all_errors:
              friendly_body += " - 网络连接问题"
-             
+
         results.append({
             "title": "❌ 搜索失败",
             "href": "#",
@@ -534,23 +368,126 @@ async def search(request: SearchRequest, raw_request: Request):
         })
 
     # --- Cache Save (New Search) ---
-    if request.page == 1 and results:
-        SEARCH_CACHE[optimized_query] = {
-            "ts": time.time(),
-            "results": results # these are all results fetched (up to 50)
-        }
-        # Return only the requested amount for the first page
-        final_results = results[:request.max_results]
-        return {"results": final_results, "original_query": request.query, "optimized_query": optimized_query}
-    
-    # --- Cache Update (Appended) ---
-    if request.page > 1 and results:
-        # results now contains ONLY new items found during this fetch (because add_result filters against cache)
-        # Note: add_result ALREADY appended to cached_data['results'] in place if cached_data existed
-        # So we just need to return the new items.
-         return {"results": results[:request.max_results], "original_query": request.query, "optimized_query": optimized_query}
+    if results[0]["href"] != "#":
+        if request.page == 1:
+            search_cache.set(cache_key, results)  # all results fetched (up to 60)
+        schedule_search_prefetch(request, cache_key)
+
+    # Return only the requested amount
+    return {"results": results[:request.max_results], "original_query": request.query, "optimized_query": optimized_query}
+
+def search_event(stream_format: str, event: str, data: dict) -> str:
+    """编码一个流式搜索事件：NDJSON 一行一个 JSON（event 字段为事件名），或 SSE 事件。"""
+    if stream_format == "sse":
+        return format_event(event, data)
+    return json.dumps({"event": event, **data}, ensure_ascii=False) + "\n"
+
+@app.post("/api/search/stream")
+async def search_stream(request: SearchStreamRequest):
+    """流式搜索：每个引擎返回后立即推送其中新增的去重结果（results 事件），引擎失败推送 error 事件，
+    最后推送 done 事件（按融合得分重新排序后的本页结果与全部错误诊断）。"""
+    print(f"INFO: Streaming Search Request: {request.query} (Page {request.page})")
+    fmt = request.stream_format
+    started = time.perf_counter()
+    cache_key, cached, page_results = await cached_search_page(request)
+
+    def elapsed_ms() -> float:
+        return round((time.perf_counter() - started) * 1e3, 1)
+
+    async def events():
+        if page_results is not None:
+            yield search_event(fmt, "results", {"engine": "cache", "results": page_results, "elapsed_ms": elapsed_ms()})
+            yield search_event(fmt, "done", {"results": page_results, "errors": [], "cached": True, "elapsed_ms": elapsed_ms()})
+            return
+
+        deps, errors = resolve_dependencies()
+        merger = ResultMerger(cached or (), near_duplicates=request.collapse_duplicates)
+        sent = 0
+        stream = stream_search(
+            deps, request.query, request.page, request.max_results, search_needed_count(request, request.page),
+            merger, errors,
+        )
+        async with aclosing(stream):
+            async for engine, added, error in stream:
+                if error is not None:
+                    yield search_event(fmt, "error", {"engine": engine, "error": error, "elapsed_ms": elapsed_ms()})
+                    continue
+                # Stream at most one page; the final ranking comes with the done event
+                added = added[:max(request.max_results - sent, 0)]
+                if added:
+                    sent += len(added)
+                    yield search_event(fmt, "results", {"engine": engine, "results": added, "elapsed_ms": elapsed_ms()})
+
+        results = merger.ranked()
+        if results:
+            if cached:
+                search_cache.extend(cache_key, results)
+            elif request.page == 1:
+                search_cache.set(cache_key, results)  # all results fetched (up to 60)
+            schedule_search_prefetch(request, cache_key)
+        yield search_event(fmt, "done", {
+            "results": results[:request.max_results], "errors": errors, "cached": False, "elapsed_ms": elapsed_ms(),
+        })
 
-    return {"results": results, "original_query": request.query, "optimized_query": optimized_query}
+    if fmt == "sse":
+        return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+@app.post("/api/search/deep")
+async def deep_search(request: DeepSearchRequest):
+    """深度搜索：抓取前 top_k 个结果网页的正文，流式输出带引用的综合回答，末尾附参考来源。"""
+    api_key = resolve_api_key(request.api_key)
+    if not api_key:
+        raise HTTPException(status_code=400, detail="API Key is required")
+    extra = {"api_base": request.base_url} if request.base_url else {}
+
+    # Reuse the cached result list of a previous /api/search for the same query
+    deps, errors = resolve_dependencies()
+    _, cached = search_cache.lookup(canonical_query(request.query))
+    results = list(cached or ())
+    if not results:
+        results, engine_errors = await fan_out_search(
+            deps, request.query, 1, request.top_k, request.top_k * 2,
+            near_duplicates=request.collapse_duplicates,
+        )
+        errors.extend(engine_errors)
+    if not results:
+        raise HTTPException(status_code=502, detail="Search failed: " + ("; ".join(errors) or "no results"))
+
+    sources, diagnostics = await fetch_sources(deps, results, request.top_k, SEARCH_DEEP_DEADLINE)
+    if not sources:
+        # No page could be read: answer from the engine snippets instead
+        sources = [{"title": r["title"], "href": r["href"], "text": r.get("body", "")} for r in results[:request.top_k]]
+    # Token counting may trigger the first (slow) litellm import: keep it off the event loop
+    messages, allowance = await asyncio.to_thread(
+        deep_answer_messages, request.model, request.query, sources, SEARCH_DEEP_TOKEN_BUDGET
+    )
+
+    async def answer():
+        chunks = acall_llm_stream(
+            provider=request.provider, model=request.model, api_key=api_key, messages=messages, **extra
+        )
+        try:
+            async for chunk in chunks:
+                yield chunk
+            yield format_references(sources)
+        finally:
+            await chunks.aclose()
+
+    usage = {
+        **diagnostics,
+        "sources": [
+            {"title": s["title"], "href": s["href"], "tokens": tokens,
+             "fetch_ms": s.get("fetch_ms"), "extract_ms": s.get("extract_ms")}
+            for s, tokens in zip(sources, allowance)
+        ],
+    }
+    headers = {
+        "X-Deep-Sources": str(diagnostics["fetched"]),
+        "X-Deep-Fetch-Ms": str(diagnostics["fetch_ms"]),
+        "X-Deep-Extract-Ms": str(diagnostics["extract_ms"]),
+    }
+    return llm_stream_response(answer(), request.stream_format, usage=usage, headers=headers)
 
 @app.post("/api/chat")
 async def chat(request: ChatRequest):
@@ -562,99 +499,126 @@ async def chat(request: ChatRequest):
         extra = {}
         if request.base_url:
             extra["api_base"] = request.base_url
-            
-        async def event_generator():
-            try:
-                async for chunk in acall_llm_stream(
-                    provider=request.provider,
-                    model=request.model,
-                    api_key=api_key,
-                    messages=request.messages,
-                    **extra
-                ):
-                    yield chunk
-            except Exception as e:
-                yield f"Error: {str(e)}"
 
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        # Keep the prompt within the token budget (system prompt + latest turns always kept)
+        messages, context = await fit_messages(
+            provider=request.provider,
+            model=request.model,
+            api_key=api_key,
+            messages=request.messages,
+            budget=request.context_budget,
+            strategy=request.context_strategy,
+            **extra
+        )
+            
+        chunks = acall_llm_stream(
+            provider=request.provider,
+            model=request.model,
+            api_key=api_key,
+            messages=messages,
+            **extra
+        )
+        headers = {
+            "X-Context-Tokens-Sent": str(context["tokens_sent"]),
+            "X-Context-Tokens-Saved": str(context["tokens_saved"]),
+            "X-Context-Dropped-Messages": str(context["dropped_messages"]),
+        }
+        return llm_stream_response(chunks, request.stream_format, usage=context, headers=headers)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+CREATIVE_SYSTEM_INSTRUCTION = "你是一个专业的AI内容生成助手。请直接根据用户的要求生成最终的内容草稿，不要追问细节，不要反问。如果信息不足，请自行补充合理的假设内容以完成生成。"
+
+def build_creative_prompt(task: str, f: dict) -> tuple[str, bool]:
+    """按创作任务拼装 prompt，返回 (prompt, 是否可缓存)。模板任务可缓存，自由任务不缓存。"""
+    use_cache = True
+
+    if task == "daily_report":
+        prompt = f"请根据以下工作内容生成一份专业的日报：\n{f.get('content', '')}\n\n要求：条理清晰，分为【今日工作】、【存在问题】、【明日计划】三部分。"
+    elif task == "weekly_report":
+        prompt = f"请根据以下工作内容生成一份周报：\n{f.get('content', '')}\n\n要求：总结本周重点，分析数据/成果，规划下周。"
+    elif task == "email":
+        prompt = f"请帮我写一封邮件。\n收件人：{f.get('receiver', '')}\n主题：{f.get('topic', '')}\n要点：{f.get('content', '')}\n\n要求：语气商务、得体。"
+    elif task == "translation":
+        prompt = f"请将以下内容翻译成 {f.get('target_lang', '中文')}，并进行润色：\n{f.get('content', '')}"
+
+    # --- Work ---
+    elif task == "meeting_minutes":
+        prompt = f"请根据以下会议纪要草稿，整理成一份正式的会议纪要：\n{f.get('content', '')}\n\n要求：包含会议主题、时间、参会人员、主要决议、待办事项。"
+    elif task == "okr_draft":
+        prompt = f"请根据以下目标，帮我起草一份OKR（目标与关键结果）：\n目标：{f.get('content', '')}\n\n要求：符合SMART原则，包含1个O和3-5个KR。"
+
+    # --- Education ---
+    elif task == "essay_outline":
+        prompt = f"请为以下论文/文章主题生成一份详细大纲：\n主题：{f.get('content', '')}\n\n要求：结构严谨，包含引言、各章节论点、结论。"
+    elif task == "study_plan":
+        prompt = f"请为我制定一份学习计划。\n学习科目/技能：{f.get('topic', '')}\n可用时间：{f.get('time', '')}\n\n要求：分阶段，可执行性强。"
+
+    # --- Social Media ---
+    elif task == "xhs_copy":
+        prompt = f"请写一篇小红书风格的种草文案。\n产品/主题：{f.get('topic', '')}\n卖点/内容：{f.get('content', '')}\n\n要求：标题吸引人（带emoji），正文亲切活泼，包含Tag。"
+    elif task == "video_script":
+        prompt = f"请写一份短视频脚本。\n主题：{f.get('topic', '')}\n\n要求：包含分镜描述、台词、画面建议，时长约1分钟。"
+
+    # --- Life ---
+    elif task == "recipe_gen":
+        prompt = f"请根据以下食材生成一份菜谱：\n食材：{f.get('content', '')}\n\n要求：包含菜名、所需配料、详细烹饪步骤。"
+    elif task == "travel_plan":
+        prompt = f"请为我制定一份旅行计划。\n目的地：{f.get('destination', '')}\n天数：{f.get('days', '')}\n\n要求：包含每日行程安排、景点推荐、美食建议。"
+
+    # --- Career ---
+    elif task == "resume_polish":
+        prompt = f"请帮我优化这份简历内容：\n{f.get('content', '')}\n\n要求：使用专业职场术语，突出成就和数据，优化排版建议。"
+    elif task == "interview_prep":
+        prompt = f"即将面试岗位：{f.get('topic', '')}\n\n请列出5个高频面试题，并给出优秀的回答思路（STAR法则）。"
+
+    # --- Business ---
+    elif task == "swot_analysis":
+        prompt = f"请对以下项目/主题进行SWOT分析：\n{f.get('content', '')}\n\n要求：列出优势(S)、劣势(W)、机会(O)、威胁(T)，并给出战略建议。"
+    elif task == "contract_review":
+        prompt = f"我是乙方/个人，请帮我审查虽然条款，指出潜在风险和陷阱：\n{f.get('content', '')}\n\n要求：通俗易懂，标出高风险条款。"
+
+    # --- Writing ---
+    elif task == "title_gen":
+        prompt = f"请为这篇文章生成10个爆款标题：\n内容/主题：{f.get('content', '')}\n目标受众：{f.get('topic', '')}\n\n要求：包含数字、悬念、痛点等爆款元素。"
+    elif task == "article_polish":
+        prompt = f"请润色以下文章，使其更流畅、更有文采：\n{f.get('content', '')}\n\n要求：修正语病，提升词汇丰富度，保持原意。"
+
+    # --- Excel Generation ---
+    elif task == "excel_gen":
+        prompt = f"请根据以下描述生成一份CSV格式的数据，用于Excel处理：\n描述：{f.get('content', '')}\n\n要求：只输出CSV内容，不要有任何解释，首行为表头。"
+    else:
+        prompt = f"请完成以下任务：{f.get('content', '')}"
+        use_cache = False
+    return prompt, use_cache
+
+def creative_messages(prompt: str) -> list[dict]:
+    return [
+        {"role": "system", "content": CREATIVE_SYSTEM_INSTRUCTION},
+        {"role": "user", "content": prompt}
+    ]
+
 @app.post("/api/generate/creative")
 async def generate_creative(request: CreativeRequest):
     try:
         # Prompt Engineering based on Task
-        prompt = ""
-        f = request.fields
-        
-        
+        prompt, use_cache = build_creative_prompt(request.task, request.fields)
+
         extra = {}
         if request.base_url: extra["api_base"] = request.base_url
-        
-        if request.task == "daily_report":
-            prompt = f"请根据以下工作内容生成一份专业的日报：\n{f.get('content', '')}\n\n要求：条理清晰，分为【今日工作】、【存在问题】、【明日计划】三部分。"
-        elif request.task == "weekly_report":
-            prompt = f"请根据以下工作内容生成一份周报：\n{f.get('content', '')}\n\n要求：总结本周重点，分析数据/成果，规划下周。"
-        elif request.task == "email":
-            prompt = f"请帮我写一封邮件。\n收件人：{f.get('receiver', '')}\n主题：{f.get('topic', '')}\n要点：{f.get('content', '')}\n\n要求：语气商务、得体。"
-        elif request.task == "translation":
-            prompt = f"请将以下内容翻译成 {f.get('target_lang', '中文')}，并进行润色：\n{f.get('content', '')}"
-        
-        # --- Work ---
-        elif request.task == "meeting_minutes":
-            prompt = f"请根据以下会议纪要草稿，整理成一份正式的会议纪要：\n{f.get('content', '')}\n\n要求：包含会议主题、时间、参会人员、主要决议、待办事项。"
-        elif request.task == "okr_draft":
-            prompt = f"请根据以下目标，帮我起草一份OKR（目标与关键结果）：\n目标：{f.get('content', '')}\n\n要求：符合SMART原则，包含1个O和3-5个KR。"
-            
-        # --- Education ---
-        elif request.task == "essay_outline":
-            prompt = f"请为以下论文/文章主题生成一份详细大纲：\n主题：{f.get('content', '')}\n\n要求：结构严谨，包含引言、各章节论点、结论。"
-        elif request.task == "study_plan":
-            prompt = f"请为我制定一份学习计划。\n学习科目/技能：{f.get('topic', '')}\n可用时间：{f.get('time', '')}\n\n要求：分阶段，可执行性强。"
-
-        # --- Social Media ---
-        elif request.task == "xhs_copy":
-            prompt = f"请写一篇小红书风格的种草文案。\n产品/主题：{f.get('topic', '')}\n卖点/内容：{f.get('content', '')}\n\n要求：标题吸引人（带emoji），正文亲切活泼，包含Tag。"
-        elif request.task == "video_script":
-            prompt = f"请写一份短视频脚本。\n主题：{f.get('topic', '')}\n\n要求：包含分镜描述、台词、画面建议，时长约1分钟。"
-
-        # --- Life ---
-        elif request.task == "recipe_gen":
-            prompt = f"请根据以下食材生成一份菜谱：\n食材：{f.get('content', '')}\n\n要求：包含菜名、所需配料、详细烹饪步骤。"
-        elif request.task == "travel_plan":
-            prompt = f"请为我制定一份旅行计划。\n目的地：{f.get('destination', '')}\n天数：{f.get('days', '')}\n\n要求：包含每日行程安排、景点推荐、美食建议。"
-
-        # --- Career ---
-        elif request.task == "resume_polish":
-            prompt = f"请帮我优化这份简历内容：\n{f.get('content', '')}\n\n要求：使用专业职场术语，突出成就和数据，优化排版建议。"
-        elif request.task == "interview_prep":
-            prompt = f"即将面试岗位：{f.get('topic', '')}\n\n请列出5个高频面试题，并给出优秀的回答思路（STAR法则）。"
-
-        # --- Business ---
-        elif request.task == "swot_analysis":
-            prompt = f"请对以下项目/主题进行SWOT分析：\n{f.get('content', '')}\n\n要求：列出优势(S)、劣势(W)、机会(O)、威胁(T)，并给出战略建议。"
-        elif request.task == "contract_review":
-            prompt = f"我是乙方/个人，请帮我审查虽然条款，指出潜在风险和陷阱：\n{f.get('content', '')}\n\n要求：通俗易懂，标出高风险条款。"
-
-        # --- Writing ---
-        elif request.task == "title_gen":
-            prompt = f"请为这篇文章生成10个爆款标题：\n内容/主题：{f.get('content', '')}\n目标受众：{f.get('topic', '')}\n\n要求：包含数字、悬念、痛点等爆款元素。"
-        elif request.task == "article_polish":
-            prompt = f"请润色以下文章，使其更流畅、更有文采：\n{f.get('content', '')}\n\n要求：修正语病，提升词汇丰富度，保持原意。"
-        
-        # --- Excel Generation ---
-        elif request.task == "excel_gen":
-            prompt = f"请根据以下描述生成一份CSV格式的数据，用于Excel处理：\n描述：{f.get('content', '')}\n\n要求：只输出CSV内容，不要有任何解释，首行为表头。"
+
+        if request.task == "excel_gen":
             # Handle non-streaming response for Excel
             try:
                 # Call LLM non-streaming to get full CSV
-                csv_content = call_llm(
+                csv_content = await acall_llm(
                     provider=request.provider,
                     model=request.model,
                     api_key=resolve_api_key(request.api_key),
                     messages=[{"role": "user", "content": prompt}],
+                    cache=use_cache,
                     **extra
                 )
                 
@@ -683,28 +647,15 @@ async def generate_creative(request: CreativeRequest):
                 traceback.print_exc()
                 raise HTTPException(status_code=500, detail=f"Excel Gen Failed: {str(e)}")
 
-        else:
-            prompt = f"请完成以下任务：{f.get('content', '')}"
-
-        async def event_generator():
-            try:
-                system_instruction = "你是一个专业的AI内容生成助手。请直接根据用户的要求生成最终的内容草稿，不要追问细节，不要反问。如果信息不足，请自行补充合理的假设内容以完成生成。"
-                messages = [
-                    {"role": "system", "content": system_instruction},
-                    {"role": "user", "content": prompt}
-                ]
-                async for chunk in acall_llm_stream(
-                    provider=request.provider,
-                    model=request.model,
-                    api_key=resolve_api_key(request.api_key),
-                    messages=messages,
-                    **extra
-                ):
-                    yield chunk
-            except Exception as e:
-                yield f"Error: {str(e)}"
-
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        chunks = acall_llm_stream(
+            provider=request.provider,
+            model=request.model,
+            api_key=resolve_api_key(request.api_key),
+            messages=creative_messages(prompt),
+            cache=use_cache,
+            **extra
+        )
+        return llm_stream_response(chunks, request.stream_format)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -724,7 +675,8 @@ async def generate_creative_upload(
     target_lang: str = Form(None),
     time: str = Form(None),
     destination: str = Form(None),
-    days: str = Form(None)
+    days: str = Form(None),
+    stream_format: str = Form("text")
 ):
     try:
         # 1. Parse File
@@ -738,7 +690,8 @@ async def generate_creative_upload(
                     self.name = name
             
             f_obj = NamedBytesIO(file_bytes, file.filename)
-            file_content = parse_file(f_obj)
+            # Parsing is CPU-bound (and large PDFs wait on the process pool): keep it off the event loop
+            file_content = await asyncio.to_thread(parse_file, f_obj)
         except Exception as e:
             return JSONResponse(status_code=400, content={"detail": f"File Parse Error: {str(e)}"})
 
@@ -765,7 +718,8 @@ async def generate_creative_upload(
             provider=provider,
             model=model,
             api_key=resolve_api_key(api_key),
-            base_url=base_url
+            base_url=base_url,
+            stream_format=stream_format
         )
         
         # 4. Delegate to existing logic
@@ -777,46 +731,95 @@ async def generate_creative_upload(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+CODE_ROLE_MAP = {
+    "generate": "你是一个资深程序员。请根据需求生成高质量、可运行的代码。",
+    "review": "你是一个代码审查专家。请Review以下代码，指出潜在Bug、性能问题和改进建议。",
+    "debug": "你是一个Debug专家。请分析以下代码的错误，并给出修复后的代码。",
+    "explain": "你是一个计算机科学教师。请通俗易懂地解释以下代码的逻辑和功能。"
+}
+
+def build_code_messages(request: CodeRequest) -> list[dict]:
+    system_role = CODE_ROLE_MAP.get(request.task, "你是一个全能编程助手。")
+    user_content = f"语言：{request.language}\n\n内容/需求：\n{request.content}"
+    return [
+        {"role": "system", "content": system_role},
+        {"role": "user", "content": user_content}
+    ]
+
 @app.post("/api/code/generate")
 async def generate_code(request: CodeRequest):
     try:
-        role_map = {
-            "generate": "你是一个资深程序员。请根据需求生成高质量、可运行的代码。",
-            "review": "你是一个代码审查专家。请Review以下代码，指出潜在Bug、性能问题和改进建议。",
-            "debug": "你是一个Debug专家。请分析以下代码的错误，并给出修复后的代码。",
-            "explain": "你是一个计算机科学教师。请通俗易懂地解释以下代码的逻辑和功能。"
-        }
-        
-        system_role = role_map.get(request.task, "你是一个全能编程助手。")
-        user_content = f"语言：{request.language}\n\n内容/需求：\n{request.content}"
-        
-        messages = [
-            {"role": "system", "content": system_role},
-            {"role": "user", "content": user_content}
-        ]
+        messages = build_code_messages(request)
 
         extra = {}
         if request.base_url: extra["api_base"] = request.base_url
 
-        async def event_generator():
-            try:
-                async for chunk in acall_llm_stream(
-                    provider=request.provider,
-                    model=request.model,
-                    api_key=resolve_api_key(request.api_key),
-                    messages=messages,
-                    **extra
-                ):
-                    yield chunk
-            except Exception as e:
-                yield f"Error: {str(e)}"
-
-        return StreamingResponse(event_generator(), media_type="text/plain")
+        chunks = acall_llm_stream(
+            provider=request.provider,
+            model=request.model,
+            api_key=resolve_api_key(request.api_key),
+            messages=messages,
+            **extra
+        )
+        return llm_stream_response(chunks, request.stream_format)
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def batch_job(job: CreativeRequest | CodeRequest):
+    """把单个创作 / 代码请求转换为非流式的 LLM 调用。"""
+    extra = {}
+    if job.base_url: extra["api_base"] = job.base_url
+
+    if isinstance(job, CodeRequest):
+        messages, use_cache = build_code_messages(job), False
+    else:
+        prompt, use_cache = build_creative_prompt(job.task, job.fields)
+        messages = creative_messages(prompt)
+
+    async def run() -> str:
+        if isinstance(job, CreativeRequest) and job.task == "excel_gen":
+            raise ValueError("excel_gen returns a file and is not supported in batch mode")
+        return await acall_llm(
+            provider=job.provider,
+            model=job.model,
+            api_key=resolve_api_key(job.api_key),
+            messages=messages,
+            cache=use_cache,
+            **extra
+        )
+    return run
+
+@app.post("/api/batch/generate")
+async def batch_generate(request: BatchRequest):
+    """批量执行创作 / 代码任务，按完成顺序以 NDJSON 逐行返回带序号的结果，末行为汇总。"""
+    if not request.jobs:
+        raise HTTPException(status_code=400, detail="jobs must not be empty")
+    if len(request.jobs) > BATCH_MAX_JOBS:
+        raise HTTPException(status_code=400, detail=f"Too many jobs (max {BATCH_MAX_JOBS})")
+
+    run = BatchRun(
+        [batch_job(job) for job in request.jobs],
+        concurrency=min(request.concurrency, BATCH_MAX_CONCURRENCY),
+    )
+
+    async def lines():
+        async for item in run.results():
+            yield json.dumps(item, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers={"X-Batch-Id": run.id})
+
+@app.post("/api/batch/{batch_id}/cancel")
+async def batch_cancel(batch_id: str):
+    """取消进行中的批次；已完成的结果照常返回，其余任务标记为 cancelled。"""
+    run = active_batches.get(batch_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="Batch not found or already finished")
+    run.cancel()
+    return {"cancelled": True, "batch_id": batch_id}
+
+
 @app.post("/api/excel/process")
 async def process_excel(
     file: UploadFile = File(...),
@@ -972,7 +975,7 @@ async def persona_analyze(
                 self.name = name
         
         f_obj = NamedBytesIO(file_bytes, file.filename)
-        file_content = parse_file(f_obj)
+        file_content = await asyncio.to_thread(parse_file, f_obj)
         
         if file_content.startswith("["): # Check for parser errors
              return JSONResponse(status_code=400, content={"detail": file_content})
@@ -1213,11 +1216,12 @@ async def generate_ppt_outline(request: PPTRequest):
         if request.base_url:
             extra["api_base"] = request.base_url
 
-        response = call_llm(
+        response = await acall_llm(
             provider=request.provider,
             model=request.model,
             api_key=resolve_api_key(request.api_key),
             messages=messages,
+            cache=True,
             **extra
         )
         
@@ -1429,11 +1433,12 @@ async def generate_mindmap(request: MindMapRequest):
         if request.base_url:
             extra["api_base"] = request.base_url
 
-        response = call_llm(
+        response = await acall_llm(
             provider=request.provider,
             model=request.model,
             api_key=resolve_api_key(request.api_key),
             messages=messages,
+            cache=True,
             **extra
         )
         
@@ -1512,7 +1517,7 @@ async def system_generate_code(request: SystemRequest):
         if request.base_url:
             extra["api_base"] = request.base_url
 
-        response = call_llm(
+        response = await acall_llm(
             provider=request.provider,
             model=request.model,
             api_key=resolve_api_key(request.api_key),
@@ -1574,17 +1579,12 @@ async def game_adventure(request: GameAdventureRequest):
         state = request.current_state
         action = request.user_action
         
+        # The system prompt only depends on the world setting so it stays a stable,
+        # cacheable prefix across turns; per-turn state goes into the last user message.
         system_prompt = f"""You are the Dungeon Master (DM) for a text-based RPG.
 World Setting: {setting}
 
-Player State:
-- HP: {state.get('hp', 100)}/{state.get('max_hp', 100)}
-- Inventory: {', '.join(state.get('inventory', [])) or 'Empty'}
-- Location: {state.get('location', 'Unknown')}
-- Status: {state.get('status', 'Normal')}
-
-Current Situation:
-The player performs the action: "{action}"
+Each player message contains the current Player State and the action the player performs.
 
 Your Task:
 1. Narrate the result of the action and the new situation. 
@@ -1611,7 +1611,15 @@ Output JSON format ONLY:
         
         messages = [{"role": "system", "content": system_prompt}]
         messages.extend(recent_history)
-        messages.append({"role": "user", "content": action})
+        messages.append({"role": "user", "content": f"""Player State:
+- HP: {state.get('hp', 100)}/{state.get('max_hp', 100)}
+- Inventory: {', '.join(state.get('inventory', [])) or 'Empty'}
+- Location: {state.get('location', 'Unknown')}
+- Status: {state.get('status', 'Normal')}
+
+Current Situation:
+The player performs the action: "{action}"
+"""})
 
         extra = {}
         if request.base_url:
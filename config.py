@@ -1,5 +1,8 @@
 """Office AI Mate — 配置与常量"""
 
+import json
+import os
+
 # 模型提供者列表（用于侧边栏选择）
 PROVIDERS: list[str] = [
     "OpenAI",
@@ -18,7 +21,8 @@ PROVIDER_PLACEHOLDER: dict[str, str] = {
     "OpenRouter": "例如: google/gemini-2.0-flash-exp:free",
 }
 
-# LiteLLM 使用的环境变量名称映射
+# LiteLLM 在未显式传入 api_key 时读取的环境变量名称映射
+# （请求级凭据由 llm_client 随调用传入，不会写入 os.environ）
 PROVIDER_ENV_KEY: dict[str, str] = {
     "OpenAI": "OPENAI_API_KEY",
     "Anthropic": "ANTHROPIC_API_KEY",
@@ -38,6 +42,150 @@ PROVIDER_MODEL_PREFIX: dict[str, str] = {
     "Google": "gemini/",
 }
 
+# ── LLM 响应缓存 ─────────────────────────────────────────────
+# 内存 LRU 最大条目数 / 过期时间（秒）
+LLM_CACHE_MAX_ENTRIES: int = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "512"))
+LLM_CACHE_TTL: float = float(os.environ.get("LLM_CACHE_TTL", "3600"))
+# SQLite 持久层路径（为空则仅使用内存缓存），例如 data/llm_cache.sqlite3
+LLM_CACHE_DB_PATH: str = os.environ.get("LLM_CACHE_DB", "")
+
+# ── LLM 上游连接池 ───────────────────────────────────────────
+# 每个 (provider, base_url) 的最大连接数 / 空闲长连接保持时间（秒）
+LLM_HTTP_POOL_SIZE: int = int(os.environ.get("LLM_HTTP_POOL_SIZE", "100"))
+LLM_HTTP_KEEPALIVE: float = float(os.environ.get("LLM_HTTP_KEEPALIVE", "60"))
+# 只为已知上游建立长连接池：PROVIDER_BASE_URL、对冲备用地址，以及这里列出的自建服务地址（逗号分隔）；
+# 客户端传入的其他 base_url 使用一次性会话，避免连接池随请求无限增长
+LLM_HTTP_POOL_BASE_URLS: list[str] = [u for u in os.environ.get("LLM_HTTP_POOL_BASE_URLS", "").split(",") if u.strip()]
+
+# ── OpenAI 兼容轻量客户端 ────────────────────────────────────
+# 带 api_base 的请求（SiliconCloud / OpenRouter / 自定义 base_url）直接通过 aiohttp 调用
+# /chat/completions，不经过 LiteLLM；设为 0 则全部交给 LiteLLM
+LLM_NATIVE_CLIENT: bool = os.environ.get("LLM_NATIVE_CLIENT", "1") != "0"
+# 建立连接的超时 / 两次读取之间的最长等待（秒；流式请求即分块间隔）
+LLM_NATIVE_CONNECT_TIMEOUT: float = 10
+LLM_NATIVE_READ_TIMEOUT: float = 120
+
+# ── LLM 限流 ─────────────────────────────────────────────────
+# 每个 provider 的令牌桶速率（请求/秒）、突发容量与最大并发；未列出的使用 default。
+# 环境变量 LLM_RATE_LIMITS 为 JSON，按 provider 覆盖，例如 {"OpenRouter": {"rate": 2, "max_concurrency": 4}}
+LLM_RATE_LIMITS: dict[str, dict] = {
+    "OpenRouter": {"rate": 5, "burst": 10, "max_concurrency": 16},
+    "SiliconCloud": {"rate": 5, "burst": 10, "max_concurrency": 16},
+    "default": {"rate": 10, "burst": 20, "max_concurrency": 32},
+}
+for _provider, _limits in json.loads(os.environ.get("LLM_RATE_LIMITS") or "{}").items():
+    LLM_RATE_LIMITS[_provider] = {**LLM_RATE_LIMITS.get(_provider, LLM_RATE_LIMITS["default"]), **_limits}
+# 遇到 429 时的最大尝试次数与退避基数（秒，无 Retry-After 时指数增长）
+LLM_RETRY_MAX_ATTEMPTS: int = int(os.environ.get("LLM_RETRY_MAX_ATTEMPTS", "4"))
+LLM_RETRY_BASE_DELAY: float = float(os.environ.get("LLM_RETRY_BASE_DELAY", "1.0"))
+# 两次乘性减半之间的最短间隔（秒）：同一次过载引发的一串 429 只减半一次
+LLM_DECREASE_INTERVAL: float = float(os.environ.get("LLM_DECREASE_INTERVAL", "1.0"))
+
+# ── LLM 对冲请求 / 故障转移 ──────────────────────────────────
+# 主请求超过阈值（秒）仍无首个 token 时，向备用 provider/模型发起相同请求并取先到者；
+# 主请求遇到上游硬错误时立即切换。LLM_HEDGE_PROVIDER 须为 PROVIDERS 之一，留空则关闭。
+LLM_HEDGE_PROVIDER: str = os.environ.get("LLM_HEDGE_PROVIDER", "")
+LLM_HEDGE_MODEL: str = os.environ.get("LLM_HEDGE_MODEL", "")
+LLM_HEDGE_API_KEY: str = os.environ.get("LLM_HEDGE_API_KEY", "")
+LLM_HEDGE_BASE_URL: str = os.environ.get("LLM_HEDGE_BASE_URL", "")
+LLM_HEDGE_THRESHOLD: float = float(os.environ.get("LLM_HEDGE_THRESHOLD", "5"))
+# 非流式调用按完整回复计时（长文本生成本身就要数十秒），阈值单独设置，避免几乎每次都重复付费请求
+LLM_HEDGE_CALL_THRESHOLD: float = float(os.environ.get("LLM_HEDGE_CALL_THRESHOLD", "60"))
+
+# ── SSE 流式输出 ─────────────────────────────────────────────
+# 文本增量合并窗口（秒）与单帧最大字节数；空闲心跳间隔（秒）；背压队列长度
+SSE_COALESCE_WINDOW: float = 0.05
+SSE_COALESCE_MAX_BYTES: int = 2048
+SSE_PING_INTERVAL: float = 15
+SSE_QUEUE_SIZE: int = 64
+
+# ── LLM 调用指标 ─────────────────────────────────────────────
+# 直方图桶上界：耗时类（秒，排队 / 首 token / 总耗时）、token 间隔（秒）、吞吐（token/秒）
+LLM_METRICS_LATENCY_BUCKETS: tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+LLM_METRICS_GAP_BUCKETS: tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+LLM_METRICS_RATE_BUCKETS: tuple[float, ...] = (1, 5, 10, 20, 50, 100, 200, 500)
+# 每个 provider 单独统计的模型数上限（模型名来自客户端），超出后的新模型合并计入 "other"
+LLM_METRICS_MAX_MODELS: int = int(os.environ.get("LLM_METRICS_MAX_MODELS", "32"))
+
+# ── 提示词前缀缓存 ───────────────────────────────────────────
+# 对支持显式缓存标记的 provider（Anthropic 原生、OpenRouter 上的 Claude / Gemini），
+# 开头 system 消息总长度（字符）达到阈值时添加 cache_control 断点；
+# OpenAI / DeepSeek 等自动前缀缓存的 provider 不需要标记，保持消息顺序稳定即可命中
+PROMPT_CACHE_ENABLED: bool = os.environ.get("PROMPT_CACHE_ENABLED", "1") != "0"
+PROMPT_CACHE_MIN_CHARS: int = int(os.environ.get("PROMPT_CACHE_MIN_CHARS", "1024"))
+PROMPT_CACHE_OPENROUTER_MODELS: tuple[str, ...] = ("anthropic/", "google/gemini")
+
+# ── 批量生成 ─────────────────────────────────────────────────
+# 单批最大任务数；默认并发数与允许的最大并发数
+BATCH_MAX_JOBS: int = int(os.environ.get("BATCH_MAX_JOBS", "500"))
+BATCH_CONCURRENCY: int = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY: int = int(os.environ.get("BATCH_MAX_CONCURRENCY", "32"))
+
+# ── 联网搜索 ─────────────────────────────────────────────────
+# 单次搜索请求的总截止时间（秒）：到期仍未返回的引擎被取消
+SEARCH_DEADLINE: float = float(os.environ.get("SEARCH_DEADLINE", "8"))
+# 合并排序时各引擎的权重（倒数排名融合，多个引擎都返回的结果排名更靠前）
+SEARCH_ENGINE_WEIGHTS: dict[str, float] = {"DuckDuckGo": 1.0, "Bing": 1.0, "Baidu": 0.8}
+# DuckDuckGo 查询（同步库）专用线程池大小 / 每个后端的超时（秒）
+SEARCH_DDG_WORKERS: int = int(os.environ.get("SEARCH_DDG_WORKERS", "4"))
+SEARCH_DDG_BACKEND_TIMEOUT: float = float(os.environ.get("SEARCH_DDG_BACKEND_TIMEOUT", "5"))
+# 搜索结果页抓取会话（curl_cffi / httpx）的最大连接数 / 空闲长连接保持时间（秒）
+SEARCH_HTTP_POOL_SIZE: int = int(os.environ.get("SEARCH_HTTP_POOL_SIZE", "20"))
+SEARCH_HTTP_KEEPALIVE: float = float(os.environ.get("SEARCH_HTTP_KEEPALIVE", "60"))
+# 近似重复折叠（转载 / 镜像）：标题 + 摘要的 3-gram Jaccard 相似度（MinHash 估计）达到该值视为同一结果
+SEARCH_NEAR_DUPLICATES: bool = os.environ.get("SEARCH_NEAR_DUPLICATES", "1") != "0"
+SEARCH_NEAR_DUPLICATE_SIMILARITY: float = float(os.environ.get("SEARCH_NEAR_DUPLICATE_SIMILARITY", "0.6"))
+# 搜索结果缓存：最大查询数 / 字节预算 / 过期时间（秒）
+SEARCH_CACHE_MAX_ENTRIES: int = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "256"))
+SEARCH_CACHE_MAX_BYTES: int = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+SEARCH_CACHE_TTL: float = float(os.environ.get("SEARCH_CACHE_TTL", "600"))
+# 缓存键为规范化后的查询（NFKC / 大小写 / 空白 / 繁简折叠）；开启近似匹配时，词序列相同、
+# 仅差停用词 / 标点 / 单复数的近期查询直接复用其缓存结果（默认关闭）
+SEARCH_CACHE_FUZZY: bool = os.environ.get("SEARCH_CACHE_FUZZY", "0") != "0"
+# 后台预取：返回第 N 页后预取的后续页数（0 关闭）/ 全局并发 / 两次预取请求的最小间隔（秒）/ 启动延迟（秒）
+SEARCH_PREFETCH_PAGES: int = int(os.environ.get("SEARCH_PREFETCH_PAGES", "2"))
+SEARCH_PREFETCH_CONCURRENCY: int = int(os.environ.get("SEARCH_PREFETCH_CONCURRENCY", "2"))
+SEARCH_PREFETCH_INTERVAL: float = float(os.environ.get("SEARCH_PREFETCH_INTERVAL", "1.0"))
+SEARCH_PREFETCH_DELAY: float = float(os.environ.get("SEARCH_PREFETCH_DELAY", "0.5"))
+# 引擎熔断：滑动窗口（最近 N 次查询，且不早于 N 秒）/ 连续失败次数阈值 / 窗口内失败率阈值及最少样本数 /
+# 冷却时间（秒，半开探测失败后加倍，不超过上限）/ 健康分的参考延迟（秒，延迟等于该值时健康分减半）
+SEARCH_BREAKER_WINDOW: int = int(os.environ.get("SEARCH_BREAKER_WINDOW", "20"))
+SEARCH_BREAKER_WINDOW_SECONDS: float = float(os.environ.get("SEARCH_BREAKER_WINDOW_SECONDS", "300"))
+SEARCH_BREAKER_FAILURES: int = int(os.environ.get("SEARCH_BREAKER_FAILURES", "3"))
+SEARCH_BREAKER_FAILURE_RATE: float = float(os.environ.get("SEARCH_BREAKER_FAILURE_RATE", "0.5"))
+SEARCH_BREAKER_MIN_CALLS: int = int(os.environ.get("SEARCH_BREAKER_MIN_CALLS", "6"))
+SEARCH_BREAKER_COOLDOWN: float = float(os.environ.get("SEARCH_BREAKER_COOLDOWN", "30"))
+SEARCH_BREAKER_MAX_COOLDOWN: float = float(os.environ.get("SEARCH_BREAKER_MAX_COOLDOWN", "300"))
+SEARCH_BREAKER_LATENCY_REF: float = float(os.environ.get("SEARCH_BREAKER_LATENCY_REF", "2"))
+# 深度搜索：抓取正文的结果数（请求可指定，上限 SEARCH_DEEP_MAX_TOP_K）/ 全局并发 / 同一域名的并发与请求间隔（秒）/ 抓取截止时间（秒）/ 单页最大字节数
+SEARCH_DEEP_TOP_K: int = int(os.environ.get("SEARCH_DEEP_TOP_K", "5"))
+SEARCH_DEEP_MAX_TOP_K: int = int(os.environ.get("SEARCH_DEEP_MAX_TOP_K", "10"))
+SEARCH_DEEP_CONCURRENCY: int = int(os.environ.get("SEARCH_DEEP_CONCURRENCY", "8"))
+SEARCH_DEEP_PER_DOMAIN: int = int(os.environ.get("SEARCH_DEEP_PER_DOMAIN", "1"))
+SEARCH_DEEP_DOMAIN_INTERVAL: float = float(os.environ.get("SEARCH_DEEP_DOMAIN_INTERVAL", "0.5"))
+SEARCH_DEEP_DEADLINE: float = float(os.environ.get("SEARCH_DEEP_DEADLINE", "6"))
+SEARCH_DEEP_MAX_PAGE_BYTES: int = int(os.environ.get("SEARCH_DEEP_MAX_PAGE_BYTES", str(2 * 1024 * 1024)))
+# 深度搜索发送给模型的网页正文总 token 预算（在各来源间分配）
+SEARCH_DEEP_TOKEN_BUDGET: int = int(os.environ.get("SEARCH_DEEP_TOKEN_BUDGET", "3000"))
+
+# ── PDF 解析 ─────────────────────────────────────────────────
+# 页数达到阈值的 PDF 按页段分发到进程池并行提取文本；进程数（1 = 不并行）/ 每个任务的页数
+# （每个任务都要重新打开 PDF，约相当于解析两页的开销，页段太小时开销占比过高）
+PDF_PARALLEL_MIN_PAGES: int = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "50"))
+PDF_WORKERS: int = int(os.environ.get("PDF_WORKERS", str(min(os.cpu_count() or 1, 8))))
+PDF_PAGES_PER_TASK: int = int(os.environ.get("PDF_PAGES_PER_TASK", "25"))
+
+# ── 对话上下文预算 ───────────────────────────────────────────
+# /api/chat 发送给模型的最大 token 数（同时不超过模型自身的输入上限）
+CHAT_CONTEXT_BUDGET: int = int(os.environ.get("CHAT_CONTEXT_BUDGET", "8000"))
+# 超出预算时的处理方式：truncate（丢弃最早的轮次）/ summarize（滚动摘要）
+CHAT_CONTEXT_STRATEGY: str = os.environ.get("CHAT_CONTEXT_STRATEGY", "truncate")
+# 无论预算如何都保留的最近消息条数
+CHAT_CONTEXT_MIN_RECENT: int = 2
+# 滚动摘要的最大长度（token）与缓存条目数
+CHAT_SUMMARY_MAX_TOKENS: int = 400
+CHAT_SUMMARY_CACHE_SIZE: int = 256
+
 # ── Prompt 模板 ──────────────────────────────────────────────
 TASK_PROMPTS: dict[str, str] = {
     "summarize": (
@@ -0,0 +1,96 @@
+"""Benchmark: built-in OpenAI-compatible client vs LiteLLM.
+
+Measures import time (fresh interpreter) and per-call client overhead against a
+local stub server that answers instantly, so the numbers are pure client cost.
+
+    python tests/bench_llm_client.py [calls]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import statistics
+import subprocess
+
+import aiohttp
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPLY = {
+    "id": "c1", "object": "chat.completion", "created": 1, "model": "m",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 5, "completion_tokens": 1, "total_tokens": 6},
+}
+
+
+async def handle(request):
+    body = await request.json()
+    if not body.get("stream"):
+        return web.json_response(REPLY)
+    resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+    await resp.prepare(request)
+    for part in ("o", "k"):
+        chunk = {"id": "c1", "object": "chat.completion.chunk", "created": 1, "model": "m",
+                 "choices": [{"index": 0, "delta": {"content": part}, "finish_reason": None}]}
+        await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+    await resp.write(b"data: [DONE]\n\n")
+    return resp
+
+
+def import_time(module: str, runs: int = 3) -> float:
+    samples = []
+    for _ in range(runs):
+        code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+async def per_call(label: str, acompletion, kwargs: dict, calls: int) -> None:
+    for stream in (False, True):
+        samples = []
+        for _ in range(calls):
+            start = time.perf_counter()
+            response = await acompletion(**kwargs, stream=stream)
+            if stream:
+                async for _chunk in response:
+                    pass
+            samples.append(time.perf_counter() - start)
+        mode = "stream" if stream else "non-stream"
+        print(f"  {label:<10} {mode:<11} median {statistics.median(samples) * 1e3:7.2f} ms"
+              f"   p95 {sorted(samples)[int(calls * 0.95) - 1] * 1e3:7.2f} ms")
+
+
+async def main(calls: int) -> None:
+    print("Import time (fresh interpreter, median of 3):")
+    for module in ("utils.openai_compat", "litellm"):
+        print(f"  {module:<22} {import_time(module) * 1e3:8.1f} ms")
+
+    app = web.Application()
+    app.router.add_post("/v1/chat/completions", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+
+    from utils import openai_compat
+    from utils.llm_client import load_litellm
+    litellm = load_litellm()
+
+    print(f"\nPer-call latency against an instant local stub ({calls} sequential calls):")
+    async with aiohttp.ClientSession() as session:
+        kwargs = {"model": "openai/m", "messages": [{"role": "user", "content": "hi"}],
+                  "api_key": "k", "api_base": base, "shared_session": session}
+        await per_call("native", openai_compat.acompletion, kwargs, calls)
+        await per_call("litellm", litellm.acompletion, kwargs, calls)
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
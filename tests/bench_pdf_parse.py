@@ -0,0 +1,91 @@
+"""Benchmark: page-parallel PDF text extraction vs the single-process page loop.
+
+Generates a text-heavy PDF with reportlab and times parse_pdf with 1..N worker
+processes against the previous implementation (one pdfplumber loop that keeps
+every parsed page alive). Also reports the tracemalloc peak of in-process
+extraction with and without releasing pages as they finish.
+
+    python tests/bench_pdf_parse.py [pages] [rounds]
+"""
+import io
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+import pdfplumber
+from reportlab.pdfgen import canvas
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.file_parser as file_parser
+from utils.file_parser import parse_pdf
+
+
+def make_pdf(pages: int) -> bytes:
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf)
+    for n in range(1, pages + 1):
+        pdf.drawString(72, 760, f"Section {n}")
+        for line in range(40):
+            pdf.drawString(72, 730 - line * 16, f"Page {n} line {line}: quarterly figures, notes and remarks.")
+        pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
+
+
+def legacy_parse(data: bytes) -> str:
+    text_content = []
+    with pdfplumber.open(io.BytesIO(data)) as pdf:
+        for page in pdf.pages:
+            text = page.extract_text()
+            if text:
+                text_content.append(text)
+    return "\n\n".join(text_content)
+
+
+def median_s(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def peak_mb(fn) -> float:
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main(pages: int, rounds: int) -> None:
+    data = make_pdf(pages)
+    cores = os.cpu_count() or 1
+    print(f"{pages}-page PDF ({len(data) // 1024} KB), {cores} CPU core(s), median of {rounds}:")
+    baseline = median_s(lambda: legacy_parse(data), rounds)
+    print(f"  {'legacy loop':<16} {baseline:>8.2f} s")
+    with mock.patch.object(file_parser, "PDF_WORKERS", 1):
+        in_process = median_s(lambda: parse_pdf(io.BytesIO(data)), rounds)
+    print(f"  {'in-process':<16} {in_process:>8.2f} s {baseline / in_process:>7.2f}x")
+    expected = legacy_parse(data)
+    for workers in sorted({1, 2, 4, cores}):
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            assert parse_pdf(io.BytesIO(data), executor=pool) == expected
+            elapsed = median_s(lambda: parse_pdf(io.BytesIO(data), executor=pool), rounds)
+        print(f"  {f'{workers} worker(s)':<16} {elapsed:>8.2f} s {baseline / elapsed:>7.2f}x")
+
+    print("Peak traced memory, in-process extraction:")
+    print(f"  {'legacy loop':<16} {peak_mb(lambda: legacy_parse(data)):>8.1f} MB")
+    with mock.patch.object(file_parser, "PDF_WORKERS", 1):
+        print(f"  {'release pages':<16} {peak_mb(lambda: parse_pdf(io.BytesIO(data))):>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300, int(sys.argv[2]) if len(sys.argv) > 2 else 3)
@@ -0,0 +1,82 @@
+"""Benchmark: result dedupe, old linear title scans vs hash-based ResultMerger.
+
+The old handler compared every new title against all accumulated results and
+all cached results. The merger checks URL and title hashes in O(1), plus an
+optional MinHash near-duplicate lookup. "cold" clears the signature memo before
+every run; "warm" is the page-2+ case where cached results were seen before.
+
+    python tests/bench_search_dedupe.py [rounds]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import search_dedupe
+from utils.web_search import ResultMerger
+
+_vocab = random.Random(0)
+# ~2000 two-character CJK words plus some latin terms, so unrelated results share few 3-grams
+WORDS = ["".join(chr(0x4E00 + _vocab.randrange(3000)) for _ in range(2)) for _ in range(2000)] + \
+        "excel python office word ppt pivot table chart macro formula".split()
+
+
+def make_results(n: int, prefix: str, rng: random.Random) -> list[dict]:
+    return [{
+        "title": " ".join(rng.choice(WORDS) for _ in range(8)) + f" {prefix}{i}",
+        "href": f"https://{prefix}{i % 50}.example.com/p/{i}",
+        "body": " ".join(rng.choice(WORDS) for _ in range(25)),
+    } for i in range(n)]
+
+
+def old_dedupe(items: list[dict], cached: list[dict]) -> list[dict]:
+    # Mirrors the former add_result() in api_server.search
+    results = []
+    seen_urls = {r['href'] for r in cached}
+    for r in items:
+        title, href, body = r['title'], r['href'], r['body']
+        if not href or href in seen_urls: continue
+        if not href.startswith("http"): continue
+        if any(x['title'] == title.strip() for x in results): continue
+        if any(x['title'] == title.strip() for x in cached): continue
+        seen_urls.add(href)
+        results.append({"title": title.strip(), "href": href.strip(), "body": body.strip()})
+    return results
+
+
+def new_dedupe(items: list[dict], cached: list[dict], near_duplicates: bool, cold: bool = True) -> list[dict]:
+    if cold:
+        search_dedupe._signature.cache_clear()
+    merger = ResultMerger(exclude=cached, near_duplicates=near_duplicates)
+    merger.add("DuckDuckGo", items)
+    return merger.ranked()
+
+
+def median_ms(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def main(rounds: int) -> None:
+    rng = random.Random(1)
+    print(f"Dedupe time per fetch (median of {rounds}):")
+    print(f"  {'new + cached':<14} {'old scans':>11} {'hash (cold)':>12} {'+minhash (cold)':>16} {'+minhash (warm)':>16}")
+    for fresh, cached_n in ((60, 0), (60, 300), (300, 1000), (1000, 3000)):
+        items, cached = make_results(fresh, "n", rng), make_results(cached_n, "c", rng)
+        old = median_ms(lambda: old_dedupe(items, cached), rounds)
+        exact = median_ms(lambda: new_dedupe(items, cached, False), rounds)
+        near = median_ms(lambda: new_dedupe(items, cached, True), rounds)
+        warm = median_ms(lambda: new_dedupe(items, cached, True, cold=False), rounds)
+        print(f"  {f'{fresh} + {cached_n}':<14} {old:>8.2f} ms {exact:>9.2f} ms {near:>13.2f} ms {warm:>13.2f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
@@ -0,0 +1,106 @@
+"""Benchmark: per-request search overhead, before vs after pooled sessions.
+
+Serves a small result page over local HTTPS (self-signed certificate made with
+the openssl CLI) and times one engine fetch the old way — dependency imports
+plus a fresh httpx.AsyncClient, i.e. a new TCP + TLS handshake — against the
+cached dependencies and the app-lifetime pooled client.
+
+    python tests/bench_search_http.py [requests]
+"""
+import os
+import ssl
+import sys
+import time
+import asyncio
+import tempfile
+import statistics
+import subprocess
+
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import web_search
+from utils.search_http import SearchSessions
+
+PAGE = "<html><body>" + "<div class='b_algo'><h2><a href='https://e.com/{0}'>t{0}</a></h2><p>b</p></div>" * 10 + "</body></html>"
+
+
+def make_cert(directory: str) -> tuple[str, str]:
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    return cert, key
+
+
+def old_style_imports():
+    # What every request used to execute before the handler did any work
+    import httpx
+    from bs4 import BeautifulSoup
+    try:
+        from duckduckgo_search import DDGS
+    except ImportError:
+        pass  # the old handler then ran `pip install` here, taking seconds
+    try:
+        import curl_cffi.requests
+    except ImportError:
+        pass
+    return httpx, BeautifulSoup
+
+
+async def timed(label: str, fetch, requests: int) -> float:
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        await fetch()
+        samples.append(time.perf_counter() - start)
+    median = statistics.median(samples)
+    print(f"  {label:<36} median {median * 1e3:7.2f} ms   p95 {sorted(samples)[int(requests * 0.95) - 1] * 1e3:7.2f} ms")
+    return median
+
+
+async def main(requests: int) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        ctx = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+        ctx.load_cert_chain(*make_cert(directory))
+
+        app = web.Application()
+        app.router.add_get("/search", lambda request: web.Response(text=PAGE, content_type="text/html"))
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ctx)
+        await site.start()
+        url = f"https://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/search"
+
+        deps, _ = web_search.resolve_dependencies()
+        deps = {**deps, "AsyncSession": None}  # compare the httpx path on both sides
+        headers = web_search.BASE_HEADERS.copy()
+
+        async def before():
+            httpx, _ = old_style_imports()
+            async with httpx.AsyncClient(timeout=10, verify=False) as client:
+                await client.get(url, params={"q": "x"}, headers=headers)
+
+        sessions = SearchSessions(pool_size=20)
+        await sessions.start(deps)
+        web_search.search_sessions = sessions
+
+        async def after():
+            web_search.resolve_dependencies()
+            await web_search._fetch_html(deps, url, {"q": "x"}, headers, 10, [], "Bench")
+
+        print(f"Per-request fetch over local HTTPS ({requests} sequential requests, h2 installed: {sessions.http2}):")
+        slow = await timed("imports + new client (before)", before, requests)
+        fast = await timed("cached deps + pooled client (after)", after, requests)
+        print(f"  speedup {slow / fast:.1f}x")
+
+        await sessions.aclose()
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
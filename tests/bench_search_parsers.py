@@ -0,0 +1,57 @@
+"""Benchmark: engine-specific lxml extractors vs the generic BeautifulSoup parser.
+
+Parses the result pages in tests/fixtures/search and reports the median
+parse time per page. <engine>_synthetic.html are hand-built pages that mimic
+each engine's markup, so their timings are indicative only; real pages saved
+with tests/capture_serp.py under captured/ are benchmarked too when present.
+
+    python tests/bench_search_parsers.py [rounds]
+"""
+import os
+import sys
+import time
+import statistics
+
+from bs4 import BeautifulSoup
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_parsers import EXTRACTORS, generic_parse
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search")
+CAPTURED = os.path.join(FIXTURES, "captured")
+
+
+def median_ms(fn, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e3
+
+
+def pages(engine: str) -> list[str]:
+    found = [os.path.join(FIXTURES, f"{engine.lower()}_synthetic.html")]
+    if os.path.isdir(CAPTURED):
+        found += [os.path.join(CAPTURED, name) for name in sorted(os.listdir(CAPTURED))
+                  if name.startswith(f"{engine.lower()}-")]
+    return found
+
+
+def main(rounds: int) -> None:
+    print(f"Parse time per result page (median of {rounds}):")
+    print(f"  {'page':<28} {'size':>8} {'generic (bs4)':>15} {'extractor (lxml)':>18} {'speedup':>8}")
+    for engine, extractor in EXTRACTORS.items():
+        for path in pages(engine):
+            with open(path, encoding="utf-8") as f:
+                html = f.read()
+            generic = median_ms(lambda: generic_parse(html, engine, BeautifulSoup), rounds)
+            fast = median_ms(lambda: extractor(html), rounds)
+            name = os.path.basename(path)
+            print(f"  {name:<28} {len(html) // 1024:>6}KB {generic:>12.2f} ms {fast:>15.2f} ms {generic / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
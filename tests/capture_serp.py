@@ -0,0 +1,55 @@
+"""Capture a real search result page as a parser fixture.
+
+Fetches one result page with the same URL, parameters and headers the
+engines in utils/web_search.py use, and saves it to
+tests/fixtures/search/captured/<engine>-<label>.html. Before saving, the
+script removes <script>/<noscript> blocks, because they carry session
+tokens and tracking IDs and the extractors never read them. Check the
+saved page for anything else personal before committing it.
+
+test_search_parsers.py runs every capture in that directory through the
+engine extractor and the generic parser. The *_synthetic.html pages next
+to it are hand-built, not captures.
+
+    python tests/capture_serp.py bing "excel pivot table" [label]
+    python tests/capture_serp.py baidu "excel 透视表" [label]
+"""
+import os
+import re
+import sys
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.web_search import BASE_HEADERS
+
+CAPTURED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search", "captured")
+
+ENGINES = {
+    "bing": ("https://www.bing.com/search", lambda q: {"q": q, "first": 1, "count": 10, "setmkt": "en-US"}, {}),
+    "baidu": ("https://www.baidu.com/s", lambda q: {"wd": q}, {"Host": "www.baidu.com"}),
+}
+
+_SCRIPTS = re.compile(r"<(script|noscript)\b[^>]*>.*?</\1\s*>", re.S | re.I)
+
+
+def capture(engine: str, query: str, label: str) -> str:
+    url, params, extra_headers = ENGINES[engine]
+    # brotli is optional: only ask for encodings httpx can always decode
+    headers = {**BASE_HEADERS, **extra_headers, "Accept-Encoding": "gzip, deflate"}
+    resp = httpx.get(url, params=params(query), headers=headers, timeout=20, follow_redirects=True)
+    resp.raise_for_status()
+    os.makedirs(CAPTURED, exist_ok=True)
+    path = os.path.join(CAPTURED, f"{engine}-{label}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_SCRIPTS.sub("", resp.text))
+    return path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ENGINES:
+        sys.exit(__doc__)
+    slug = sys.argv[3] if len(sys.argv) > 3 else re.sub(r"\W+", "-", sys.argv[2]).strip("-").lower()
+    print(capture(sys.argv[1], sys.argv[2], slug))
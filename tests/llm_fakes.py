@@ -0,0 +1,42 @@
+"""Test helpers: fake the LLM upstream behind both gateway backends.
+
+Requests with an api_base go through the built-in OpenAI-compatible client,
+the rest through LiteLLM; patching both routes every upstream call to the fake.
+fake_response / fake_stream / stream_chunk build the response shapes the
+gateway reads (choices[0].message.content and choices[0].delta.content).
+"""
+import os
+import sys
+from contextlib import contextmanager
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from utils import openai_compat
+
+
+@contextmanager
+def patch_upstream(side_effect):
+    mock = AsyncMock(side_effect=side_effect)
+    with patch.object(openai_compat, "acompletion", mock), \
+         patch.object(llm_client.load_litellm(), "acompletion", mock):
+        yield mock
+
+
+def fake_response(content):
+    message = SimpleNamespace(content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+
+def stream_chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+
+def fake_stream(parts):
+    async def gen():
+        for part in parts:
+            yield stream_chunk(part)
+    return gen()
@@ -0,0 +1,41 @@
+"""Test helpers: fake search engines for the web search tests.
+
+DEPS stands in for the resolved optional dependencies, item builds one
+search result, and engine builds an engine coroutine that answers after a
+delay with fixed results or a SearchEngineError. engines patches
+web_search.ENGINES with the given fakes only.
+"""
+import os
+import sys
+import asyncio
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import web_search
+
+DEPS = {"DDGS": object(), "BeautifulSoup": object(), "httpx": None, "AsyncSession": None}
+
+
+def item(n, host="a.com"):
+    return {"title": f"t{n}", "href": f"https://{host}/{n}", "body": f"b{n}"}
+
+
+def engine(delay, items=(), error=None, log=None, name=None):
+    """Engine answering after `delay`; appends `name` to `log` when cancelled."""
+    async def run(deps, query, page, max_results, needed):
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append(name)
+            raise
+        if error:
+            raise web_search.SearchEngineError(error)
+        return list(items)
+    return run
+
+
+def engines(**fns):
+    return patch.dict(web_search.ENGINES, {name: (fn, "DDGS") for name, fn in fns.items()}, clear=True)
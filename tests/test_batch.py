@@ -0,0 +1,110 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, patch_upstream
+from utils.batch import BatchRun, active_batches
+from utils.llm_ratelimit import rate_limiters
+
+UNLIMITED = {"OpenRouter": {"rate": 10000, "burst": 10000, "max_concurrency": 1000}}
+
+
+class TestBatchEndpoint(unittest.IsolatedAsyncioTestCase):
+    async def test_bounded_parallel_ndjson_with_partial_failures(self):
+        inflight = peak = 0
+
+        async def fake(**kwargs):
+            nonlocal inflight, peak
+            inflight += 1
+            peak = max(peak, inflight)
+            try:
+                await asyncio.sleep(0.02)
+                user = kwargs["messages"][-1]["content"]
+                if "FAIL" in user:
+                    raise RuntimeError("upstream error")
+                return fake_response(user[-8:])
+            finally:
+                inflight -= 1
+
+        jobs = [
+            {"task": "translation", "fields": {"content": f"email-{i:02d}", "target_lang": "English"}, "api_key": "k"}
+            for i in range(12)
+        ]
+        jobs[3]["fields"]["content"] = "FAIL"
+        jobs.append({"task": "explain", "language": "py", "content": "code-x=1", "api_key": "k"})
+        jobs.append({"task": "excel_gen", "fields": {"content": "sales"}, "api_key": "k"})
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with patch_upstream(fake), \
+                 patch.dict(rate_limiters.limits, UNLIMITED):
+                resp = await client.post("/api/batch/generate", json={"jobs": jobs, "concurrency": 3})
+
+        self.assertTrue(resp.headers["content-type"].startswith("application/x-ndjson"))
+        self.assertIn("x-batch-id", resp.headers)
+        lines = [json.loads(line) for line in resp.text.splitlines()]
+        results, summary = {r["index"]: r for r in lines[:-1]}, lines[-1]
+
+        self.assertEqual(sorted(results), list(range(len(jobs))))
+        self.assertLessEqual(peak, 3)
+        self.assertEqual(results[0]["result"], "email-00")
+        self.assertEqual(results[12]["result"], "code-x=1")
+        self.assertEqual((results[3]["ok"], results[3]["error"]), (False, "upstream error"))
+        self.assertFalse(results[13]["ok"])
+        self.assertEqual((summary["done"], summary["total"]), (True, 14))
+        self.assertEqual((summary["succeeded"], summary["failed"], summary["cancelled"]), (12, 2, 0))
+        self.assertNotIn(summary["batch_id"], active_batches)
+
+    async def test_rejects_empty_batch(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/api/batch/generate", json={"jobs": []})
+            missing = await client.post("/api/batch/unknown/cancel")
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(missing.status_code, 404)
+
+
+class TestBatchRun(unittest.IsolatedAsyncioTestCase):
+    async def test_cancel_stops_pending_and_inflight_jobs(self):
+        interrupted = 0
+
+        def job(delay):
+            async def run():
+                nonlocal interrupted
+                try:
+                    await asyncio.sleep(delay)
+                    return delay
+                except asyncio.CancelledError:
+                    interrupted += 1
+                    raise
+            return run
+
+        run = BatchRun([job(0.01)] + [job(5) for _ in range(9)], concurrency=2)
+        self.assertNotIn(run.id, active_batches)  # registered once results() starts, not on construction
+        results = run.results()
+        first = await results.__anext__()
+        self.assertIs(active_batches[run.id], run)
+        self.assertEqual((first["index"], first["ok"]), (0, True))
+
+        run.cancel()
+        rest = [item async for item in results]
+        cancelled = [item for item in rest if item.get("cancelled") is True]
+        self.assertEqual(len(cancelled), 9)
+        self.assertEqual(rest[-1]["cancelled"], 9)
+        await asyncio.sleep(0)
+        self.assertEqual(interrupted, 2)  # the two in-flight jobs; the rest never started
+        self.assertNotIn(run.id, active_batches)
+
+
+if __name__ == '__main__':
+    unittest.main()
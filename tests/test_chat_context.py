@@ -0,0 +1,113 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, fake_stream, patch_upstream
+from utils import chat_context
+from utils.chat_context import fit_messages
+
+MODEL = "gpt-3.5-turbo"
+
+
+def make_history(turns):
+    messages = [{"role": "system", "content": "你是 Office AI Mate。以下是文档内容：季度报告。"}]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"问题 {i}: " + "请详细说明这一部分的内容。" * 20})
+        messages.append({"role": "assistant", "content": f"回答 {i}: " + "这一部分主要讲述了业务进展。" * 20})
+    messages.append({"role": "user", "content": "最后一个问题"})
+    return messages
+
+
+class TestFitMessages(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        chat_context._summary_cache.clear()
+
+    async def test_under_budget_unchanged(self):
+        messages = make_history(1)
+        fitted, report = await fit_messages("OpenAI", MODEL, "k", messages, budget=100000)
+        self.assertEqual(fitted, messages)
+        self.assertEqual(report["tokens_saved"], 0)
+
+    async def test_truncate_keeps_system_and_latest_turns(self):
+        messages = make_history(10)
+        fitted, report = await fit_messages("OpenAI", MODEL, "k", messages, budget=600)
+        self.assertEqual(fitted[0], messages[0])
+        self.assertEqual(fitted[-2:], messages[-2:])
+        self.assertLess(len(fitted), len(messages))
+        self.assertLessEqual(report["tokens_sent"], 600)
+        self.assertEqual(report["tokens_original"] - report["tokens_sent"], report["tokens_saved"])
+        self.assertEqual(report["dropped_messages"], len(messages) - len(fitted))
+
+    async def test_latest_turns_kept_even_over_budget(self):
+        messages = make_history(3)
+        fitted, _ = await fit_messages("OpenAI", MODEL, "k", messages, budget=10)
+        self.assertEqual(fitted, [messages[0]] + messages[-2:])
+
+    async def test_input_limit_uses_resolved_model_and_is_memoized(self):
+        chat_context._model_input_limit.cache_clear()
+        with patch.object(chat_context, "_model_input_limit", wraps=chat_context._model_input_limit) as limit:
+            for _ in range(2):
+                await fit_messages("SiliconCloud", "Qwen/Qwen2.5-7B-Instruct", "k", make_history(1), budget=100000)
+        limit.assert_called_with("openai/Qwen/Qwen2.5-7B-Instruct")
+        self.assertEqual(chat_context._model_input_limit.cache_info().misses, 1)
+
+    async def test_running_summary_is_cached_and_extended(self):
+        summaries = []
+
+        async def fake(**kwargs):
+            summaries.append(kwargs["messages"][0]["content"])
+            return fake_response(f"摘要{len(summaries)}")
+
+        with patch_upstream(fake):
+            messages = make_history(10)
+            fitted, report = await fit_messages("OpenAI", MODEL, "k", messages, budget=1200, strategy="summarize")
+            self.assertTrue(report["summarized"])
+            self.assertIn("摘要1", fitted[1]["content"])
+
+            # Same conversation again: summary served from cache
+            await fit_messages("OpenAI", MODEL, "k", messages, budget=1200, strategy="summarize")
+            self.assertEqual(len(summaries), 1)
+
+            # Conversation grows: only the newly dropped turns are summarized on top of the old summary
+            longer = messages[:-1] + [
+                {"role": "assistant", "content": "好的。" * 100},
+                {"role": "user", "content": "再问一个" * 100},
+                {"role": "assistant", "content": "继续。" * 100},
+                {"role": "user", "content": "最后"},
+            ]
+            fitted, _ = await fit_messages("OpenAI", MODEL, "k", longer, budget=1200, strategy="summarize")
+            self.assertEqual(len(summaries), 2)
+            self.assertIn("摘要1", summaries[1])
+            self.assertIn("摘要2", fitted[1]["content"])
+
+
+class TestChatEndpointContext(unittest.IsolatedAsyncioTestCase):
+    async def test_chat_reports_token_usage(self):
+        sent = {}
+
+        async def fake(**kwargs):
+            sent["messages"] = kwargs["messages"]
+            return fake_stream(["ok"])
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with patch_upstream(fake):
+                resp = await client.post("/api/chat", json={
+                    "messages": make_history(10), "model": MODEL, "api_key": "k", "context_budget": 600,
+                })
+        self.assertEqual(resp.text, "ok")
+        self.assertGreater(int(resp.headers["X-Context-Tokens-Saved"]), 0)
+        self.assertLessEqual(int(resp.headers["X-Context-Tokens-Sent"]), 600)
+        self.assertEqual(len(sent["messages"]), len(make_history(10)) - int(resp.headers["X-Context-Dropped-Messages"]))
+
+
+if __name__ == '__main__':
+    unittest.main()
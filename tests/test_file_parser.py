@@ -0,0 +1,93 @@
+import io
+import os
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.pdfgen import canvas
+
+import utils.file_parser as file_parser
+from utils.file_parser import parse_file, parse_pdf
+
+
+def make_pdf(pages: int) -> bytes:
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf)
+    for n in range(1, pages + 1):
+        pdf.drawString(72, 720, f"Page {n} heading")
+        pdf.drawString(72, 700, f"Body line for page {n}")
+        pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
+
+
+class NamedBytesIO(io.BytesIO):
+    name = "report.pdf"
+
+
+class TestParsePdf(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data = make_pdf(20)
+        cls.executor = ProcessPoolExecutor(max_workers=2)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.executor.shutdown()
+
+    def test_parallel_output_matches_sequential_in_page_order(self):
+        sequential = parse_pdf(io.BytesIO(self.data))
+        with mock.patch.object(file_parser, "PDF_PAGES_PER_TASK", 3):
+            parallel = parse_pdf(NamedBytesIO(self.data), executor=self.executor)
+        self.assertEqual(parallel, sequential)
+        headings = [line for line in parallel.splitlines() if line.endswith("heading")]
+        self.assertEqual(headings, [f"Page {n} heading" for n in range(1, 21)])
+
+    def test_page_range_and_max_pages(self):
+        text = parse_pdf(io.BytesIO(self.data), page_range=(5, 8))
+        self.assertIn("Page 5 heading", text)
+        self.assertIn("Page 8 heading", text)
+        self.assertNotIn("Page 4 heading", text)
+        self.assertNotIn("Page 9 heading", text)
+
+        with mock.patch.object(file_parser, "PDF_PAGES_PER_TASK", 2):
+            capped = parse_pdf(io.BytesIO(self.data), page_range=(15, 99), max_pages=3, executor=self.executor)
+        self.assertEqual([line for line in capped.splitlines() if line.endswith("heading")],
+                         ["Page 15 heading", "Page 16 heading", "Page 17 heading"])
+        self.assertEqual(parse_pdf(io.BytesIO(self.data), page_range=(30, 40)), "")
+
+    def test_real_file_path_is_used_without_temp_copy(self):
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(self.data)
+        try:
+            with open(tmp.name, "rb") as f, mock.patch.object(tempfile, "NamedTemporaryFile") as temp_file:
+                text = parse_pdf(f, executor=self.executor)
+            temp_file.assert_not_called()
+            self.assertIn("Page 20 heading", text)
+        finally:
+            os.unlink(tmp.name)
+
+    def test_small_pdf_stays_in_process(self):
+        with mock.patch.object(file_parser, "pdf_pool") as pool:
+            text = parse_file(NamedBytesIO(make_pdf(3)))
+        pool.assert_not_called()
+        self.assertIn("Body line for page 3", text)
+
+    def test_broken_pool_falls_back_to_in_process(self):
+        broken = mock.Mock()
+        broken.submit.side_effect = BrokenProcessPool("worker died")
+        text = parse_pdf(NamedBytesIO(self.data), page_range=(2, 3), executor=broken)
+        self.assertEqual(text, parse_pdf(io.BytesIO(self.data), page_range=(2, 3)))
+
+    def test_invalid_pdf_reports_error(self):
+        self.assertTrue(parse_pdf(io.BytesIO(b"not a pdf")).startswith("[PDF Parsing Error:"))
+
+
+if __name__ == "__main__":
+    unittest.main()
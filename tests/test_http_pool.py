@@ -0,0 +1,101 @@
+import os
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from aiohttp import web
+from fastapi.testclient import TestClient
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import patch_upstream
+from utils.http_pool import HTTPClientPool, http_pools
+
+
+class TestHTTPClientPool(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def handler(request):
+            return web.json_response({"ok": True})
+
+        web_app = web.Application()
+        web_app.router.add_post("/v1/chat/completions", handler)
+        self.runner = web.AppRunner(web_app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+        self.pool = HTTPClientPool(pool_size=4, keepalive=30, base_urls=[self.base_url])
+
+    async def asyncTearDown(self):
+        await self.pool.aclose()
+        await self.runner.cleanup()
+
+    async def test_connections_are_reused(self):
+        await self.pool.start()
+        for _ in range(10):
+            session = self.pool.get_session("Custom", self.base_url)
+            async with session.post(self.base_url + "/chat/completions", json={}) as resp:
+                self.assertEqual(resp.status, 200)
+                await resp.read()
+
+        stats = next(p for p in self.pool.stats()["pools"] if p["provider"] == "Custom")
+        self.assertEqual(stats["requests"], 10)
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["connections_reused"], 9)
+
+    async def test_same_session_per_provider_and_base_url(self):
+        await self.pool.start()
+        a = self.pool.get_session("OpenRouter", "https://openrouter.ai/api/v1")
+        b = self.pool.get_session("OpenRouter", "https://openrouter.ai/api/v1/")
+        c = self.pool.get_session("SiliconCloud", "https://api.siliconflow.cn/v1")
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+
+    async def test_unknown_base_urls_are_not_pooled(self):
+        await self.pool.start()
+        for n in range(5):
+            self.assertIsNone(self.pool.get_session("OpenAI", f"https://llm{n}.example.com/v1"))
+        self.assertIsNone(self.pool.get_session("NoSuchProvider", None))
+        self.assertIsNotNone(self.pool.get_session("OpenAI", None))
+        self.assertIsNotNone(self.pool.get_session("Custom", self.base_url + "/"))
+        self.assertEqual(len(self.pool.stats()["pools"]), len(self.pool._sessions))
+        self.assertNotIn("https://llm0.example.com/v1", {p["base_url"] for p in self.pool.stats()["pools"]})
+
+    async def test_not_started_returns_none(self):
+        self.assertIsNone(self.pool.get_session("OpenRouter", "https://openrouter.ai/api/v1"))
+
+    async def test_gateway_passes_shared_session(self):
+        captured = {}
+
+        async def fake(**kwargs):
+            captured.update(kwargs)
+            message = SimpleNamespace(content="ok")
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+        with patch.object(llm_client, "http_pools", self.pool), \
+             patch_upstream(fake):
+            await llm_client.acall_llm("OpenRouter", "m", "k", [{"role": "user", "content": "a"}])
+            self.assertNotIn("shared_session", captured)
+
+            await self.pool.start()
+            await llm_client.acall_llm("OpenRouter", "m", "k", [{"role": "user", "content": "b"}])
+            self.assertIs(captured["shared_session"],
+                          self.pool.get_session("OpenRouter", "https://openrouter.ai/api/v1"))
+
+
+class TestPoolLifespan(unittest.TestCase):
+    def test_lifespan_starts_and_closes_pools(self):
+        with TestClient(app) as client:
+            stats = client.get("/api/llm/pool/stats").json()
+            self.assertTrue(stats["started"])
+            self.assertIn("OpenRouter", {p["provider"] for p in stats["pools"]})
+        self.assertFalse(http_pools.started)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+import os
+import sys
+import asyncio
+import time
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Adjust path to import api_server
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, fake_stream, patch_upstream
+from utils.llm_cache import LLMResponseCache, make_cache_key, response_cache
+
+
+class TestLLMResponseCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = LLMResponseCache(max_entries=2, ttl=60)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")          # "a" becomes most recently used
+        cache.set("c", "3")     # evicts "b"
+        self.assertEqual(cache.get("a"), "1")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_ttl_expiry(self):
+        cache = LLMResponseCache(max_entries=10, ttl=0.05)
+        cache.set("k", "v")
+        self.assertEqual(cache.get("k"), "v")
+        time.sleep(0.1)
+        self.assertIsNone(cache.get("k"))
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_disk_tier_survives_restart(self):
+        fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        try:
+            LLMResponseCache(max_entries=10, ttl=60, db_path=db_path).set("k", "persisted")
+            reopened = LLMResponseCache(max_entries=10, ttl=60, db_path=db_path)
+            self.assertEqual(reopened.get("k"), "persisted")
+            self.assertEqual(reopened.stats()["disk_hits"], 1)
+            self.assertEqual(reopened.get("k"), "persisted")
+            self.assertEqual(reopened.stats()["memory_hits"], 1)
+        finally:
+            os.remove(db_path)
+
+    def test_async_disk_tier_runs_off_loop(self):
+        fd, db_path = tempfile.mkstemp(suffix=".sqlite3")
+        os.close(fd)
+        disk_threads = []
+        try:
+            cache = LLMResponseCache(max_entries=10, ttl=60, db_path=db_path)
+            for name in ("_disk_get", "_disk_set"):
+                original = getattr(cache, name)
+
+                def traced(*args, _original=original):
+                    disk_threads.append(threading.current_thread())
+                    return _original(*args)
+                setattr(cache, name, traced)
+
+            async def roundtrip():
+                self.assertIsNone(await cache.aget("k"))
+                await cache.aset("k", "v")
+                cache._memory.clear()  # force the next read to the disk tier
+                return await cache.aget("k")
+
+            self.assertEqual(asyncio.run(roundtrip()), "v")
+            self.assertEqual(len(disk_threads), 3)
+            self.assertNotIn(threading.main_thread(), disk_threads)
+            stats = cache.stats()
+            self.assertEqual((stats["disk_hits"], stats["misses"]), (1, 1))
+        finally:
+            os.remove(db_path)
+
+    def test_key_normalizes_messages_and_ignores_credentials(self):
+        base = {"model": "openai/m", "api_base": "https://x/v1", "temperature": 0.2}
+        k1 = make_cache_key("OpenRouter", {**base, "api_key": "a", "messages": [{"role": "user", "content": " hi\r\n"}]})
+        k2 = make_cache_key("OpenRouter", {**base, "api_key": "b", "stream": True, "messages": [{"role": "user", "content": "hi"}]})
+        k3 = make_cache_key("OpenRouter", {**base, "temperature": 0.9, "messages": [{"role": "user", "content": "hi"}]})
+        self.assertEqual(k1, k2)
+        self.assertNotEqual(k1, k3)
+
+
+class TestEndpointCaching(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        transport = httpx.ASGITransport(app=app)
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://test")
+        response_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_mindmap_served_from_cache(self):
+        async def fake(**kwargs):
+            return fake_response("mindmap\n  root((T))")
+
+        body = {"topic": "季度复盘", "api_key": "k"}
+        with patch_upstream(fake) as mock_llm:
+            first = await self.client.post("/api/generate/mindmap", json=body)
+            second = await self.client.post("/api/generate/mindmap", json=body)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(mock_llm.call_count, 1)
+
+        stats = (await self.client.get("/api/llm/cache/stats")).json()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    async def test_streamed_creative_template_cached(self):
+        async def fake(**kwargs):
+            return fake_stream(["周报", "内容"])
+
+        body = {"task": "weekly_report", "fields": {"content": "开发"}, "api_key": "k"}
+        with patch_upstream(fake) as mock_llm:
+            first = await self.client.post("/api/generate/creative", json=body)
+            second = await self.client.post("/api/generate/creative", json=body)
+        self.assertEqual(first.text, "周报内容")
+        self.assertEqual(second.text, "周报内容")
+        self.assertEqual(mock_llm.call_count, 1)
+
+    async def test_chat_not_cached(self):
+        async def fake(**kwargs):
+            return fake_stream(["hi"])
+
+        body = {"messages": [{"role": "user", "content": "hello"}], "api_key": "k"}
+        with patch_upstream(fake) as mock_llm:
+            await self.client.post("/api/chat", json=body)
+            await self.client.post("/api/chat", json=body)
+        self.assertEqual(mock_llm.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+import random
+import asyncio
+import threading
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Adjust path to import api_server
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, patch_upstream
+from utils.llm_cache import response_cache
+from utils.llm_ratelimit import rate_limiters
+
+LLM_DELAY = 0.3  # simulated upstream round trip (seconds)
+
+
+async def slow_acompletion(**kwargs):
+    await asyncio.sleep(LLM_DELAY)
+    return fake_response("mindmap\n  root((Topic))\n    A\n    B")
+
+
+def blocking_completion(**kwargs):
+    raise AssertionError("synchronous litellm.completion must not be used by API endpoints")
+
+
+class TestAsyncGateway(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        transport = httpx.ASGITransport(app=app)
+        self.client = httpx.AsyncClient(transport=transport, base_url="http://test")
+        response_cache.clear()
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_parallel_mindmaps_do_not_block_event_loop(self):
+        n = 8
+        with patch_upstream(slow_acompletion), \
+             patch.object(llm_client.load_litellm(), "completion", side_effect=blocking_completion):
+            start = time.perf_counter()
+            responses = await asyncio.gather(*[
+                self.client.post("/api/generate/mindmap", json={"topic": f"topic {i}", "api_key": "k"})
+                for i in range(n)
+            ])
+            elapsed = time.perf_counter() - start
+
+        for resp in responses:
+            self.assertEqual(resp.status_code, 200)
+            self.assertTrue(resp.json()["code"].startswith("mindmap"))
+        # Sequential execution would take n * LLM_DELAY
+        self.assertLess(elapsed, LLM_DELAY * 3)
+
+    async def test_all_blocking_endpoints_use_async_gateway(self):
+        cases = [
+            ("/api/generate/ppt/outline", {"topic": "t", "api_key": "k"}, '{"slides": []}'),
+            ("/api/system/generate_code", {"query": "list files", "api_key": "k"}, "```python\nprint(1)\n```"),
+            ("/api/generate/creative", {"task": "excel_gen", "fields": {"content": "x"}, "api_key": "k"}, "a,b\n1,2"),
+        ]
+        for url, body, content in cases:
+            async def fake(**kwargs):
+                return fake_response(content)
+
+            with patch_upstream(fake) as mock_async, \
+                 patch.object(llm_client.load_litellm(), "completion", side_effect=blocking_completion):
+                resp = await self.client.post(url, json=body)
+            self.assertEqual(resp.status_code, 200, url)
+            self.assertEqual(mock_async.call_count, 1, url)
+
+    async def test_first_native_call_imports_litellm_off_loop(self):
+        litellm = llm_client.load_litellm()
+        import_threads = []
+
+        def slow_import():
+            import_threads.append(threading.current_thread())
+            time.sleep(0.2)
+            return litellm
+
+        async def fake(**kwargs):
+            return fake_response("ok")
+
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        with patch_upstream(fake), patch.object(llm_client, "_litellm", None), \
+             patch.object(llm_client, "load_litellm", side_effect=slow_import):
+            content = await llm_client.acall_llm("OpenAI", "gpt-4o-mini", "k", [{"role": "user", "content": "hi"}])
+        ticking.cancel()
+        self.assertEqual(content, "ok")
+        self.assertEqual(len(import_threads), 1)
+        self.assertIsNot(import_threads[0], threading.main_thread())
+        self.assertGreater(ticks, 5)  # the loop kept running during the import
+
+
+class TestPerRequestCredentials(unittest.IsolatedAsyncioTestCase):
+    async def test_interleaved_tenants_reach_their_own_upstream(self):
+        tenants = [
+            ("OpenRouter", "sk-or-A", None, "https://openrouter.ai/api/v1"),
+            ("SiliconCloud", "sk-sf-B", None, "https://api.siliconflow.cn/v1"),
+            ("OpenAI", "sk-oa-C", None, None),
+            ("OpenAI", "sk-custom-D", "https://llm.internal/v1", "https://llm.internal/v1"),
+        ]
+        env_before = dict(os.environ)
+
+        async def echo_upstream(**kwargs):
+            # Yield in the middle of the call so that requests interleave
+            await asyncio.sleep(random.uniform(0, 0.02))
+            return fake_response(f"{kwargs.get('api_key')}@{kwargs.get('api_base')}")
+
+        jobs = []
+        for i in range(200):
+            provider, key, base_url, _ = tenants[i % len(tenants)]
+            extra = {"api_base": base_url} if base_url else {}
+            jobs.append(llm_client.acall_llm(
+                provider=provider, model="m", api_key=key,
+                messages=[{"role": "user", "content": str(i)}], **extra,
+            ))
+
+        unlimited = {"rate": 10000, "burst": 10000, "max_concurrency": 1000}
+        with patch_upstream(echo_upstream), \
+             patch.dict(rate_limiters.limits, {p: unlimited for p, *_ in tenants}):
+            results = await asyncio.gather(*jobs)
+
+        for i, result in enumerate(results):
+            _, key, _, expected_base = tenants[i % len(tenants)]
+            self.assertEqual(result, f"{key}@{expected_base}")
+        self.assertEqual(dict(os.environ), env_before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+import litellm
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, patch_upstream, stream_chunk
+from utils import llm_hedge
+from utils.openai_compat import OpenAICompatError
+from utils.llm_ratelimit import rate_limiters
+
+POLICY = {
+    "provider": "SiliconCloud",
+    "model": "Qwen/Qwen2.5-7B-Instruct",
+    "api_key": "sk-backup",
+    "api_base": None,
+    "threshold": 0.05,
+    "call_threshold": 0.3,
+}
+
+
+def stream_of(parts, first_delay=0.0, closed=None):
+    async def gen():
+        try:
+            await asyncio.sleep(first_delay)
+            for part in parts:
+                yield stream_chunk(part)
+                await asyncio.sleep(0)
+        finally:
+            if closed is not None:
+                closed.set()
+    return gen()
+
+
+def server_error():
+    response = httpx.Response(503, request=httpx.Request("POST", "http://upstream"))
+    return litellm.ServiceUnavailableError("down", llm_provider="openai", model="m", response=response)
+
+
+def bad_request():
+    response = httpx.Response(400, request=httpx.Request("POST", "http://upstream"))
+    return litellm.BadRequestError("bad prompt", llm_provider="openai", model="m", response=response)
+
+
+class TestHedging(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        for key in llm_hedge.hedge_stats:
+            llm_hedge.hedge_stats[key] = 0
+        patcher = patch.object(llm_hedge, "hedge_policy", POLICY)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def collect(self, content="hi"):
+        messages = [{"role": "user", "content": content}]
+        return "".join([c async for c in llm_client.acall_llm_stream("OpenRouter", "slow/free", "sk-user", messages)])
+
+    async def test_slow_primary_loses_to_secondary_and_is_cancelled(self):
+        primary_closed = asyncio.Event()
+
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                return stream_of(["primary"], first_delay=5, closed=primary_closed)
+            return stream_of(["secondary", "!"])
+
+        start = time.perf_counter()
+        with patch_upstream(upstream):
+            text = await self.collect("slow")
+        self.assertEqual(text, "secondary!")
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertTrue(primary_closed.is_set())
+        self.assertEqual(llm_hedge.hedge_stats["hedged"], 1)
+        self.assertEqual(llm_hedge.hedge_stats["secondary_wins"], 1)
+        self.assertEqual(rate_limiters.stats()["OpenRouter"]["inflight"], 0)
+
+    async def test_fast_primary_never_hedges(self):
+        async def upstream(**kwargs):
+            self.assertEqual(kwargs["api_key"], "sk-user")
+            return stream_of(["fast"])
+
+        with patch_upstream(upstream) as mock_llm:
+            text = await self.collect("fast")
+        self.assertEqual(text, "fast")
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(llm_hedge.hedge_stats["hedged"], 0)
+
+    async def test_hard_error_fails_over_immediately(self):
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                raise server_error()
+            return stream_of(["backup"])
+
+        with patch_upstream(upstream):
+            text = await self.collect("down")
+        self.assertEqual(text, "backup")
+        self.assertEqual(llm_hedge.hedge_stats["failovers"], 1)
+
+    async def test_client_error_is_not_failed_over(self):
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                raise bad_request()
+            return stream_of(["backup"])
+
+        with patch_upstream(upstream) as mock_llm:
+            with self.assertRaises(litellm.BadRequestError):
+                await self.collect("bad")
+        self.assertEqual(mock_llm.call_count, 1)
+
+    async def test_connection_failure_fails_over(self):
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                raise httpx.ConnectError("connection refused")
+            return stream_of(["backup"])
+
+        with patch_upstream(upstream):
+            text = await self.collect("unreachable")
+        self.assertEqual(text, "backup")
+        self.assertEqual(llm_hedge.hedge_stats["failovers"], 1)
+
+    async def test_unexpected_exception_is_not_failed_over(self):
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                raise KeyError("choices")
+            return stream_of(["backup"])
+
+        with patch_upstream(upstream) as mock_llm:
+            with self.assertRaises(KeyError):
+                await self.collect("bug")
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(llm_hedge.hedge_stats["failovers"], 0)
+
+    def test_hard_error_classification(self):
+        self.assertTrue(llm_hedge.is_hard_error(server_error()))
+        self.assertTrue(llm_hedge.is_hard_error(asyncio.TimeoutError()))
+        self.assertTrue(llm_hedge.is_hard_error(OpenAICompatError("stream error event")))
+        self.assertTrue(llm_hedge.is_hard_error(OpenAICompatError("429: slow down", status_code=429)))
+        self.assertFalse(llm_hedge.is_hard_error(OpenAICompatError("400: bad", status_code=400)))
+        self.assertFalse(llm_hedge.is_hard_error(bad_request()))
+        self.assertFalse(llm_hedge.is_hard_error(TypeError("unexpected keyword")))
+
+    async def test_non_streaming_hedge(self):
+        async def upstream(**kwargs):
+            if kwargs["api_key"] == "sk-user":
+                await asyncio.sleep(5)
+                return fake_response("primary")
+            self.assertEqual(kwargs["model"], "openai/Qwen/Qwen2.5-7B-Instruct")
+            return fake_response("secondary")
+
+        with patch_upstream(upstream):
+            result = await llm_client.acall_llm("OpenRouter", "slow/free", "sk-user", [{"role": "user", "content": "x"}])
+        self.assertEqual(result, "secondary")
+        self.assertEqual(rate_limiters.stats()["OpenRouter"]["inflight"], 0)
+
+    async def test_non_streaming_uses_whole_reply_threshold(self):
+        async def upstream(**kwargs):
+            self.assertEqual(kwargs["api_key"], "sk-user")
+            await asyncio.sleep(0.1)  # slower than the first-token threshold, within the call threshold
+            return fake_response("primary")
+
+        with patch_upstream(upstream) as mock_llm:
+            result = await llm_client.acall_llm("OpenRouter", "long/gen", "sk-user", [{"role": "user", "content": "z"}])
+        self.assertEqual(result, "primary")
+        self.assertEqual(mock_llm.call_count, 1)
+        self.assertEqual(llm_hedge.hedge_stats["hedged"], 0)
+
+    async def test_hedge_disabled_per_call(self):
+        async def upstream(**kwargs):
+            await asyncio.sleep(0.1)
+            return fake_response(kwargs["api_key"])
+
+        with patch_upstream(upstream):
+            result = await llm_client.acall_llm("OpenRouter", "m", "sk-user", [{"role": "user", "content": "y"}], hedge=False)
+        self.assertEqual(result, "sk-user")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import sys
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import patch_upstream, stream_chunk
+from utils.llm_metrics import OTHER_MODEL, Histogram, LLMMetrics, llm_metrics
+from utils.llm_ratelimit import rate_limiters
+
+
+def usage(prompt, completion):
+    return SimpleNamespace(prompt_tokens=prompt, completion_tokens=completion)
+
+
+class TestHistogram(unittest.TestCase):
+    def test_quantiles_and_cumulative_buckets(self):
+        h = Histogram((1, 2, 5))
+        for value in (0.5, 0.5, 1.5, 4, 10):
+            h.observe(value)
+        snap = h.snapshot()
+        self.assertEqual(snap["buckets"], {"1": 2, "2": 3, "5": 4, "+Inf": 5})
+        self.assertEqual(snap["count"], 5)
+        self.assertLessEqual(snap["p50"], 2)
+        self.assertEqual(snap["p99"], 5)
+        self.assertIsNone(Histogram((1,)).snapshot()["p50"])
+
+
+class TestCallMetrics(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        llm_metrics.clear()
+
+    async def test_stream_records_ttft_gaps_and_throughput(self):
+        async def fake(**kwargs):
+            async def gen():
+                await asyncio.sleep(0.05)
+                for part in ["a", "b", "c", "d"]:
+                    yield stream_chunk(part)
+                    await asyncio.sleep(0.01)
+                yield SimpleNamespace(choices=[], usage=usage(30, 8))
+            return gen()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with patch_upstream(fake):
+                resp = await client.post("/api/chat", json={
+                    "messages": [{"role": "user", "content": "hi"}], "api_key": "k",
+                    "provider": "OpenRouter", "model": "fast/model",
+                })
+                self.assertEqual(resp.text, "abcd")
+                metrics = (await client.get("/api/llm/metrics", params={"model": "openai/fast/model"})).json()
+
+        [series] = metrics["series"]
+        self.assertEqual((series["provider"], series["endpoint"]), ("OpenRouter", "/api/chat"))
+        self.assertEqual((series["calls"], series["errors"]), (1, 0))
+        self.assertEqual((series["prompt_tokens"], series["completion_tokens"]), (30, 8))
+        self.assertEqual(series["ttft_seconds"]["count"], 1)
+        self.assertGreaterEqual(series["ttft_seconds"]["sum"], 0.05)
+        self.assertEqual(series["inter_token_seconds"]["count"], 3)
+        self.assertEqual(series["tokens_per_second"]["count"], 1)
+        self.assertGreater(series["tokens_per_second"]["sum"], 50)
+
+    async def test_queue_time_and_errors(self):
+        async def slow(**kwargs):
+            await asyncio.sleep(0.1)
+            if kwargs["messages"][0]["content"] == "boom":
+                raise ValueError("upstream failed")
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))],
+                                   usage=usage(5, 2))
+
+        limits = {"OpenAI": {"rate": 1000, "burst": 1000, "max_concurrency": 1}}
+        with patch_upstream(slow), \
+             patch.dict(rate_limiters.limits, limits):
+            results = await asyncio.gather(
+                llm_client.acall_llm("OpenAI", "gpt-4o", "k", [{"role": "user", "content": "x"}]),
+                llm_client.acall_llm("OpenAI", "gpt-4o", "k", [{"role": "user", "content": "boom"}]),
+                return_exceptions=True,
+            )
+
+        self.assertEqual(results[0], "ok")
+        self.assertIsInstance(results[1], ValueError)
+        [series] = llm_metrics.stats(provider="OpenAI")
+        self.assertEqual(series["endpoint"], "-")
+        self.assertEqual((series["calls"], series["errors"]), (2, 1))
+        self.assertEqual(series["queue_seconds"]["count"], 2)
+        self.assertGreaterEqual(series["queue_seconds"]["sum"], 0.09)  # one call waited for the other
+        self.assertEqual(series["ttft_seconds"]["count"], 0)
+
+    def test_unknown_models_beyond_cap_share_other_series(self):
+        metrics = LLMMetrics(max_models=2)
+        for model in ["a", "b", "c", "d", "a"]:
+            metrics.start_call("OpenRouter", model).finish()
+        metrics.start_call("OpenAI", "e").finish()
+        calls = {(s["provider"], s["model"]): s["calls"] for s in metrics.stats()}
+        self.assertEqual(calls, {("OpenRouter", "a"): 2, ("OpenRouter", "b"): 1,
+                                 ("OpenRouter", OTHER_MODEL): 2, ("OpenAI", "e"): 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+import litellm
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, patch_upstream, stream_chunk
+from utils.llm_ratelimit import (
+    ProviderLimiter, TokenBucket, rate_limiters, retry_after_seconds,
+)
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "http://upstream"))
+    return litellm.RateLimitError("slow down", llm_provider="openai", model="m", response=response)
+
+
+class TestLimiterPrimitives(unittest.IsolatedAsyncioTestCase):
+    async def test_token_bucket_smooths_rate(self):
+        bucket = TokenBucket(rate=20, burst=2)
+        start = time.perf_counter()
+        for _ in range(6):
+            await bucket.acquire()
+        # 2 from the burst, 4 more at 20/s
+        self.assertGreaterEqual(time.perf_counter() - start, 0.18)
+
+    async def test_aimd_halves_on_throttle_and_grows_on_success(self):
+        limiter = ProviderLimiter(rate=1000, burst=1000, max_concurrency=8)
+        await limiter.acquire()
+        await limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 4)
+        for _ in range(8):
+            await limiter.acquire()
+            await limiter.release()
+        self.assertGreater(limiter.limit, 5)
+        self.assertLessEqual(limiter.limit, 8)
+
+    async def test_burst_of_throttles_halves_once_per_interval(self):
+        limiter = ProviderLimiter(rate=1000, burst=1000, max_concurrency=16, decrease_interval=0.05)
+        for _ in range(8):
+            await limiter.acquire()
+        for _ in range(8):  # one overload event seen by every in-flight request
+            await limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 8)
+        self.assertEqual(limiter.throttled, 8)
+        await asyncio.sleep(0.06)
+        await limiter.acquire()
+        await limiter.release(throttled=True)
+        self.assertEqual(limiter.limit, 4)
+
+    async def test_queue_depth_and_concurrency_cap(self):
+        limiter = ProviderLimiter(rate=1000, burst=1000, max_concurrency=2)
+        peak = 0
+
+        async def job():
+            nonlocal peak
+            await limiter.acquire()
+            peak = max(peak, limiter.inflight)
+            await asyncio.sleep(0.02)
+            await limiter.release()
+
+        tasks = [asyncio.ensure_future(job()) for _ in range(6)]
+        await asyncio.sleep(0.005)
+        self.assertEqual(limiter.stats()["queue_depth"], 4)
+        await asyncio.gather(*tasks)
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.stats()["queue_depth"], 0)
+
+    def test_retry_after_parsing(self):
+        self.assertEqual(retry_after_seconds(rate_limit_error(3)), 3.0)
+        self.assertIsNone(retry_after_seconds(rate_limit_error()))
+        self.assertIsNone(retry_after_seconds(ValueError("x")))
+
+
+class TestGatewayRetries(unittest.IsolatedAsyncioTestCase):
+    async def test_429_retried_after_retry_after(self):
+        calls = []
+
+        async def flaky(**kwargs):
+            calls.append(time.perf_counter())
+            if len(calls) == 1:
+                raise rate_limit_error(retry_after=0.2)
+            return fake_response("ok")
+
+        with patch_upstream(flaky), \
+             patch.object(rate_limiters, "base_delay", 0.01):
+            result = await llm_client.acall_llm("OpenRouter", "m", "k", [{"role": "user", "content": "x"}])
+
+        self.assertEqual(result, "ok")
+        self.assertEqual(len(calls), 2)
+        self.assertGreaterEqual(calls[1] - calls[0], 0.2)
+        stats = rate_limiters.stats()["OpenRouter"]
+        self.assertEqual((stats["throttled"], stats["retries"]), (1, 1))
+
+    async def test_gives_up_after_max_attempts(self):
+        async def always_limited(**kwargs):
+            raise rate_limit_error(retry_after=0)
+
+        with patch_upstream(always_limited) as mock_llm, \
+             patch.object(rate_limiters, "base_delay", 0.001):
+            with self.assertRaises(litellm.RateLimitError):
+                await llm_client.acall_llm("SiliconCloud", "m", "k", [{"role": "user", "content": "y"}])
+        self.assertEqual(mock_llm.call_count, rate_limiters.max_attempts)
+        self.assertEqual(rate_limiters.stats()["SiliconCloud"]["inflight"], 0)
+
+    async def test_stream_holds_slot_until_consumed(self):
+        async def upstream(**kwargs):
+            async def gen():
+                for text in ("a", "b"):
+                    await asyncio.sleep(0.01)
+                    yield stream_chunk(text)
+            return gen()
+
+        with patch_upstream(upstream):
+            stream = llm_client.acall_llm_stream("OpenAI", "m", "k", [{"role": "user", "content": "z"}])
+            self.assertEqual(await stream.__anext__(), "a")
+            self.assertEqual(rate_limiters.stats()["OpenAI"]["inflight"], 1)
+            rest = [chunk async for chunk in stream]
+        self.assertEqual(rest, ["b"])
+        self.assertEqual(rate_limiters.stats()["OpenAI"]["inflight"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import os
+import sys
+import asyncio
+import unittest
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from llm_fakes import fake_response, patch_upstream, stream_chunk
+from utils.llm_singleflight import SingleFlight, StreamFlight
+
+MESSAGES = [{"role": "user", "content": "同一个模板"}]
+
+
+class TestSingleFlightCalls(unittest.IsolatedAsyncioTestCase):
+    async def test_identical_calls_share_one_upstream_request(self):
+        async def slow(**kwargs):
+            await asyncio.sleep(0.05)
+            return fake_response("result")
+
+        with patch_upstream(slow) as mock_llm:
+            results = await asyncio.gather(*[
+                llm_client.acall_llm("OpenRouter", "m", "k", MESSAGES) for _ in range(10)
+            ])
+        self.assertEqual(results, ["result"] * 10)
+        self.assertEqual(mock_llm.call_count, 1)
+
+    async def test_different_keys_are_not_coalesced(self):
+        async def slow(**kwargs):
+            await asyncio.sleep(0.05)
+            return fake_response(kwargs["api_key"])
+
+        with patch_upstream(slow) as mock_llm:
+            results = await asyncio.gather(
+                llm_client.acall_llm("OpenRouter", "m", "k1", MESSAGES),
+                llm_client.acall_llm("OpenRouter", "m", "k2", MESSAGES),
+            )
+        self.assertEqual(results, ["k1", "k2"])
+        self.assertEqual(mock_llm.call_count, 2)
+
+    async def test_error_reaches_every_waiter(self):
+        flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*[flight.do("k", failing) for _ in range(3)], return_exceptions=True)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(flight.stats()["coalesced"], 2)
+        self.assertEqual(flight.stats()["inflight"], 0)
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        flight = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "ok"
+
+        first = asyncio.ensure_future(flight.do("k", slow))
+        second = asyncio.ensure_future(flight.do("k", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        self.assertEqual(await second, "ok")
+
+    async def test_upstream_cancelled_when_all_waiters_leave(self):
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiters = [asyncio.ensure_future(flight.do("k", slow)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        self.assertEqual(flight.stats()["inflight"], 0)
+
+        async def fast():
+            return "fresh"
+
+        self.assertEqual(await flight.do("k", fast), "fresh")  # a new call starts a new flight
+
+
+class TestSingleFlightStreams(unittest.IsolatedAsyncioTestCase):
+    async def test_late_joiner_gets_buffer_then_live_tail(self):
+        gate = asyncio.Event()
+
+        async def upstream(**kwargs):
+            async def gen():
+                yield stream_chunk("A")
+                yield stream_chunk("B")
+                await gate.wait()
+                yield stream_chunk("C")
+            return gen()
+
+        async def collect(out):
+            async for chunk in llm_client.acall_llm_stream("OpenRouter", "m", "k", MESSAGES):
+                out.append(chunk)
+
+        early, late = [], []
+        with patch_upstream(upstream) as mock_llm:
+            leader = asyncio.ensure_future(collect(early))
+            while len(early) < 2:
+                await asyncio.sleep(0.005)
+            joiner = asyncio.ensure_future(collect(late))
+            await asyncio.sleep(0.01)
+            gate.set()
+            await asyncio.gather(leader, joiner)
+
+        self.assertEqual("".join(early), "ABC")
+        self.assertEqual("".join(late), "ABC")
+        self.assertEqual(mock_llm.call_count, 1)
+
+    async def test_upstream_cancelled_when_all_subscribers_leave(self):
+        flight = StreamFlight()
+        cancelled = asyncio.Event()
+
+        async def source():
+            try:
+                yield "A"
+                await asyncio.sleep(10)
+                yield "B"
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        stream = flight.stream("k", source)
+        self.assertEqual(await stream.__anext__(), "A")
+        await stream.aclose()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        self.assertEqual(flight.stats()["inflight"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
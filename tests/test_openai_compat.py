@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import asyncio
+import subprocess
+import unittest
+from unittest.mock import patch
+
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from utils import openai_compat
+from utils.http_pool import HTTPClientPool
+from utils.llm_ratelimit import rate_limiters
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubServer:
+    """Minimal OpenAI-compatible /chat/completions endpoint."""
+
+    def __init__(self):
+        self.requests = []
+        self.failures = []  # queued (status, body, headers) responses served before normal ones
+
+    async def handle(self, request):
+        body = await request.json()
+        self.requests.append({"body": body, "auth": request.headers.get("Authorization")})
+        if self.failures:
+            status, payload, headers = self.failures.pop(0)
+            return web.json_response(payload, status=status, headers=headers)
+
+        text = body["messages"][-1]["content"]
+        usage = {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10}
+        if not body.get("stream"):
+            return web.json_response({
+                "id": "c1", "object": "chat.completion", "model": body["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": f"echo:{text}"},
+                             "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        await resp.write(b": keep-alive\n\n")
+        for part in ("echo", ":", text):
+            chunk = {"choices": [{"index": 0, "delta": {"content": part}}]}
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        if text == "break":
+            await resp.write(b'data: {"error": {"message": "model overloaded", "code": 503}}\n\n')
+            return resp
+        if body.get("stream_options", {}).get("include_usage"):
+            await resp.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        return resp
+
+
+class TestOpenAICompatClient(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.stub = StubServer()
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.stub.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/v1"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    def call(self, content, **extra):
+        return llm_client.acall_llm(
+            "SiliconCloud", "Qwen/Qwen2.5-7B-Instruct", "sk-test", [{"role": "user", "content": content}],
+            api_base=self.base_url, coalesce=False, hedge=False, **extra,
+        )
+
+    async def test_non_streaming_round_trip(self):
+        with patch.object(llm_client, "load_litellm", side_effect=AssertionError("litellm used")):
+            result = await self.call("hi", temperature=0.2)
+        self.assertEqual(result, "echo:hi")
+        sent = self.stub.requests[0]
+        self.assertEqual(sent["auth"], "Bearer sk-test")
+        self.assertEqual(sent["body"]["model"], "Qwen/Qwen2.5-7B-Instruct")  # route prefix stripped
+        self.assertEqual(sent["body"]["temperature"], 0.2)
+        self.assertNotIn("api_key", sent["body"])
+
+    async def test_streaming_with_usage_and_pooled_session(self):
+        pool = HTTPClientPool(base_urls=[self.base_url])
+        await pool.start()
+        try:
+            with patch.object(llm_client, "http_pools", pool):
+                chunks = [c async for c in llm_client.acall_llm_stream(
+                    "Custom", "my-model", "k", [{"role": "user", "content": "yo"}],
+                    api_base=self.base_url, hedge=False,
+                )]
+                again = [c async for c in llm_client.acall_llm_stream(
+                    "Custom", "my-model", "k", [{"role": "user", "content": "yo2"}],
+                    api_base=self.base_url, hedge=False,
+                )]
+            stats = next(p for p in pool.stats()["pools"] if p["provider"] == "Custom")
+        finally:
+            await pool.aclose()
+        self.assertEqual("".join(chunks), "echo:yo")
+        self.assertEqual("".join(again), "echo:yo2")
+        self.assertEqual(self.stub.requests[0]["body"]["stream_options"], {"include_usage": True})
+        self.assertEqual(stats["connections_created"], 1)  # keep-alive reused for the second call
+        self.assertEqual(rate_limiters.stats()["Custom"]["inflight"], 0)
+
+    async def test_429_is_retried_with_retry_after(self):
+        self.stub.failures.append((429, {"error": {"message": "slow down"}}, {"Retry-After": "0"}))
+        with patch.object(rate_limiters, "base_delay", 0.001):
+            result = await self.call("again")
+        self.assertEqual(result, "echo:again")
+        self.assertEqual(len(self.stub.requests), 2)
+
+    async def test_client_error_carries_status_and_message(self):
+        self.stub.failures.append((400, {"error": {"message": "bad model"}}, {}))
+        with self.assertRaises(openai_compat.OpenAICompatError) as ctx:
+            await self.call("x")
+        self.assertEqual(ctx.exception.status_code, 400)
+        self.assertIn("bad model", str(ctx.exception))
+
+    async def test_error_event_inside_stream(self):
+        stream = llm_client.acall_llm_stream(
+            "SiliconCloud", "m", "k", [{"role": "user", "content": "break"}],
+            api_base=self.base_url, hedge=False, coalesce=False,
+        )
+        received = []
+        with self.assertRaises(openai_compat.OpenAICompatError) as ctx:
+            async for chunk in stream:
+                received.append(chunk)
+        self.assertEqual("".join(received), "echo:break")
+        self.assertEqual(ctx.exception.status_code, 503)
+
+    def test_native_backend_selection(self):
+        self.assertTrue(openai_compat.handles({"model": "openai/x", "api_base": "http://h/v1"}))
+        self.assertTrue(openai_compat.handles({"model": "openrouter/anthropic/claude", "api_base": "http://h/v1"}))
+        self.assertFalse(openai_compat.handles({"model": "gemini/gemini-2.0-flash"}))
+        self.assertFalse(openai_compat.handles({"model": "claude-sonnet-4-20250514"}))
+
+    def test_importing_the_gateway_does_not_load_litellm(self):
+        code = "import sys, utils.llm_client, utils.chat_context; print('litellm' in sys.modules)"
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+        self.assertEqual(out.stdout.strip(), "False")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import hashlib
+import unittest
+
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils.llm_client as llm_client
+from utils.prompt_cache import mark_stable_prefix, prompt_cache_stats
+
+DOCUMENT = "季度销售报告：" + "华东区销售额同比增长 12%，" * 200
+SYSTEM = {"role": "system", "content": f"以下是用户上传的文档内容：\n\n{DOCUMENT}"}
+
+
+class StubProvider:
+    """OpenAI-compatible stub that emulates provider-side prefix caching.
+
+    A prefix ending in a cache_control breakpoint is "written" on first sight and
+    "read" afterwards; cached prompts start streaming faster, like real providers.
+    """
+
+    def __init__(self, cold_delay=0.3, warm_delay=0.02):
+        self.cold_delay, self.warm_delay = cold_delay, warm_delay
+        self.cached: set[str] = set()
+        self.requests: list[dict] = []
+
+    def breakpoints(self, messages):
+        prefix, found = [], []
+        for message in messages:
+            prefix.append(message)
+            content = message["content"]
+            if isinstance(content, list) and any("cache_control" in part for part in content):
+                found.append(hashlib.sha256(json.dumps(prefix, sort_keys=True).encode()).hexdigest())
+        return found
+
+    async def handle(self, request):
+        body = await request.json()
+        self.requests.append(body)
+        prompt_tokens = len(json.dumps(body["messages"], ensure_ascii=False)) // 2
+        read = write = 0
+        for key in self.breakpoints(body["messages"]):
+            if key in self.cached:
+                read = prompt_tokens - 20
+            else:
+                self.cached.add(key)
+                write = prompt_tokens - 20
+        usage = {
+            "prompt_tokens": prompt_tokens, "completion_tokens": 2, "total_tokens": prompt_tokens + 2,
+            "prompt_tokens_details": {"cached_tokens": read, "cache_write_tokens": write},
+        }
+        await asyncio.sleep(self.warm_delay if read else self.cold_delay)
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        base = {"id": "c1", "object": "chat.completion.chunk", "created": 1, "model": body["model"]}
+        for text in ("好", "的"):
+            chunk = {**base, "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+            await resp.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await resp.write(f"data: {json.dumps({**base, 'choices': [], 'usage': usage})}\n\n".encode())
+        await resp.write(b"data: [DONE]\n\n")
+        return resp
+
+
+class TestMarkStablePrefix(unittest.TestCase):
+    def test_large_system_prompt_is_marked_without_mutation(self):
+        messages = [SYSTEM, {"role": "user", "content": "总结一下"}]
+        marked = mark_stable_prefix("Anthropic", "claude-sonnet-4-20250514", messages)
+        self.assertEqual(marked[0]["content"][0]["cache_control"], {"type": "ephemeral"})
+        self.assertEqual(marked[0]["content"][0]["text"], SYSTEM["content"])
+        self.assertEqual(marked[1:], messages[1:])
+        self.assertIsInstance(messages[0]["content"], str)
+
+    def test_summary_gets_its_own_breakpoint(self):
+        summary = {"role": "system", "content": "以下是此前对话的摘要：..."}
+        marked = mark_stable_prefix("OpenRouter", "anthropic/claude-3.5-sonnet", [SYSTEM, summary])
+        self.assertTrue(all("cache_control" in m["content"][-1] for m in marked))
+
+    def test_unsupported_or_small_prompts_are_untouched(self):
+        messages = [SYSTEM, {"role": "user", "content": "hi"}]
+        self.assertIs(mark_stable_prefix("SiliconCloud", "Qwen/Qwen2.5-7B-Instruct", messages), messages)
+        self.assertIs(mark_stable_prefix("OpenRouter", "meta-llama/llama-3-8b", messages), messages)
+        short = [{"role": "system", "content": "你是助手"}, {"role": "user", "content": "hi"}]
+        self.assertIs(mark_stable_prefix("Anthropic", "claude-sonnet-4-20250514", short), short)
+
+
+class TestPromptCacheAgainstStub(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        prompt_cache_stats.clear()
+        self.stub = StubProvider()
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self.stub.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://127.0.0.1:{port}/v1"
+
+    async def asyncTearDown(self):
+        await self.runner.cleanup()
+
+    async def turn(self, model, question):
+        messages = [SYSTEM, {"role": "user", "content": question}]
+        start = time.perf_counter()
+        stream = llm_client.acall_llm_stream(
+            "OpenRouter", model, "sk-test", messages, hedge=False, api_base=self.base_url
+        )
+        first = await stream.__anext__()
+        ttft = time.perf_counter() - start
+        text = first + "".join([chunk async for chunk in stream])
+        return text, ttft
+
+    async def test_repeated_prefix_is_read_from_cache(self):
+        model = "anthropic/claude-3.5-sonnet"
+        text, cold_ttft = await self.turn(model, "第一季度怎么样？")
+        _, warm_ttft = await self.turn(model, "第二季度呢？")
+
+        self.assertEqual(text, "好的")
+        self.assertIn("cache_control", self.stub.requests[0]["messages"][0]["content"][0])
+        self.assertLess(warm_ttft, cold_ttft)
+        stats = prompt_cache_stats.stats()[f"OpenRouter/openrouter/{model}"]
+        self.assertEqual((stats["requests"], stats["hinted_requests"]), (2, 2))
+        self.assertGreater(stats["cache_write_tokens"], 0)
+        self.assertGreater(stats["cache_read_tokens"], 0)
+        self.assertGreater(stats["cache_read_ratio"], 0.4)
+
+    async def test_models_without_hint_support_send_plain_messages(self):
+        await self.turn("meta-llama/llama-3-8b", "你好")
+        self.assertIsInstance(self.stub.requests[0]["messages"][0]["content"], str)
+        stats = prompt_cache_stats.stats()["OpenRouter/openai/meta-llama/llama-3-8b"]
+        self.assertEqual((stats["hinted_requests"], stats["cache_read_tokens"]), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
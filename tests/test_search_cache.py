@@ -0,0 +1,115 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import search_cache as search_cache_module
+from utils.search_cache import SearchCache, estimate_size
+
+
+def results(n, body=""):
+    return [{"title": f"t{i}", "href": f"https://a.com/{i}", "body": body} for i in range(n)]
+
+
+class TestSearchCache(unittest.TestCase):
+    def test_lru_eviction_by_entry_count(self):
+        cache = SearchCache(max_entries=2, ttl=60)
+        cache.set("a", results(1))
+        cache.set("b", results(1))
+        cache.get("a")              # "a" becomes most recently used
+        cache.set("c", results(1))  # evicts "b"
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_evict_callbacks_run_outside_the_lock(self):
+        cache = SearchCache(max_entries=1, ttl=60)
+        seen = []
+        cache.on_evict.append(lambda key: seen.append((key, cache._lock.locked(), cache.peek("b") is not None)))
+        cache.set("a", results(1))
+        cache.set("b", results(1))  # evicts "a"
+        cache.clear()
+        self.assertEqual(seen, [("a", False, True), ("b", False, False)])
+
+    def test_byte_budget(self):
+        one = estimate_size(tuple(results(1, "x" * 1000)))
+        cache = SearchCache(max_entries=100, max_bytes=one * 3, ttl=60)
+        for key in "abcd":
+            cache.set(key, results(1, "x" * 1000))
+        stats = cache.stats()
+        self.assertEqual(stats["entries"], 3)
+        self.assertLessEqual(stats["bytes"], one * 3)
+        self.assertIsNone(cache.get("a"))
+
+        cache.extend("d", results(2, "x" * 1000)[1:])  # growing "d" pushes out "b"
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(len(cache.get("d")), 2)
+        self.assertEqual(cache.stats()["evictions"], 2)
+
+    def test_expiry_only_pops_expired_head(self):
+        cache = SearchCache(ttl=10)
+        with patch.object(search_cache_module.time, "time", return_value=1000):
+            cache.set("old", results(1))
+        with patch.object(search_cache_module.time, "time", return_value=1005):
+            cache.set("new", results(1))
+        with patch.object(search_cache_module.time, "time", return_value=1012):
+            self.assertIsNone(cache.get("old"))
+            self.assertIsNotNone(cache.get("new"))
+        stats = cache.stats()
+        self.assertEqual((stats["expirations"], stats["entries"]), (1, 1))
+        self.assertEqual(stats["bytes"], estimate_size(tuple(results(1))))
+
+    def test_extend_is_copy_on_write(self):
+        cache = SearchCache(ttl=60)
+        cache.set("q", results(2))
+        snapshot = cache.get("q")
+        cache.extend("q", [{"title": "new", "href": "https://b.com", "body": ""}])
+        self.assertEqual(len(snapshot), 2)       # earlier readers keep their view
+        self.assertEqual(len(cache.get("q")), 3)
+        self.assertIsNone(cache.extend("missing", results(1)))
+
+    def test_extend_skips_urls_already_cached(self):
+        cache = SearchCache(ttl=60)
+        cache.set("q", results(2))
+        snapshot = cache.get("q")
+        page = [{"title": "new", "href": "https://b.com/x", "body": ""}]
+        # A prefetch and a foreground request both searched from `snapshot` and found the same page
+        cache.extend("q", page)
+        cache.extend("q", page + [{"title": "t1", "href": "https://www.a.com/1/", "body": ""}])
+        self.assertEqual([r["href"] for r in cache.get("q")], [r["href"] for r in snapshot] + ["https://b.com/x"])
+        self.assertEqual(cache.stats()["bytes"], estimate_size(cache.get("q")))
+
+    def test_hit_rate(self):
+        cache = SearchCache(ttl=60)
+        cache.set("q", results(1))
+        cache.get("q")
+        cache.get("other")
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["hit_rate"]), (1, 1, 0.5))
+
+    def test_fuzzy_lookup_counts_exact_and_near_hits(self):
+        cache = SearchCache(max_entries=2, ttl=60, fuzzy=True)
+        cache.set("python教程入门", results(3))
+        self.assertEqual(cache.lookup("python教程入门"), ("python教程入门", tuple(results(3))))
+        self.assertEqual(cache.lookup("python教程入门。")[0], "python教程入门")
+        self.assertEqual(cache.lookup("python进阶教程"), ("python进阶教程", None))
+        stats = cache.stats()
+        self.assertEqual((stats["exact_hits"], stats["fuzzy_hits"], stats["misses"]), (1, 1, 1))
+        self.assertEqual(stats["fuzzy_hit_rate"], round(1 / 3, 4))
+
+        # Evicted queries leave the fuzzy index
+        cache.set("b", results(1))
+        cache.set("c", results(1))
+        self.assertEqual(cache.lookup("python教程入门。"), ("python教程入门。", None))
+
+    def test_fuzzy_lookup_is_opt_in(self):
+        cache = SearchCache(ttl=60)
+        cache.set("python教程入门", results(1))
+        self.assertIsNone(cache.lookup("python教程入门。")[1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sys
+import unittest
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_dedupe import Deduper, MinHashIndex, lsh_bands, minhash, normalize_text, normalize_url, similarity
+from utils.web_search import ResultMerger
+
+ARTICLE = "数据透视表是 Excel 中最强大的分析工具之一，本文带你一步步掌握"
+
+
+def result(title, href, body=""):
+    return {"title": title, "href": href, "body": body}
+
+
+class TestNormalization(unittest.TestCase):
+    def test_url_variants_share_a_key(self):
+        key = normalize_url("https://example.com/a/b?id=1")
+        for variant in ("http://www.Example.com/a/b/?id=1#top",
+                        "https://example.com/a/b?utm_source=x&id=1",
+                        "https://example.com/a/b?id=1&spm=abc"):
+            self.assertEqual(normalize_url(variant), key)
+        self.assertNotEqual(normalize_url("https://example.com/a/b?id=2"), key)
+
+    def test_minhash_separates_mirrors_from_related_pages(self):
+        zhihu = minhash(normalize_text("Excel 数据透视表完全教程：从入门到精通 - 知乎 " + ARTICLE))
+        jianshu = minhash(normalize_text("Excel 数据透视表完全教程:从入门到精通 - 简书 " + ARTICLE))
+        related = minhash(normalize_text("Excel 数据透视表入门教程 - 百度经验 数据透视表可以快速汇总大量数据，下面介绍创建数据透视表的步骤"))
+        self.assertGreaterEqual(similarity(zhihu, jianshu), 0.7)
+        self.assertLess(similarity(zhihu, related), 0.3)
+
+        index = MinHashIndex(threshold=0.6)
+        index.add(zhihu, lsh_bands(zhihu), "a")
+        self.assertEqual(index.find(jianshu, lsh_bands(jianshu)), "a")
+        self.assertIsNone(index.find(related, lsh_bands(related)))
+
+
+class TestMergerDedupe(unittest.TestCase):
+    def test_exact_duplicates_boost_the_first_result(self):
+        merger = ResultMerger()
+        merger.add("DuckDuckGo", [result("Alpha", "https://a.com/1"), result("Beta", "https://b.com/1")])
+        merger.add("Bing", [result("Beta", "http://www.b.com/1/"), result("Beta ", "https://mirror.com/beta")])
+        ranked = merger.ranked()
+        self.assertEqual([r["href"] for r in ranked], ["https://b.com/1", "https://a.com/1"])
+        self.assertEqual(merger.dedupe.exact_duplicates, 2)
+
+    def test_near_duplicates_collapse_when_enabled(self):
+        mirrored = [
+            result("Excel 数据透视表完全教程：从入门到精通 - 知乎", "https://zhihu.com/p/1", ARTICLE),
+            result("Excel 数据透视表完全教程:从入门到精通 - 简书", "https://jianshu.com/p/2", ARTICLE),
+            result("Python 自动化办公：批量处理 Word 文档的 10 个技巧", "https://c.com/3", "使用 python-docx 可以轻松地读写 Word 文件"),
+        ]
+        collapsed = ResultMerger(near_duplicates=True)
+        collapsed.add("Bing", mirrored)
+        self.assertEqual([r["href"] for r in collapsed.ranked()], ["https://zhihu.com/p/1", "https://c.com/3"])
+        self.assertEqual(collapsed.dedupe.near_duplicate_hits, 1)
+
+        kept = ResultMerger(near_duplicates=False)
+        kept.add("Bing", mirrored)
+        self.assertEqual(len(kept), 3)
+
+    def test_duplicates_of_cached_results_are_dropped(self):
+        cached = [result("Excel 数据透视表完全教程：从入门到精通 - 知乎", "https://zhihu.com/p/1", ARTICLE)]
+        merger = ResultMerger(exclude=cached)
+        merger.add("Bing", [
+            result("Excel 数据透视表完全教程:从入门到精通 - 简书", "https://jianshu.com/p/2", ARTICLE),
+            result("other", "https://www.zhihu.com/p/1/"),
+            result("new", "https://new.com"),
+        ])
+        self.assertEqual([r["href"] for r in merger.ranked()], ["https://new.com"])
+
+    def test_short_text_skips_minhash(self):
+        dedupe = Deduper(near_duplicates=True)
+        self.assertIsNone(dedupe.signature("Hi", "https://a.com", "").minhash)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import app
+from llm_fakes import patch_upstream
+from utils import search_deep, web_search
+from utils.search_cache import search_cache
+from utils.search_deep import PageFetcher, allocate_budget, decode_page, extract_main_text, fetch_sources, trim_text
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search")
+DEPS = {"DDGS": object(), "BeautifulSoup": object(), "httpx": httpx, "AsyncSession": None}
+
+
+def article_bytes():
+    with open(os.path.join(FIXTURES, "article.html"), "rb") as f:
+        return f.read()
+
+
+class TestExtraction(unittest.TestCase):
+    def test_main_text_without_navigation_sidebar_or_footer(self):
+        text = extract_main_text(decode_page(article_bytes()))  # GBK page, charset only in <meta>
+        self.assertTrue(text.startswith("量子纠错实验取得新进展"))
+        self.assertIn("逻辑比特的寿命超过了构成它的物理比特", text)
+        self.assertIn("《自然》杂志", text)
+        for boilerplate in ("国际", "热门推荐", "人才引进", "网友评论", "京ICP备", "微博", "dataLayer"):
+            self.assertNotIn(boilerplate, text)
+
+    def test_div_only_pages_fall_back_to_container_text(self):
+        html = "<html><body><div>" + "第一段很长的正文内容，没有使用段落标签。<br>" * 20 + "</div></body></html>"
+        self.assertIn("没有使用段落标签", extract_main_text(html))
+        self.assertEqual(extract_main_text("   "), "")
+        self.assertEqual(extract_main_text('<?xml version="1.0" encoding="utf-8"?>'), "")  # empty after the declaration
+
+    def test_budget_is_shared_fairly(self):
+        self.assertEqual(allocate_budget([100, 2000, 50, 900], 1000), [100, 425, 50, 425])
+        self.assertEqual(allocate_budget([10, 20], 1000), [10, 20])
+        text = "第一句话。第二句话。第三句话很长很长很长。"
+        self.assertEqual(trim_text(text, 20, 20), text)
+        self.assertEqual(trim_text(text, 20, 10), "第一句话。第二句话。…")
+
+
+class TestFetchSources(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.hits = []
+        self.release = asyncio.Event()
+
+        async def handle(request):
+            self.hits.append((request.host, request.match_info["name"], time.monotonic()))
+            name = request.match_info["name"]
+            if name == "slow":
+                await self.release.wait()
+            if name == "pdf":
+                return web.Response(body=b"%PDF-1.4", content_type="application/pdf")
+            await asyncio.sleep(0.05)
+            return web.Response(body=article_bytes(), content_type="text/html")
+
+        server = web.Application()
+        server.router.add_get("/{name}", handle)
+        self.runner = web.AppRunner(server)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.release.set()
+        await self.runner.cleanup()
+
+    def results(self, host, *names):
+        return [{"title": name, "href": f"http://{host}:{self.port}/{name}", "body": ""} for name in names]
+
+    async def test_per_domain_politeness_and_global_limit(self):
+        fetcher = PageFetcher(concurrency=8, per_domain=1, domain_interval=0.1)
+        results = self.results("127.0.0.1", "a", "b", "c") + self.results("localhost", "d", "e")
+        sources, diagnostics = await fetch_sources(DEPS, results, 5, deadline=5, fetcher=fetcher)
+
+        self.assertEqual([s["title"] for s in sources], ["a", "b", "c", "d", "e"])  # rank order kept
+        self.assertTrue(all("逻辑比特" in s["text"] for s in sources))
+        for host in ("127.0.0.1", "localhost"):
+            stamps = sorted(t for h, _, t in self.hits if h.startswith(host))
+            # Requests to one host are spaced by the 100ms interval
+            self.assertGreaterEqual(stamps[-1] - stamps[0], 0.1 * (len(stamps) - 1) - 0.02)
+        first = {h.split(":")[0]: t for h, _, t in reversed(self.hits)}
+        self.assertLess(abs(first["127.0.0.1"] - first["localhost"]), 0.05)  # hosts run in parallel
+        self.assertGreater(diagnostics["fetch_ms"], 0)
+        self.assertGreater(diagnostics["extract_ms"], 0)
+        self.assertEqual(diagnostics["failed"], [])
+
+    async def test_deadline_and_failures_are_reported(self):
+        fetcher = PageFetcher(concurrency=1, per_domain=4, domain_interval=0)
+        results = self.results("127.0.0.1", "slow", "pdf", "ok")
+        start = time.perf_counter()
+        sources, diagnostics = await fetch_sources(DEPS, results, 3, deadline=0.5, fetcher=fetcher)
+        self.assertLess(time.perf_counter() - start, 1)
+        # The other pages queue behind "slow" for the single global slot
+        self.assertEqual(sources, [])
+        self.assertEqual([f["error"] for f in diagnostics["failed"]], ["Deadline: not finished after 0.5s"] * 3)
+        self.assertEqual(fetcher.stats()["abandoned"], 3)
+
+    async def test_non_html_pages_are_skipped(self):
+        fetcher = PageFetcher(concurrency=4, per_domain=4, domain_interval=0)
+        sources, diagnostics = await fetch_sources(DEPS, self.results("127.0.0.1", "pdf", "ok"), 2, 5, fetcher)
+        self.assertEqual([s["title"] for s in sources], ["ok"])
+        self.assertEqual(diagnostics["failed"][0]["error"], "Not an HTML page (application/pdf)")
+        self.assertEqual((fetcher.stats()["fetched"], fetcher.stats()["failed"]), (1, 1))
+
+    async def test_endpoint_streams_cited_answer(self):
+        prompts = []
+
+        async def upstream(**kwargs):
+            prompts.append(kwargs["messages"][0]["content"])
+
+            async def gen():
+                for text in ("据报道，", "逻辑比特寿命首次超过物理比特 [1]。"):
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+            return gen()
+
+        async def engine(deps, query, page, max_results, needed):
+            return self.results("127.0.0.1", "a", "b")
+
+        search_cache.clear()
+        fetcher = PageFetcher(concurrency=4, per_domain=2, domain_interval=0)
+        transport = httpx.ASGITransport(app=app)
+        with patch_upstream(upstream), \
+             patch.dict(web_search.ENGINES, {"Bing": (engine, "DDGS")}, clear=True), \
+             patch.object(api_server, "resolve_dependencies", return_value=(DEPS, [])), \
+             patch.object(search_deep, "page_fetcher", fetcher):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                resp = await client.post("/api/search/deep", json={
+                    "query": "量子纠错", "api_key": "k", "model": "fast/model", "top_k": 2,
+                })
+                sse = await client.post("/api/search/deep", json={
+                    "query": "量子纠错", "api_key": "k", "model": "fast/model", "top_k": 2, "stream_format": "sse",
+                })
+
+        self.assertTrue(resp.text.startswith("据报道，逻辑比特寿命首次超过物理比特 [1]。"))
+        self.assertIn(f"参考来源：\n[1] a http://127.0.0.1:{self.port}/a\n[2] b", resp.text)
+        self.assertEqual(resp.headers["X-Deep-Sources"], "2")
+        self.assertGreater(float(resp.headers["X-Deep-Extract-Ms"]), 0)
+        self.assertIn("【问题】\n量子纠错", prompts[0])
+        self.assertIn("[2] b\n", prompts[0])
+        self.assertIn("逻辑比特的寿命超过了构成它的物理比特", prompts[0])
+
+        usage = json.loads(sse.text.split("event: usage\ndata: ")[1].split("\n")[0])
+        self.assertEqual([s["title"] for s in usage["sources"]], ["a", "b"])
+        self.assertTrue(all(s["tokens"] > 0 and s["fetch_ms"] > 0 for s in usage["sources"]))
+
+    async def test_top_k_is_bounded(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for top_k in (0, 1000):
+                resp = await client.post("/api/search/deep", json={"query": "q", "api_key": "k", "top_k": top_k})
+                self.assertEqual(resp.status_code, 422)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import app
+from search_fakes import DEPS, item
+from utils import web_search
+from utils.search_health import CLOSED, HALF_OPEN, OPEN, EngineHealthRegistry
+
+
+class FakeEngine:
+    def __init__(self, delay=0.0, items=(), error=None):
+        self.delay, self.items, self.error = delay, list(items), error
+        self.calls = 0
+
+    async def __call__(self, deps, query, page, max_results, needed):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.items
+
+
+class TestBreaker(unittest.TestCase):
+    def setUp(self):
+        self.health = EngineHealthRegistry(failures=3, min_calls=6, failure_rate=0.5, cooldown=0.1, max_cooldown=0.3)
+
+    def state(self, name):
+        return next(e for e in self.health.stats()["engines"] if e["engine"] == name)
+
+    def test_consecutive_failures_open_then_half_open_probe(self):
+        for _ in range(3):
+            self.assertTrue(self.health.allow("Baidu"))
+            self.health.record("Baidu", "blocked", 0.1)
+        self.assertFalse(self.health.allow("Baidu"))
+        self.assertEqual(self.state("Baidu")["state"], OPEN)
+
+        time.sleep(0.1)
+        self.assertTrue(self.health.allow("Baidu"))   # single half-open probe
+        self.assertFalse(self.health.allow("Baidu"))
+        self.health.record("Baidu", "blocked", 0.1)
+        self.assertEqual((self.state("Baidu")["state"], self.state("Baidu")["retry_in"]), (OPEN, 0.2))  # cool-down doubled
+
+        time.sleep(0.2)
+        self.assertTrue(self.health.allow("Baidu"))
+        self.health.record("Baidu", "ok", 0.5)
+        engine = self.state("Baidu")
+        self.assertEqual((engine["state"], engine["calls"], engine["times_opened"], engine["skipped"]), (CLOSED, 1, 2, 2))
+
+    def test_cancelled_probe_frees_the_slot(self):
+        self.health.allow("Bing", force=True)
+        for _ in range(3):
+            self.health.record("Bing", "timeout", 5)
+        self.assertTrue(self.health.allow("Bing", force=True))
+        self.assertEqual(self.state("Bing")["state"], HALF_OPEN)
+        self.health.release("Bing")
+        self.assertTrue(self.health.allow("Bing"))
+
+    def test_failure_rate_opens_without_a_streak(self):
+        for outcome in ("ok", "error", "ok", "error", "ok", "error"):
+            self.health.record("Bing", outcome, 0.1)
+        self.assertEqual(self.state("Bing")["state"], OPEN)
+
+    def test_engines_are_ordered_by_health(self):
+        self.health.record("DuckDuckGo", "ok", 3.0)
+        self.health.record("Bing", "ok", 0.3)
+        self.health.record("Baidu", "error", 0.3)
+        self.health.record("Baidu", "ok", 0.3)
+        self.assertEqual(self.health.order(["DuckDuckGo", "Bing", "Baidu", "New"]), ["New", "Bing", "Baidu", "DuckDuckGo"])
+
+
+class TestFanOutBreaker(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.health = EngineHealthRegistry(failures=3, cooldown=30)
+        self.patches = [patch.object(web_search, "engine_health", self.health),
+                        patch.object(api_server, "engine_health", self.health)]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_blocked_engine_is_skipped_instead_of_awaited(self):
+        baidu = FakeEngine(0.3, error=web_search.EngineBlockedError("Blocked (Len: 300)"))
+        bing = FakeEngine(0.01, [item(n, "b.com") for n in range(3)])
+        with patch.dict(web_search.ENGINES, {"Bing": (bing, "DDGS"), "Baidu": (baidu, "DDGS")}, clear=True):
+            for _ in range(3):
+                await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+            start = time.perf_counter()
+            results, errors = await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+            elapsed = time.perf_counter() - start
+
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                stats = (await client.get("/api/search/engines/stats")).json()
+
+        self.assertEqual(baidu.calls, 3)
+        self.assertLess(elapsed, 0.1)
+        self.assertEqual(len(results), 3)
+        self.assertTrue(errors[0].startswith("Baidu: skipped (circuit open, retry in 30s)"))
+        self.assertEqual([e["engine"] for e in stats["engines"]], ["Bing", "Baidu"])
+        baidu_state = stats["engines"][1]
+        self.assertEqual((baidu_state["state"], baidu_state["blocked"], baidu_state["skipped"]), (OPEN, 3, 1))
+
+    async def test_deadline_counts_as_timeout(self):
+        slow = FakeEngine(1, [item(1)])
+        with patch.dict(web_search.ENGINES, {"Bing": (slow, "DDGS")}, clear=True):
+            for _ in range(3):
+                await web_search.fan_out_search(DEPS, "q", 1, 10, 10, deadline=0.05)
+        engine = self.health.stats()["engines"][0]
+        self.assertEqual((engine["state"], engine["timeout"]), (OPEN, 3))
+
+    async def test_early_return_is_not_a_failure(self):
+        fast = FakeEngine(0.01, [item(n) for n in range(10)])
+        slow = FakeEngine(1, [item(1, "b.com")])
+        with patch.dict(web_search.ENGINES, {"DuckDuckGo": (fast, "DDGS"), "Baidu": (slow, "DDGS")}, clear=True):
+            for _ in range(4):
+                await web_search.fan_out_search(DEPS, "q", 1, 5, 5)
+        states = {e["engine"]: (e["state"], e["calls"]) for e in self.health.stats()["engines"]}
+        self.assertEqual(states, {"DuckDuckGo": (CLOSED, 4), "Baidu": (CLOSED, 0)})
+
+    async def test_all_engines_open_probes_the_soonest(self):
+        bing = FakeEngine(0.01, error=web_search.SearchEngineError("down"))
+        with patch.dict(web_search.ENGINES, {"Bing": (bing, "DDGS")}, clear=True):
+            for _ in range(3):
+                await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+            bing.error = None
+            bing.items = [item(1)]
+            results, _ = await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+        self.assertEqual(len(results), 1)
+        self.assertEqual(self.health.stats()["engines"][0]["state"], CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+from bs4 import BeautifulSoup
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import search_parsers
+from utils.search_parsers import EXTRACTORS, generic_parse, parse_baidu, parse_bing, parse_results
+
+# *_synthetic.html: hand-built pages that mimic each engine's result markup (not captures);
+# captured/<engine>-*.html: real result pages saved with tests/capture_serp.py
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "search")
+CAPTURED = os.path.join(FIXTURES, "captured")
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding="utf-8") as f:
+        return f.read()
+
+
+class TestEngineExtractors(unittest.TestCase):
+    def test_bing_organic_results_only(self):
+        results = parse_bing(fixture("bing_synthetic.html"))
+        self.assertEqual([r["href"] for r in results], [f"https://site{i}.example.com/article/{i}" for i in range(10)])
+        self.assertTrue(results[0]["title"].endswith("结果 0"))
+        self.assertGreater(len(results[0]["body"]), 50)
+        # Same organic results as the generic parser
+        self.assertEqual(results, generic_parse(fixture("bing_synthetic.html"), "Bing", BeautifulSoup))
+
+    def test_baidu_skips_nested_containers_and_recommendations(self):
+        results = parse_baidu(fixture("baidu_synthetic.html"))
+        self.assertEqual(len(results), 10)
+        self.assertEqual(len({r["href"] for r in results}), 10)
+        self.assertTrue(all(r["href"].startswith("http://www.baidu.com/link?url=") for r in results))
+        self.assertTrue(all(r["body"] for r in results))
+        self.assertTrue(results[9]["title"].endswith("百度结果 9"))
+
+    def test_falls_back_to_generic_parser(self):
+        redesigned = "<html><body><div class='result'><h3><a href='https://x.com/1'>Only</a></h3><p>snippet</p></div></body></html>"
+        self.assertEqual(parse_results(redesigned, "Bing", BeautifulSoup),
+                         [{"title": "Only", "href": "https://x.com/1", "body": "snippet"}])
+        with patch.object(search_parsers, "lxml_html", None):
+            self.assertEqual(len(parse_results(fixture("bing_synthetic.html"), "Bing", BeautifulSoup)), 10)
+        self.assertEqual(parse_results(redesigned, "Sogou", BeautifulSoup)[0]["href"], "https://x.com/1")
+
+
+class TestCapturedPages(unittest.TestCase):
+    def test_extractors_on_real_captures(self):
+        captures = sorted(os.listdir(CAPTURED)) if os.path.isdir(CAPTURED) else []
+        if not captures:
+            self.skipTest("no real result pages captured (see tests/capture_serp.py)")
+        engines = {name.lower(): name for name in EXTRACTORS}
+        for name in captures:
+            engine = engines.get(name.split("-", 1)[0])
+            if engine is None:
+                continue
+            with self.subTest(page=name), open(os.path.join(CAPTURED, name), encoding="utf-8") as f:
+                html = f.read()
+                results = EXTRACTORS[engine](html)
+                self.assertGreaterEqual(len(results), 5)
+                self.assertEqual(len({r["href"] for r in results}), len(results))
+                self.assertTrue(all(r["title"] and r["href"].startswith("http") for r in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
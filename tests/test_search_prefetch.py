@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import app
+from search_fakes import DEPS
+from utils import web_search
+from utils.search_cache import SearchCache
+from utils.search_prefetch import SearchPrefetcher
+
+
+class PagedEngine:
+    """Fake engine returning 10 distinct results per page and recording when each page was asked for."""
+
+    def __init__(self, pages=10):
+        self.pages = pages
+        self.slow = {}  # query → delay for pages after the first
+        self.calls = []
+
+    async def __call__(self, deps, query, page, max_results, needed):
+        self.calls.append((page, time.monotonic()))
+        if page > 1:
+            await asyncio.sleep(self.slow.get(query, 0))
+        if page > self.pages:
+            raise web_search.SearchEngineError("No results")
+        return [{"title": f"{query} {n}", "href": f"https://a.com/{query}/{n}", "body": ""}
+                for n in range((page - 1) * 10, page * 10)]
+
+
+class TestSearchPrefetch(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.cache = SearchCache(max_entries=2, ttl=60)
+        self.prefetcher = SearchPrefetcher(self.cache, pages=2, concurrency=1, interval=0.05, delay=0)
+        self.engine = PagedEngine()
+        self.patches = [
+            patch.object(api_server, "search_cache", self.cache),
+            patch.object(api_server, "search_prefetcher", self.prefetcher),
+            patch.object(api_server, "resolve_dependencies", return_value=(DEPS, [])),
+            patch.dict(web_search.ENGINES, {"Bing": (self.engine, "DDGS")}, clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        await self.prefetcher.aclose()
+        for p in self.patches:
+            p.stop()
+
+    async def search(self, client, query, page):
+        resp = await client.post("/api/search", json={"query": query, "page": page, "max_results": 10})
+        return [r["title"] for r in resp.json()["results"]]
+
+    async def wait_idle(self):
+        while self.prefetcher.stats()["active"]:
+            await asyncio.sleep(0.01)
+
+    async def test_next_pages_are_served_from_cache(self):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            self.assertEqual(await self.search(client, "q", 1), [f"q {n}" for n in range(10)])
+            await self.wait_idle()
+            self.assertEqual([page for page, _ in self.engine.calls], [1, 2, 3])
+
+            self.assertEqual(await self.search(client, "q", 2), [f"q {n}" for n in range(10, 20)])
+            await self.wait_idle()
+            self.assertEqual(await self.search(client, "q", 3), [f"q {n}" for n in range(20, 30)])
+        self.assertEqual(self.cache.stats()["hits"], 2)
+        # Reading ahead from the cache keeps scheduling the following pages
+        await self.wait_idle()
+        self.assertEqual(len(self.cache.peek("q")), 50)
+
+        stamps = [t for _, t in self.engine.calls[1:]]
+        self.assertTrue(all(b - a >= 0.045 for a, b in zip(stamps, stamps[1:])))  # politeness interval
+
+    async def test_foreground_request_waits_for_inflight_prefetch(self):
+        self.engine.slow["q"] = 0.2
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await self.search(client, "q", 1)
+            while not self.prefetcher._inflight:
+                await asyncio.sleep(0.01)
+            self.assertEqual(await self.search(client, "q", 2), [f"q {n}" for n in range(10, 20)])
+        self.assertEqual([page for page, _ in self.engine.calls].count(2), 1)
+
+    async def test_eviction_cancels_prefetch(self):
+        self.engine.slow["first"] = 5
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await self.search(client, "first", 1)
+            while not self.prefetcher._inflight:
+                await asyncio.sleep(0.01)
+            task = self.prefetcher._tasks["first"]
+            self.prefetcher.pages = 0  # keep the two evicting searches from prefetching themselves
+            await self.search(client, "second", 1)
+            await self.search(client, "third", 1)  # max_entries=2 evicts "first"
+        await asyncio.gather(task, return_exceptions=True)
+        self.assertIsNone(self.cache.peek("first"))
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats["active"], stats["cancelled"]), (0, 1))
+
+    async def test_eviction_from_another_thread_cancels_on_the_loop(self):
+        self.engine.slow["first"] = 5
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await self.search(client, "first", 1)
+            while not self.prefetcher._inflight:
+                await asyncio.sleep(0.01)
+        task = self.prefetcher._tasks["first"]
+        for key in ("second", "third"):  # max_entries=2 evicts "first" from a worker thread
+            await asyncio.to_thread(self.cache.set, key, [])
+        await asyncio.wait_for(asyncio.gather(task, return_exceptions=True), 1)
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats["active"], stats["cancelled"]), (0, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
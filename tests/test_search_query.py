@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.search_query import QueryIndex, canonical_query
+
+
+class TestCanonicalQuery(unittest.TestCase):
+    def test_spelling_variants_share_one_key(self):
+        variants = ["Python教程", "python 教程 ", "ＰＹＴＨＯＮ　教程", "PYTHON\t教程"]
+        self.assertEqual({canonical_query(q) for q in variants}, {"python教程"})
+
+    def test_traditional_chinese_folds_to_simplified(self):
+        self.assertEqual(canonical_query("機器學習 入門"), canonical_query("机器学习入门"))
+        self.assertEqual(canonical_query("台北 天氣 預報"), "台北天气预报")
+
+    def test_spaces_between_latin_words_are_kept(self):
+        self.assertEqual(canonical_query("  New   York  Times "), "new york times")
+        self.assertEqual(canonical_query("New York 天氣"), "new york天气")
+        self.assertNotEqual(canonical_query("new york"), canonical_query("newyork"))
+        self.assertEqual(canonical_query("   "), "")
+
+
+class TestQueryIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = QueryIndex()
+        for query in ("python教程入门", "iphone 15 评测", "机器学习入门", "how to install docker on ubuntu",
+                      "java int to string conversion", "excel vlookup multiple criteria",
+                      "python list comprehension tutorial"):
+            self.index.add(canonical_query(query))
+
+    def test_stopword_punctuation_and_plural_variants_match(self):
+        self.assertEqual(self.index.find(canonical_query("Python 教程入门。")), "python教程入门")
+        self.assertEqual(self.index.find(canonical_query("How to install Docker in Ubuntu?")),
+                         "how to install docker on ubuntu")
+        self.assertEqual(self.index.find(canonical_query("python list comprehension tutorials")),
+                         "python list comprehension tutorial")
+        self.assertIsNone(self.index.find("python教程入门"))  # exact hits are the cache's job
+
+    def test_different_queries_do_not_match(self):
+        for query in ("how to uninstall docker on ubuntu", "java string to int conversion",
+                      "excel hlookup multiple criteria", "python dict comprehension tutorial",
+                      "iPhone 14 评测", "机器学习入门教程", "机器学习", "install docker ubuntu"):
+            self.assertIsNone(self.index.find(canonical_query(query)), query)
+
+    def test_removed_queries_no_longer_match(self):
+        self.index.remove("python教程入门")
+        self.assertIsNone(self.index.find("python教程入门。"))
+        self.assertEqual(len(self.index), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import os
+import sys
+import json
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import app
+from search_fakes import DEPS, engine, item
+from utils import web_search
+from utils.search_cache import search_cache
+from utils.search_health import EngineHealthRegistry
+
+
+class TestSearchStream(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        search_cache.clear()
+        self.patches = [
+            patch.object(web_search, "engine_health", EngineHealthRegistry()),
+            patch.object(api_server, "resolve_dependencies", return_value=(DEPS, [])),
+            patch.object(api_server.search_prefetcher, "pages", 0),
+            patch.dict(web_search.ENGINES, {
+                "DuckDuckGo": (engine(0.01, [item(1), item(2)]), "DDGS"),
+                "Bing": (engine(0.4, [item(2), item(3, "b.com"), item(4, "b.com")]), "DDGS"),
+                "Baidu": (engine(0.05, error="Blocked (Len: 300)"), "DDGS"),
+            }, clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def stream(self, **body):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            resp = await client.post("/api/search/stream", json={"query": "q", "max_results": 3, **body})
+        return resp
+
+    async def test_ndjson_events_arrive_per_engine(self):
+        resp = await self.stream()
+        self.assertEqual(resp.headers["content-type"], "application/x-ndjson")
+        events = [json.loads(line) for line in resp.text.splitlines()]
+        self.assertEqual([(e["event"], e.get("engine")) for e in events],
+                         [("results", "DuckDuckGo"), ("error", "Baidu"), ("results", "Bing"), ("done", None)])
+
+        first, _, second, done = events
+        self.assertLess(first["elapsed_ms"], 200)  # the fast engine is not held back by the slow one
+        self.assertGreaterEqual(second["elapsed_ms"], 400)
+        self.assertEqual([r["title"] for r in first["results"]], ["t1", "t2"])
+        self.assertEqual([r["title"] for r in second["results"]], ["t3"])  # t2 was a duplicate; one page at most
+        # Final ranking: t2 was returned by two engines
+        self.assertEqual([r["title"] for r in done["results"]], ["t2", "t1", "t3"])
+        self.assertEqual(done["errors"], ["Baidu: Blocked (Len: 300)"])
+
+        cached = [json.loads(line) for line in (await self.stream()).text.splitlines()]
+        self.assertEqual([(e["event"], e.get("engine")) for e in cached], [("results", "cache"), ("done", None)])
+        self.assertTrue(cached[1]["cached"])
+
+    async def test_sse_format(self):
+        resp = await self.stream(stream_format="sse")
+        self.assertTrue(resp.headers["content-type"].startswith("text/event-stream"))
+        frames = [frame for frame in resp.text.split("\n\n") if frame]
+        self.assertEqual([f.split("\n")[0] for f in frames],
+                         ["event: results", "event: error", "event: results", "event: done"])
+        done = json.loads(frames[-1].split("data: ", 1)[1])
+        self.assertEqual(len(done["results"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from api_server import app
+import utils.llm_client as llm_client
+from llm_fakes import patch_upstream, stream_chunk
+from utils.sse import sse_stream
+
+
+def parse_events(raw):
+    events = []
+    for frame in raw.split("\n\n"):
+        if not frame.strip():
+            continue
+        if frame.startswith(":"):
+            events.append(("ping", None))
+            continue
+        fields = dict(line.split(": ", 1) for line in frame.split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+async def tokens(n, delay=0.0, fail_at=None):
+    for i in range(n):
+        if fail_at is not None and i == fail_at:
+            raise RuntimeError("upstream broke")
+        if delay:
+            await asyncio.sleep(delay)
+        yield f"t{i} "
+
+
+class TestSSEStream(unittest.IsolatedAsyncioTestCase):
+    async def test_deltas_are_coalesced(self):
+        frames = [f async for f in sse_stream(tokens(200), window=0.05)]
+        events = parse_events("".join(frames))
+        deltas = [data for name, data in events if name == "delta"]
+        self.assertLess(len(deltas), 20)
+        self.assertEqual("".join(d["text"] for d in deltas), "".join(f"t{i} " for i in range(200)))
+        self.assertEqual([name for name, _ in events[-2:]], ["usage", "done"])
+        usage = events[-2][1]
+        self.assertEqual((usage["chunks"], usage["frames"]), (200, len(deltas)))
+
+    async def test_size_window_flushes_large_frames(self):
+        frames = [f async for f in sse_stream(tokens(100), window=10, max_bytes=64)]
+        deltas = [d for name, d in parse_events("".join(frames)) if name == "delta"]
+        self.assertGreater(len(deltas), 5)
+        self.assertTrue(all(len(d["text"].encode()) < 64 + 8 for d in deltas))
+
+    async def test_error_is_a_typed_event(self):
+        frames = [f async for f in sse_stream(tokens(10, fail_at=5))]
+        events = parse_events("".join(frames))
+        names = [name for name, _ in events]
+        self.assertIn("error", names)
+        self.assertEqual(events[names.index("error")][1]["message"], "upstream broke")
+        self.assertEqual(events[-1], ("done", {"ok": False}))
+
+    async def test_keepalive_ping_when_idle(self):
+        async def slow():
+            await asyncio.sleep(0.2)
+            yield "late"
+
+        frames = [f async for f in sse_stream(slow(), ping_interval=0.05)]
+        self.assertIn(("ping", None), parse_events("".join(frames)))
+
+    async def test_backpressure_bounds_upstream_read_ahead(self):
+        pulled = 0
+
+        async def upstream():
+            nonlocal pulled
+            for i in range(1000):
+                pulled += 1
+                yield "x" * 100
+
+        stream = sse_stream(upstream(), window=0.001, max_bytes=100, queue_size=8)
+        await stream.__anext__()
+        await asyncio.sleep(0.05)  # slow client: nothing consumed for a while
+        self.assertLessEqual(pulled, 8 + 3)
+        await stream.aclose()
+
+
+class TestSSEEndpoints(unittest.IsolatedAsyncioTestCase):
+    async def test_chat_sse_mode(self):
+        async def fake(**kwargs):
+            async def gen():
+                for part in ["你", "好", "！"]:
+                    yield stream_chunk(part)
+            return gen()
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            with patch_upstream(fake):
+                resp = await client.post("/api/chat", json={
+                    "messages": [{"role": "user", "content": "hi"}], "api_key": "k", "stream_format": "sse",
+                })
+                legacy = await client.post("/api/code/generate", json={
+                    "task": "explain", "language": "py", "content": "x=1", "api_key": "k",
+                })
+
+        self.assertTrue(resp.headers["content-type"].startswith("text/event-stream"))
+        events = parse_events(resp.text)
+        self.assertEqual("".join(d["text"] for n, d in events if n == "delta"), "你好！")
+        usage = next(d for n, d in events if n == "usage")
+        self.assertIn("tokens_sent", usage)
+        self.assertEqual(events[-1], ("done", {"ok": True}))
+        # Default mode stays raw text for the existing frontend
+        self.assertTrue(legacy.headers["content-type"].startswith("text/plain"))
+        self.assertEqual(legacy.text, "你好！")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import httpx
+from aiohttp import web
+
+# Add project root to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from api_server import app
+from llm_fakes import patch_upstream
+from search_fakes import DEPS, engine, engines, item
+from utils import web_search
+from utils.search_cache import SearchCache, search_cache
+from utils.search_health import engine_health
+from utils.search_http import SearchSessions
+
+
+class TestFanOut(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        engine_health.reset()
+
+    async def test_engines_run_concurrently(self):
+        with engines(DuckDuckGo=engine(0.2, [item(1)]), Bing=engine(0.2, [item(2, "b.com")]),
+                     Baidu=engine(0.2, [item(3, "c.com")])):
+            start = time.perf_counter()
+            results, errors = await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(len(results), 3)
+        self.assertEqual(errors, [])
+        self.assertLess(elapsed, 0.4)  # ~max(engine), not the sum
+
+    async def test_returns_early_and_cancels_slow_engines(self):
+        cancelled = []
+        with engines(DuckDuckGo=engine(0.01, [item(n) for n in range(10)]),
+                     Baidu=engine(5, [item(99)], log=cancelled, name="Baidu")):
+            start = time.perf_counter()
+            results, errors = await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+            await asyncio.sleep(0)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(len(results), 10)
+        self.assertEqual(cancelled, ["Baidu"])
+
+    async def test_deadline_keeps_partial_results(self):
+        with engines(DuckDuckGo=engine(0.01, [item(1)]), Bing=engine(5, [item(2, "b.com")])):
+            results, errors = await web_search.fan_out_search(DEPS, "q", 1, 10, 10, deadline=0.1)
+        self.assertEqual([r["href"] for r in results], ["https://a.com/1"])
+        self.assertIn("Deadline", errors[0])
+        self.assertIn("Bing", errors[0])
+
+    async def test_results_found_by_several_engines_rank_first(self):
+        shared = item(7, "shared.com")
+        with engines(DuckDuckGo=engine(0.01, [item(1), shared]), Bing=engine(0.02, [item(2, "b.com"), shared])):
+            results, _ = await web_search.fan_out_search(DEPS, "q", 1, 10, 10)
+        self.assertEqual(results[0]["href"], shared["href"])
+        self.assertEqual(len(results), 3)
+
+    async def test_failures_are_collected_and_cached_items_excluded(self):
+        cached = [item(1)]
+        with engines(DuckDuckGo=engine(0.01, [item(1), item(2)]), Bing=engine(0.01, error="Blocked")):
+            results, errors = await web_search.fan_out_search(DEPS, "q", 2, 10, 10, exclude=cached)
+        self.assertEqual([r["href"] for r in results], ["https://a.com/2"])
+        self.assertEqual(errors, ["Bing: Blocked"])
+
+
+class BlockingDDGS:
+    """Stand-in for duckduckgo_search.DDGS: blocks the calling thread like the real library."""
+
+    delays = {}
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def text(self, query, backend, max_results, **kwargs):
+        time.sleep(self.delays.get(backend, 0.3))
+        return [item(n, backend + ".com") for n in range(max_results)]
+
+
+class TestDuckDuckGo(unittest.IsolatedAsyncioTestCase):
+    async def test_slow_backend_times_out_and_next_backend_answers(self):
+        with patch.object(BlockingDDGS, "delays", {"api": 1, "html": 0.01}):
+            start = time.perf_counter()
+            results = await web_search.search_ddg({"DDGS": BlockingDDGS}, "q", 1, 5, 5, backend_timeout=0.2)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assertEqual(results[0]["href"], "https://html.com/0")
+
+    async def test_chat_stream_stays_smooth_during_searches(self):
+        # Token timestamps are taken on the event loop: a blocking DDG call would show up as a gap
+        stamps = []
+
+        async def upstream(**kwargs):
+            async def gen():
+                for i in range(30):
+                    await asyncio.sleep(0.01)
+                    stamps.append(time.perf_counter())
+                    yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"{i} "))])
+            return gen()
+
+        transport = httpx.ASGITransport(app=app)
+        deps = {**DEPS, "DDGS": BlockingDDGS}
+        with patch_upstream(upstream), \
+             patch.object(BlockingDDGS, "delays", {"api": 0.15}), \
+             engines(DuckDuckGo=web_search.search_ddg):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                chat = client.post("/api/chat", json={
+                    "messages": [{"role": "user", "content": "hi"}], "api_key": "k", "model": "fast/model",
+                })
+
+                async def search_while_streaming(query):
+                    while not stamps:  # start once tokens are flowing
+                        await asyncio.sleep(0.005)
+                    return await web_search.fan_out_search(deps, query, 1, 5, 5)
+
+                resp, *found = await asyncio.gather(chat, *(search_while_streaming(f"q{n}") for n in range(6)))
+
+        self.assertTrue(resp.text.startswith("0 1 2"))
+        self.assertTrue(all(len(results) == 5 for results, _ in found))
+        gaps = [b - a for a, b in zip(stamps, stamps[1:])]
+        self.assertLess(max(gaps), 0.1)
+
+
+class TestDependenciesAndSessions(unittest.IsolatedAsyncioTestCase):
+    def test_dependencies_are_imported_once_without_installing(self):
+        real_import = web_search.importlib.import_module
+        calls = []
+
+        modules = {module for module, *_ in web_search._DEPENDENCIES.values()}
+
+        def counting_import(name, *args):
+            if name in modules:
+                calls.append(name)
+            return real_import(name, *args)
+
+        with patch.object(web_search, "_resolved", None), \
+             patch.object(web_search.importlib, "import_module", side_effect=counting_import), \
+             patch("subprocess.check_call", side_effect=AssertionError("pip must not run")):
+            deps, _ = web_search.resolve_dependencies()
+            again, _ = web_search.resolve_dependencies()
+        self.assertIs(deps, again)
+        self.assertEqual(len(calls), len(web_search._DEPENDENCIES))
+        self.assertIs(deps["httpx"], httpx)
+
+    async def test_result_pages_reuse_one_pooled_connection(self):
+        peers = []
+
+        async def handle(request):
+            peers.append(request.transport.get_extra_info("peername")[1])
+            return web.Response(text="<html>ok</html>")
+
+        app_ = web.Application()
+        app_.router.add_get("/search", handle)
+        runner = web.AppRunner(app_)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/search"
+
+        sessions = SearchSessions(pool_size=4)
+        await sessions.start({"httpx": httpx})
+        try:
+            with patch.object(web_search, "search_sessions", sessions):
+                for _ in range(3):
+                    text = await web_search._fetch_html(
+                        {"httpx": httpx, "AsyncSession": None}, url, {"q": "x"}, {}, 5, [], "Stub")
+                    self.assertEqual(text, "<html>ok</html>")
+        finally:
+            await sessions.aclose()
+            await runner.cleanup()
+        self.assertEqual(len(set(peers)), 1)
+        self.assertEqual(sessions.requests["httpx"], 3)
+
+
+class TestSearchEndpoint(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        engine_health.reset()
+
+    async def test_first_page_warms_cache_for_next_page(self):
+        search_cache.clear()
+        transport = httpx.ASGITransport(app=app)
+        with engines(DuckDuckGo=engine(0.01, [item(n) for n in range(25)])), \
+             patch.object(api_server, "resolve_dependencies", return_value=(DEPS, [])), \
+             patch.object(api_server.search_prefetcher, "pages", 0):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = (await client.post("/api/search", json={"query": "q", "max_results": 10})).json()
+                second = (await client.post("/api/search", json={"query": "q", "page": 2, "max_results": 10})).json()
+                stats = (await client.get("/api/search/cache/stats")).json()
+        self.assertEqual([r["title"] for r in first["results"]], [f"t{n}" for n in range(10)])
+        self.assertEqual([r["title"] for r in second["results"]], [f"t{n}" for n in range(10, 20)])
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (1, 1, 1))
+
+    async def test_query_variants_share_cached_results(self):
+        fuzzy_cache = SearchCache(ttl=60, fuzzy=True)  # near-duplicate matching is opt-in
+        calls = []
+
+        async def counting(deps, query, page, max_results, needed):
+            calls.append(query)
+            return [item(n) for n in range(25)]
+
+        transport = httpx.ASGITransport(app=app)
+        with engines(DuckDuckGo=counting), \
+             patch.object(api_server, "resolve_dependencies", return_value=(DEPS, [])), \
+             patch.object(api_server, "search_cache", fuzzy_cache), \
+             patch.object(api_server.search_prefetcher, "pages", 0):
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                for query in ("Python教程入门", "python 教程入门 ", "Python 教程入門", "python教程入门。"):
+                    resp = (await client.post("/api/search", json={"query": query, "max_results": 10})).json()
+                    self.assertEqual(len(resp["results"]), 10)
+                    self.assertEqual(resp["original_query"], query)
+                stats = (await client.get("/api/search/cache/stats")).json()
+        self.assertEqual(calls, ["Python教程入门"])
+        self.assertEqual((stats["exact_hits"], stats["fuzzy_hits"], stats["misses"]), (2, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,7 @@
 
 import sys
 import os
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -24,8 +24,8 @@ def test_excel_generation():
     # Mock the LLM call to return CSV content
     mock_csv_content = "Month,Product,Revenue\nJan,A,100\nFeb,B,200\nMar,C,300"
     
-    # Patch where it is looked up: api_server.call_llm
-    with patch('api_server.call_llm', return_value=mock_csv_content) as mock_llm:
+    # Patch where it is looked up: api_server.acall_llm
+    with patch('api_server.acall_llm', new=AsyncMock(return_value=mock_csv_content)) as mock_llm:
         try:
             response = client.post(
                 "/api/generate/creative",
@@ -0,0 +1,95 @@
+"""Office AI Mate — 批量生成
+
+以有界并发执行一组异步任务，按完成顺序产出带序号的结果：
+- 单个任务失败只影响自身，结果中标记 ok=False 与错误信息
+- 批次可被取消（显式取消或客户端断开），未完成的任务逐条标记为 cancelled
+- 最后产出一条汇总（成功 / 失败 / 取消数与总耗时）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable
+
+_CANCELLED = object()
+
+# 进行中的批次，供取消接口按 ID 查找
+active_batches: dict[str, "BatchRun"] = {}
+
+
+class BatchRun:
+    """一次批量执行；results() 开始迭代时登记到 active_batches，结束（或被关闭）时移除。"""
+
+    def __init__(self, jobs: list[Callable[[], Awaitable[Any]]], concurrency: int):
+        self.id = uuid.uuid4().hex
+        self.jobs = jobs
+        self.concurrency = max(1, min(concurrency, len(jobs) or 1))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self.cancelled = False
+
+    def cancel(self) -> None:
+        """停止派发新任务并取消进行中的任务。"""
+        if self.cancelled:
+            return
+        self.cancelled = True
+        for worker in self._workers:
+            worker.cancel()
+        self._queue.put_nowait(_CANCELLED)
+
+    async def _worker(self, indices) -> None:
+        # 所有 worker 共享同一个序号迭代器，空闲即领取下一个任务
+        for index in indices:
+            start = time.perf_counter()
+            try:
+                item = {"index": index, "ok": True, "result": await self.jobs[index]()}
+            except Exception as e:
+                item = {"index": index, "ok": False, "error": str(e), "type": type(e).__name__}
+            item["elapsed"] = round(time.perf_counter() - start, 3)
+            self._queue.put_nowait(item)
+
+    async def results(self) -> AsyncIterator[dict]:
+        """按完成顺序产出每个任务的结果，最后产出汇总。"""
+        start = time.perf_counter()
+        total = len(self.jobs)
+        counts = {"succeeded": 0, "failed": 0, "cancelled": 0}
+        finished: set[int] = set()
+        indices = iter(range(total))
+        # 只登记实际开始执行的批次：创建后未被迭代的批次不会留在 active_batches 中
+        active_batches[self.id] = self
+        try:
+            self._workers = [asyncio.ensure_future(self._worker(indices)) for _ in range(self.concurrency)]
+            while len(finished) < total and not self.cancelled:
+                item = await self._queue.get()
+                if item is _CANCELLED:
+                    break
+                finished.add(item["index"])
+                counts["succeeded" if item["ok"] else "failed"] += 1
+                yield item
+
+            # 取消前已完成但尚未产出的结果照常返回
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _CANCELLED and item["index"] not in finished:
+                    finished.add(item["index"])
+                    counts["succeeded" if item["ok"] else "failed"] += 1
+                    yield item
+
+            for index in range(total):
+                if index not in finished:
+                    counts["cancelled"] += 1
+                    yield {"index": index, "ok": False, "cancelled": True}
+            yield {
+                "done": True,
+                "batch_id": self.id,
+                "total": total,
+                **counts,
+                "elapsed": round(time.perf_counter() - start, 3),
+            }
+        finally:
+            # 客户端断开时生成器被关闭，同样取消剩余任务
+            for worker in self._workers:
+                worker.cancel()
+            active_batches.pop(self.id, None)
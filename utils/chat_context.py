@@ -0,0 +1,175 @@
+"""Office AI Mate — 对话上下文的 token 预算管理
+
+长对话超出预算时：
+- 始终保留开头的 system 提示词（文档内容 / 人设）以及最近几条消息
+- 更早的轮次被丢弃（truncate），或滚动合并为一段缓存的摘要（summarize）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+
+from config import (
+    CHAT_CONTEXT_BUDGET,
+    CHAT_CONTEXT_MIN_RECENT,
+    CHAT_SUMMARY_CACHE_SIZE,
+    CHAT_SUMMARY_MAX_TOKENS,
+    PROVIDER_BASE_URL,
+)
+from utils.llm_client import _resolve_model, acall_llm, load_litellm
+
+STRATEGIES = ("truncate", "summarize")
+
+_SUMMARY_PROMPT = (
+    "你是对话记录员。请把下面的【已有摘要】和【新增对话】合并为一份新的简明摘要，"
+    "保留用户的目标、关键事实、已做出的决定和未解决的问题，不要编造内容。"
+    "只输出摘要正文，不超过 {max_tokens} 个 token。\n\n"
+    "【已有摘要】\n{previous}\n\n【新增对话】\n{transcript}"
+)
+
+# 对话前缀指纹 → 该前缀的滚动摘要
+_summary_cache: OrderedDict[str, str] = OrderedDict()
+
+
+def count_tokens(model: str, messages: list[dict[str, Any]]) -> list[int]:
+    """按模型分词器统计每条消息的 token 数。"""
+    litellm = load_litellm()
+    counts = []
+    for message in messages:
+        try:
+            counts.append(litellm.token_counter(model=model, messages=[message]))
+        except Exception:
+            # 未知分词器时按字符数粗略估计
+            counts.append(len(str(message.get("content", ""))) // 2 + 4)
+    return counts
+
+
+@lru_cache(maxsize=256)
+def _model_input_limit(model: str) -> int | None:
+    """模型的最大输入 token 数（按 LiteLLM 解析后的模型名查询并缓存，未知模型为 None）。"""
+    try:
+        return load_litellm().get_model_info(model).get("max_input_tokens")
+    except Exception:
+        return None
+
+
+def _prefix_fingerprints(provider: str, model: str, messages: list[dict[str, Any]]) -> list[str]:
+    """返回每个对话前缀的链式指纹，fingerprints[k] 对应 messages[:k]。"""
+    digest = hashlib.sha256(f"{provider}:{model}".encode("utf-8")).hexdigest()
+    fingerprints = [digest]
+    for message in messages:
+        raw = digest + json.dumps(message, ensure_ascii=False, sort_keys=True, default=str)
+        digest = hashlib.sha256(raw.encode("utf-8")).hexdigest()
+        fingerprints.append(digest)
+    return fingerprints
+
+
+def _remember_summary(key: str, summary: str) -> None:
+    _summary_cache[key] = summary
+    _summary_cache.move_to_end(key)
+    while len(_summary_cache) > CHAT_SUMMARY_CACHE_SIZE:
+        _summary_cache.popitem(last=False)
+
+
+async def _running_summary(
+    provider: str, model: str, api_key: str, dropped: list[dict[str, Any]], **extra
+) -> str:
+    """对被移出窗口的消息生成摘要，优先在已缓存的较短前缀摘要上增量合并。"""
+    fingerprints = _prefix_fingerprints(provider, model, dropped)
+    start, previous = 0, ""
+    for k in range(len(dropped), 0, -1):
+        cached = _summary_cache.get(fingerprints[k])
+        if cached is not None:
+            start, previous = k, cached
+            _summary_cache.move_to_end(fingerprints[k])
+            break
+
+    if start == len(dropped):
+        return previous
+
+    transcript = "\n".join(
+        f"{m.get('role', 'user')}: {m.get('content', '')}" for m in dropped[start:]
+    )
+    prompt = _SUMMARY_PROMPT.format(
+        max_tokens=CHAT_SUMMARY_MAX_TOKENS, previous=previous or "（无）", transcript=transcript
+    )
+    summary = await acall_llm(
+        provider=provider,
+        model=model,
+        api_key=api_key,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=CHAT_SUMMARY_MAX_TOKENS,
+        **extra,
+    )
+    summary = (summary or "").strip()
+    _remember_summary(fingerprints[-1], summary)
+    return summary
+
+
+async def fit_messages(
+    provider: str,
+    model: str,
+    api_key: str,
+    messages: list[dict[str, Any]],
+    budget: int | None = None,
+    strategy: str = "truncate",
+    **extra,
+) -> tuple[list[dict[str, Any]], dict]:
+    """把消息列表裁剪到 token 预算以内，返回 (新消息列表, 统计报告)。"""
+    budget = budget or CHAT_CONTEXT_BUDGET
+    if strategy not in STRATEGIES:
+        strategy = "truncate"
+    api_base = extra.get("api_base") or PROVIDER_BASE_URL.get(provider)
+    limit = await asyncio.to_thread(_model_input_limit, _resolve_model(provider, model, api_base))
+    if limit:
+        budget = min(budget, limit)
+
+    counts = await asyncio.to_thread(count_tokens, model, messages)
+    original = sum(counts)
+    report = {"tokens_original": original, "tokens_sent": original, "tokens_saved": 0,
+              "budget": budget, "dropped_messages": 0, "summarized": False}
+    if original <= budget:
+        return messages, report
+
+    # 开头连续的 system 消息始终保留
+    head = 0
+    while head < len(messages) and messages[head].get("role") == "system":
+        head += 1
+    system, conversation = messages[:head], messages[head:]
+    conversation_counts = counts[head:]
+
+    reserve = CHAT_SUMMARY_MAX_TOKENS + 20 if strategy == "summarize" else 0
+    remaining = budget - sum(counts[:head]) - reserve
+
+    # 从最新的消息往前保留；最近 CHAT_CONTEXT_MIN_RECENT 条无论预算都保留
+    cut = len(conversation)
+    for i in range(len(conversation) - 1, -1, -1):
+        kept = len(conversation) - i
+        if kept > CHAT_CONTEXT_MIN_RECENT and conversation_counts[i] > remaining:
+            break
+        remaining -= conversation_counts[i]
+        cut = i
+
+    dropped, recent = conversation[:cut], conversation[cut:]
+    fitted = system + recent
+    sent = sum(counts[:head]) + sum(conversation_counts[cut:])
+
+    if dropped and strategy == "summarize":
+        try:
+            summary = await _running_summary(provider, model, api_key, dropped, **extra)
+        except Exception as e:
+            print(f"WARN: Context summary failed, falling back to truncate: {e}")
+            summary = ""
+        if summary:
+            summary_message = {"role": "system", "content": f"以下是此前对话的摘要：\n{summary}"}
+            fitted = system + [summary_message] + recent
+            sent += (await asyncio.to_thread(count_tokens, model, [summary_message]))[0]
+            report["summarized"] = True
+
+    report.update(tokens_sent=sent, tokens_saved=max(original - sent, 0), dropped_messages=len(dropped))
+    return fitted, report
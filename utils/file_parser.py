@@ -1,16 +1,25 @@
 """Office AI Mate — 文件解析模块
 
 支持 PDF, DOCX, TXT, CSV, XLSX 格式的文本提取。
+页数较多的 PDF 按页段分发到进程池并行提取，结果按页序拼接；每页提取后立即释放页面对象。
 """
 
 from __future__ import annotations
 
 import io
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from typing import IO
 
 import pandas as pd
 import pdfplumber
 
+from config import PDF_PAGES_PER_TASK, PDF_PARALLEL_MIN_PAGES, PDF_WORKERS
+
 try:
     from docx import Document
     HAS_DOCX = True
@@ -18,19 +27,119 @@ except ImportError:
     HAS_DOCX = False
 
 
-def parse_pdf(file: IO[bytes]) -> str:
-    """从 PDF 文件中提取纯文本。"""
-    text_content = []
+_pdf_pool: ProcessPoolExecutor | None = None
+_pdf_pool_lock = threading.Lock()
+
+
+def pdf_pool() -> ProcessPoolExecutor:
+    """PDF 文本提取进程池（按需创建；spawn 启动，避免在多线程的服务进程中 fork）。"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+
+def shutdown_pdf_pool() -> None:
+    """关闭进程池，丢弃尚未开始的任务（应用关闭时调用）。"""
+    global _pdf_pool
+    with _pdf_pool_lock:
+        pool, _pdf_pool = _pdf_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_pages(pages) -> list[str]:
+    # 逐页提取；提取完立即 close，释放该页解析出的字符 / 图形对象，内存占用不随页数增长
+    texts = []
+    for page in pages:
+        try:
+            texts.append(page.extract_text() or "")
+        finally:
+            page.close()
+    return texts
+
+
+def _extract_page_range(path: str, first: int, last: int) -> list[str]:
+    """进程池任务：提取第 first..last 页（从 1 开始，含两端）的文本。"""
+    with pdfplumber.open(path, pages=list(range(first, last + 1))) as pdf:
+        return _extract_pages(pdf.pages)
+
+
+def _select_pages(total: int, page_range: tuple[int, int] | None, max_pages: int | None) -> range:
+    first, last = page_range if page_range is not None else (1, total)
+    first, last = max(first, 1), min(last, total)
+    if max_pages is not None:
+        last = min(last, first + max_pages - 1)
+    return range(first, last + 1)
+
+
+def _extract_parallel(file: IO[bytes], pages: range, executor: Executor) -> list[str]:
+    # 子进程按路径打开 PDF：真实文件直接使用其路径，内存中的上传文件先写入临时文件
+    path, temp_path = getattr(file, "name", None), None
+    try:
+        file.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        path = None
+    if not isinstance(path, str) or not os.path.isfile(path):
+        file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+            tmp.write(file.read())
+        path = temp_path = tmp.name
+    try:
+        step = max(PDF_PAGES_PER_TASK, 1)
+        futures = [
+            executor.submit(_extract_page_range, path, first, min(first + step - 1, pages[-1]))
+            for first in range(pages[0], pages[-1] + 1, step)
+        ]
+        texts = []
+        for future in futures:  # 按提交顺序取结果 = 按页序拼接
+            texts.extend(future.result())
+        return texts
+    finally:
+        if temp_path is not None:
+            os.unlink(temp_path)
+
+
+def parse_pdf(file: IO[bytes], page_range: tuple[int, int] | None = None, max_pages: int | None = None,
+              executor: Executor | None = None) -> str:
+    """从 PDF 文件中提取纯文本。
+
+    Parameters
+    ----------
+    file : IO[bytes]
+        PDF 文件对象。
+    page_range : tuple[int, int], optional
+        只提取第 first..last 页（从 1 开始，含两端）。
+    max_pages : int, optional
+        最多提取的页数（从 page_range 的起始页算起）。
+    executor : Executor, optional
+        并行提取使用的进程池；默认在页数达到 PDF_PARALLEL_MIN_PAGES 且 PDF_WORKERS > 1 时使用 pdf_pool()。
+    """
     try:
         with pdfplumber.open(file) as pdf:
-            for page in pdf.pages:
-                text = page.extract_text()
-                if text:
-                    text_content.append(text)
+            pages = _select_pages(len(pdf.pages), page_range, max_pages)
+            if not pages:
+                return ""
+            if executor is None and (len(pages) < PDF_PARALLEL_MIN_PAGES or PDF_WORKERS <= 1):
+                texts = _extract_pages(pdf.pages[pages[0] - 1:pages[-1]])
+            else:
+                texts = None
+        if texts is None:
+            try:
+                texts = _extract_parallel(file, pages, executor or pdf_pool())
+            except BrokenProcessPool as e:
+                # 子进程异常退出（如内存不足被杀）：重建进程池留给下次，本次在当前进程内提取
+                print(f"WARN: PDF worker pool broken, extracting in-process: {e}")
+                if executor is None:
+                    shutdown_pdf_pool()
+                file.seek(0)
+                with pdfplumber.open(file) as pdf:
+                    texts = _extract_pages(pdf.pages[pages[0] - 1:pages[-1]])
     except Exception as e:
         return f"[PDF Parsing Error: {str(e)}]"
-        
-    return "\n\n".join(text_content)
+
+    return "\n\n".join(text for text in texts if text)
 
 
 def parse_docx(file: IO[bytes]) -> str:
@@ -92,6 +201,8 @@ _PARSERS: dict[str, callable] = {
 def parse_file(file) -> str:
     """根据文件扩展名自动选择解析器。
 
+    解析是同步的（大 PDF 会等待进程池完成），在 async 端点中请经 asyncio.to_thread 调用。
+
     Parameters
     ----------
     file : UploadedFile or IO
@@ -0,0 +1,140 @@
+"""Office AI Mate — LLM 上游 HTTP 连接池
+
+为每个 (provider, base_url) 维护一个长连接 aiohttp 会话，
+内置 OpenAI 兼容客户端与 LiteLLM（shared_session 参数）共用，避免每次调用重新进行 TLS 握手。
+只为已知上游（内置 provider 的原生接口与配置的 base_url）建立会话，数量有界；
+客户端传入的其他 base_url 不进入连接池，由调用方使用一次性会话。
+连接池由 FastAPI lifespan 启动与关闭。
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import aiohttp
+
+from config import (
+    LLM_HEDGE_BASE_URL, LLM_HTTP_KEEPALIVE, LLM_HTTP_POOL_BASE_URLS, LLM_HTTP_POOL_SIZE, PROVIDER_BASE_URL, PROVIDERS,
+)
+
+
+def _normalize(base_url: str | None) -> str | None:
+    return base_url.strip().rstrip("/") if base_url else None
+
+
+class _PoolStats:
+    """单个连接池的请求数与连接创建 / 复用计数。"""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def as_dict(self) -> dict:
+        reuse_rate = self.connections_reused / self.requests if self.requests else 0.0
+        return {
+            "requests": self.requests,
+            "connections_created": self.connections_created,
+            "connections_reused": self.connections_reused,
+            "reuse_rate": round(reuse_rate, 4),
+        }
+
+
+class HTTPClientPool:
+    """按 (provider, base_url) 管理长连接会话。"""
+
+    def __init__(self, pool_size: int = 100, keepalive: float = 60, base_urls: list[str] | None = None):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        # 可建立连接池的 base_url（原生 provider 的 None 另按 PROVIDERS 判断）
+        self.base_urls = {_normalize(u) for u in [*PROVIDER_BASE_URL.values(), *(base_urls or [])] if u}
+        self._sessions: dict[tuple[str, str | None], aiohttp.ClientSession] = {}
+        self._stats: dict[tuple[str, str | None], _PoolStats] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    async def start(self) -> None:
+        """在当前事件循环中启动连接池，并预先为内置 OpenAI 兼容平台创建会话。"""
+        self._loop = asyncio.get_running_loop()
+        for provider, base_url in PROVIDER_BASE_URL.items():
+            self.get_session(provider, base_url)
+
+    async def aclose(self) -> None:
+        """关闭所有会话。"""
+        sessions = list(self._sessions.values())
+        self._sessions.clear()
+        self._loop = None
+        for session in sessions:
+            await session.close()
+
+    def get_session(self, provider: str, base_url: str | None) -> aiohttp.ClientSession | None:
+        """返回对应的会话；连接池未启动、不在所属事件循环或不是已知上游时返回 None（调用方自行建连）。"""
+        if self._loop is None:
+            return None
+        try:
+            if asyncio.get_running_loop() is not self._loop:
+                return None
+        except RuntimeError:
+            return None
+
+        key = (provider, _normalize(base_url))
+        if not self._poolable(*key):
+            return None
+        session = self._sessions.get(key)
+        if session is None or session.closed:
+            session = self._create_session(key)
+            self._sessions[key] = session
+        return session
+
+    def _poolable(self, provider: str, base_url: str | None) -> bool:
+        # provider 与 base_url 都来自客户端请求：只接受已知取值，会话数因此有界
+        if base_url is None:
+            return provider in PROVIDERS
+        return base_url in self.base_urls
+
+    def _create_session(self, key: tuple[str, str | None]) -> aiohttp.ClientSession:
+        stats = self._stats.setdefault(key, _PoolStats())
+        trace = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            stats.requests += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            stats.connections_created += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats.connections_reused += 1
+
+        trace.on_request_start.append(on_request_start)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            keepalive_timeout=self.keepalive,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(connector=connector, trace_configs=[trace])
+
+    def stats(self) -> dict:
+        """返回各连接池的连接复用统计。"""
+        return {
+            "started": self.started,
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "pools": [
+                {"provider": provider, "base_url": base_url, **s.as_dict()}
+                for (provider, base_url), s in self._stats.items()
+            ],
+        }
+
+
+# 进程级默认实例
+http_pools = HTTPClientPool(
+    pool_size=LLM_HTTP_POOL_SIZE,
+    keepalive=LLM_HTTP_KEEPALIVE,
+    base_urls=[LLM_HEDGE_BASE_URL, *LLM_HTTP_POOL_BASE_URLS],
+)
@@ -0,0 +1,191 @@
+"""Office AI Mate — LLM 响应缓存
+
+对确定性较强的生成类端点（思维导图、PPT 大纲、模板创作等）缓存模型回复：
+- 内存层：有界 LRU + TTL
+- 磁盘层（可选）：SQLite 持久化，服务重启后仍可命中；异步调用方经 aget / aset 在线程中读写磁盘层
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any
+
+from config import LLM_CACHE_DB_PATH, LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL
+
+# 参与缓存键计算的采样参数（其余参数如 stream / api_key 不影响回复内容）
+_SAMPLING_PARAMS = (
+    "temperature", "top_p", "top_k", "max_tokens", "stop", "seed",
+    "presence_penalty", "frequency_penalty", "response_format",
+)
+
+
+def _normalize_content(content: Any) -> Any:
+    """统一换行与首尾空白；多模态内容保持结构不变。"""
+    if isinstance(content, str):
+        return content.replace("\r\n", "\n").strip()
+    return content
+
+
+def make_cache_key(provider: str, kwargs: dict) -> str:
+    """根据 provider、模型、规范化后的消息和采样参数生成缓存键。"""
+    payload = {
+        "provider": provider,
+        "model": kwargs.get("model"),
+        "api_base": kwargs.get("api_base"),
+        "messages": [
+            {"role": m.get("role"), "content": _normalize_content(m.get("content"))}
+            for m in kwargs.get("messages", [])
+        ],
+        "params": {k: kwargs[k] for k in _SAMPLING_PARAMS if k in kwargs},
+    }
+    raw = json.dumps(payload, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """内存 LRU + 可选 SQLite 持久层的两级缓存（线程安全）。"""
+
+    def __init__(self, max_entries: int = 512, ttl: float = 3600, db_path: str | None = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()     # 内存层与计数器
+        self._db_lock = threading.Lock()  # SQLite 连接
+        self._db: sqlite3.Connection | None = None
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    def get(self, key: str) -> str | None:
+        """查询缓存，过期条目视为未命中并被移除。"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = self._disk_get(key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    async def aget(self, key: str) -> str | None:
+        """get 的异步版本：内存层未命中时，磁盘层查询在线程中执行，不阻塞事件循环。"""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None and self._db is not None:
+            value = await asyncio.to_thread(self._disk_get, key, now)
+        if value is None:
+            self._miss()
+        return value
+
+    def set(self, key: str, value: str) -> None:
+        """写入缓存（同时写入磁盘层，若已启用）。"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db is not None:
+            self._disk_set(key, value, expires_at)
+
+    async def aset(self, key: str, value: str) -> None:
+        """set 的异步版本：磁盘层写入与提交在线程中执行。"""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_set, key, value, expires_at)
+
+    def _memory_get(self, key: str, now: float) -> str | None:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            self.memory_hits += 1
+            return value
+
+    def _disk_get(self, key: str, now: float) -> str | None:
+        # 磁盘 I/O 只持有 _db_lock，不阻塞内存层的读写
+        with self._db_lock:
+            row = self._db.execute("SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None and row[1] <= now:
+                self._db.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._db.commit()
+                row = None
+        if row is None:
+            return None
+        value, expires_at = row
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self.hits += 1
+            self.disk_hits += 1
+        return value
+
+    def _disk_set(self, key: str, value: str, expires_at: float) -> None:
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, expires_at),
+            )
+            self._db.commit()
+
+    def _miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def clear(self) -> None:
+        """清空两级缓存与计数器。"""
+        with self._lock, self._db_lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM llm_cache")
+                self._db.commit()
+            self.hits = self.memory_hits = self.disk_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """返回命中 / 未命中计数及当前容量。"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "persistent": self._db is not None,
+            }
+
+
+# 进程级默认实例
+response_cache = LLMResponseCache(
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl=LLM_CACHE_TTL,
+    db_path=LLM_CACHE_DB_PATH or None,
+)
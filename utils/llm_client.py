@@ -1,34 +1,62 @@
 """Office AI Mate — LLM 客户端封装
 
-基于 LiteLLM 实现统一的多模型调用接口。
-支持原生提供者（OpenAI/Anthropic/Google）以及
-OpenAI 兼容平台（SiliconCloud/OpenRouter）。
+统一的多模型调用接口：
+带 api_base 的 OpenAI 兼容平台（SiliconCloud/OpenRouter/自定义 base_url）走内置轻量客户端，
+原生提供者（OpenAI/Anthropic/Google）由 LiteLLM 处理。
 """
 
 from __future__ import annotations
 
+import asyncio
 import os
 from typing import Generator, Any, AsyncGenerator
 
-import litellm
-from config import PROVIDER_ENV_KEY, PROVIDER_BASE_URL, PROVIDER_MODEL_PREFIX
+from config import PROVIDER_BASE_URL, PROVIDER_MODEL_PREFIX
+from utils import openai_compat
+from utils.http_pool import http_pools
+from utils.llm_cache import make_cache_key, response_cache
+from utils import llm_hedge
+from utils.llm_hedge import hedged_call, hedged_stream
+from utils.llm_metrics import CallTimer, llm_metrics
+from utils.llm_ratelimit import limited_call
+from utils.llm_singleflight import inflight_calls, inflight_streams, make_flight_key
+from utils.prompt_cache import mark_stable_prefix, prompt_cache_stats, supports_cache_hints
 
 
-def _set_api_key(provider: str, api_key: str) -> None:
-    """将 API Key 注入对应的环境变量，供 LiteLLM 使用。"""
-    env_var = PROVIDER_ENV_KEY.get(provider)
-    if env_var:
-        os.environ[env_var] = api_key
+def load_litellm():
+    """按需导入 LiteLLM（导入耗时较长，只走轻量客户端的进程不会加载）。
+
+    默认使用随包附带的模型价格表，避免导入时联网拉取；
+    关闭 LiteLLM 在查询未知模型等场景向标准输出打印的调试提示。
+    """
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
+    import litellm
+    litellm.suppress_debug_info = True
+    return litellm
+
+
+_litellm = None  # 导入完成后的 litellm 模块
+
+
+async def aload_litellm():
+    """load_litellm 的异步版本：首次导入在线程中完成，不阻塞事件循环。"""
+    global _litellm
+    if _litellm is None:
+        _litellm = await asyncio.to_thread(load_litellm)
+    return _litellm
 
 
 def _resolve_model(provider: str, model: str, api_base: str | None) -> str:
     """根据 provider 和 api_base 为模型名加上 LiteLLM 所需的前缀。
 
     - 有自定义 api_base → 走 OpenAI 兼容协议，需要 "openai/" 前缀
+    - OpenRouter 上支持缓存标记的模型 → "openrouter/" 前缀（保留消息中的 cache_control）
     - Google 原生 → 需要 "gemini/" 前缀
     - 已经有正确前缀的不重复添加
     """
     if api_base:
+        if provider == "OpenRouter" and supports_cache_hints(provider, model):
+            return f"openrouter/{model}"
         # 自定义 base URL → OpenAI 兼容，确保有 openai/ 前缀
         if not model.startswith("openai/"):
             return f"openai/{model}"
@@ -41,20 +69,118 @@ def _resolve_model(provider: str, model: str, api_base: str | None) -> str:
     return model
 
 
-def _build_kwargs(provider: str, model: str, messages: list[dict[str, Any]], **extra) -> dict:
-    """构造 LiteLLM completion() 的关键字参数。"""
+def _build_kwargs(
+    provider: str,
+    model: str,
+    messages: list[dict[str, Any]],
+    api_key: str | None = None,
+    **extra,
+) -> dict:
+    """构造 LiteLLM completion() 的关键字参数。
+
+    凭据（api_key）与 api_base 均随本次调用显式传入，不写入 os.environ，
+    因此不同租户的并发请求之间不存在共享状态。
+    支持的 provider 会在稳定的 system 前缀上加缓存断点；
+    OpenAI 兼容接口的流式请求附带 include_usage，以便统计缓存命中的 token。
+    """
     # 确定 api_base
     api_base = extra.pop("api_base", None) or PROVIDER_BASE_URL.get(provider)
 
     # 解析最终模型名
     resolved_model = _resolve_model(provider, model, api_base)
 
+    messages = mark_stable_prefix(provider, model, messages)
     kwargs: dict = {"model": resolved_model, "messages": messages, **extra}
+    if extra.get("stream") and (api_base or provider == "OpenAI"):
+        kwargs.setdefault("stream_options", {"include_usage": True})
+    if api_key:
+        kwargs["api_key"] = api_key
     if api_base:
         kwargs["api_base"] = api_base
     return kwargs
 
 
+async def _acompletion(provider: str, kwargs: dict, timer: CallTimer | None = None) -> Any:
+    """所有异步 LLM 请求的统一出口（网关）。
+
+    API 层的每个端点都经由 acall_llm / acall_llm_stream 到达这里，
+    保证不会在事件循环中执行同步的网络调用。
+    连接池已启动时复用对应 (provider, base_url) 的长连接会话；
+    请求在 provider 限流器下排队，429 时按 Retry-After 重试。
+    非流式请求在此结束计时；流式请求由调用方传入 timer 并在流结束时结束计时。
+    """
+    session = http_pools.get_session(provider, kwargs.get("api_base"))
+    if session is not None:
+        kwargs = {**kwargs, "shared_session": session}
+    stream = bool(kwargs.get("stream"))
+    timer = timer or llm_metrics.start_call(provider, kwargs["model"], stream)
+
+    if openai_compat.handles(kwargs):
+        backend = openai_compat.acompletion
+    else:
+        backend = (await aload_litellm()).acompletion
+
+    def call():
+        timer.dispatched()
+        return backend(**kwargs)
+
+    try:
+        response = await limited_call(provider, call, stream=stream)
+    except BaseException as e:
+        timer.finish(error=e)
+        raise
+    if not stream:
+        usage = getattr(response, "usage", None)
+        prompt_cache_stats.record(provider, kwargs, usage)
+        timer.finish(usage=usage)
+    return response
+
+
+async def _stream_deltas(provider: str, kwargs: dict) -> AsyncGenerator[str, None]:
+    """发起流式请求并逐块产出文本增量。"""
+    timer = llm_metrics.start_call(provider, kwargs["model"], stream=True)
+    response = await _acompletion(provider, kwargs, timer)
+    usage = None
+    try:
+        async for chunk in response:
+            # include_usage 时最后一块携带 usage，且可能没有 choices
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta and delta.content:
+                timer.token()
+                yield delta.content
+        prompt_cache_stats.record(provider, kwargs, usage)
+        timer.finish(usage=usage)
+    except BaseException as e:
+        timer.finish(error=e)
+        raise
+    finally:
+        # 提前结束（如对冲落败被取消）时立即关闭上游流并归还限流槽位
+        aclose = getattr(response, "aclose", None)
+        if aclose is not None:
+            await aclose()
+
+
+def _hedge_target(
+    provider: str, model: str, messages: list[dict[str, Any]], stream: bool, extra: dict
+) -> tuple[str, dict] | None:
+    """按对冲策略构造备用请求 (provider, kwargs)；未配置或与主请求相同时返回 None。"""
+    policy = llm_hedge.hedge_policy
+    if not policy or (policy["provider"], policy["model"]) == (provider, model):
+        return None
+    hedge_extra = {k: v for k, v in extra.items() if k != "api_base"}
+    if policy["api_base"]:
+        hedge_extra["api_base"] = policy["api_base"]
+    if stream:
+        hedge_extra["stream"] = True
+    kwargs = _build_kwargs(
+        policy["provider"], policy["model"], messages, api_key=policy["api_key"], **hedge_extra
+    )
+    return policy["provider"], kwargs
+
+
 def call_llm(
     provider: str,
     model: str,
@@ -62,10 +188,12 @@ def call_llm(
     messages: list[dict[str, Any]],
     **extra,
 ) -> str:
-    """同步调用 LLM 并返回完整回复文本。"""
-    _set_api_key(provider, api_key)
-    kwargs = _build_kwargs(provider, model, messages, **extra)
-    response = litellm.completion(**kwargs)
+    """同步调用 LLM 并返回完整回复文本。
+
+    仅供脚本 / 命令行使用；在 async 端点中请使用 acall_llm，否则会阻塞事件循环。
+    """
+    kwargs = _build_kwargs(provider, model, messages, api_key=api_key, **extra)
+    response = load_litellm().completion(**kwargs)
     return response.choices[0].message.content
 
 
@@ -77,42 +205,91 @@ def call_llm_stream(
     **extra,
 ) -> Generator[str, None, None]:
     """流式调用 LLM，逐块产出文本（用于聊天界面实时显示）。"""
-    _set_api_key(provider, api_key)
-    kwargs = _build_kwargs(provider, model, messages, stream=True, **extra)
-    response = litellm.completion(**kwargs)
+    kwargs = _build_kwargs(provider, model, messages, api_key=api_key, stream=True, **extra)
+    response = load_litellm().completion(**kwargs)
     for chunk in response:
         delta = chunk.choices[0].delta
         if delta and delta.content:
             yield delta.content
 
+
 async def acall_llm(
     provider: str,
     model: str,
     api_key: str,
     messages: list[dict[str, Any]],
+    cache: bool = False,
+    coalesce: bool = True,
+    hedge: bool = True,
     **extra,
 ) -> str:
-    """异步调用 LLM 并返回完整回复文本。"""
-    _set_api_key(provider, api_key)
-    kwargs = _build_kwargs(provider, model, messages, **extra)
-    response = await litellm.acompletion(**kwargs)
-    return response.choices[0].message.content
+    """异步调用 LLM 并返回完整回复文本。
+
+    cache=True 时先查询响应缓存（按 provider / 模型 / 消息 / 采样参数），
+    仅适用于输出可复用的生成类端点。
+    coalesce=True 时与进行中的相同请求合并，只向上游发送一次。
+    hedge=True 且配置了对冲策略时，主请求过慢或硬错误会转向备用 provider。
+    """
+    target = _hedge_target(provider, model, messages, False, extra) if hedge else None
+    kwargs = _build_kwargs(provider, model, messages, api_key=api_key, **extra)
+    cache_key = make_cache_key(provider, kwargs)
+    if cache:
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            return cached
+
+    async def fetch() -> str:
+        secondary = (lambda: _acompletion(*target)) if target else None
+        threshold = llm_hedge.hedge_policy["call_threshold"] if target else 0
+        response = await hedged_call(lambda: _acompletion(provider, kwargs), secondary, threshold)
+        content = response.choices[0].message.content
+        if cache and content:
+            await response_cache.aset(cache_key, content)
+        return content
+
+    if not coalesce:
+        return await fetch()
+    return await inflight_calls.do(make_flight_key(cache_key, api_key), fetch)
+
 
 async def acall_llm_stream(
     provider: str,
     model: str,
     api_key: str,
     messages: list[dict[str, Any]],
+    cache: bool = False,
+    coalesce: bool = True,
+    hedge: bool = True,
     **extra,
 ) -> AsyncGenerator[str, None]:
-    """流式异步调用 LLM，逐块产出文本。"""
-    _set_api_key(provider, api_key)
-    kwargs = _build_kwargs(provider, model, messages, stream=True, **extra)
-    response = await litellm.acompletion(**kwargs)
-    async for chunk in response:
-        delta = chunk.choices[0].delta
-        if delta and delta.content:
-            yield delta.content
+    """流式异步调用 LLM，逐块产出文本。
 
+    cache=True 时命中缓存则一次性产出完整文本；未命中则在流正常结束后写入缓存。
+    coalesce=True 时后到的相同请求先收到已缓冲的分块，再接收实时分块。
+    hedge=True 且配置了对冲策略时，首个 token 超时或硬错误会转向备用 provider。
+    """
+    target = _hedge_target(provider, model, messages, True, extra) if hedge else None
+    kwargs = _build_kwargs(provider, model, messages, api_key=api_key, stream=True, **extra)
+    cache_key = make_cache_key(provider, kwargs)
+    if cache:
+        cached = await response_cache.aget(cache_key)
+        if cached is not None:
+            yield cached
+            return
 
+    async def produce() -> AsyncGenerator[str, None]:
+        parts: list[str] = []
+        secondary = (lambda: _stream_deltas(*target)) if target else None
+        threshold = llm_hedge.hedge_policy["threshold"] if target else 0
+        async for text in hedged_stream(lambda: _stream_deltas(provider, kwargs), secondary, threshold):
+            parts.append(text)
+            yield text
+        if cache and parts:
+            await response_cache.aset(cache_key, "".join(parts))
 
+    if coalesce:
+        stream = inflight_streams.stream(make_flight_key(cache_key, api_key), produce)
+    else:
+        stream = produce()
+    async for chunk in stream:
+        yield chunk
@@ -0,0 +1,194 @@
+"""Office AI Mate — 对冲请求与故障转移
+
+主请求在阈值内没有返回首个 token（非流式调用为完整回复，阈值单独设置）时，向备用 provider/模型发起相同请求，
+采用先返回者并取消另一方；主请求遇到上游硬错误时立即切换到备用。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+from typing import Any, AsyncGenerator, AsyncIterator, Awaitable, Callable
+
+import aiohttp
+import httpx
+
+from config import (
+    LLM_HEDGE_API_KEY,
+    LLM_HEDGE_BASE_URL,
+    LLM_HEDGE_CALL_THRESHOLD,
+    LLM_HEDGE_MODEL,
+    LLM_HEDGE_PROVIDER,
+    LLM_HEDGE_THRESHOLD,
+    PROVIDERS,
+)
+from utils.openai_compat import OpenAICompatError
+
+
+def _load_policy() -> dict | None:
+    if not (LLM_HEDGE_PROVIDER and LLM_HEDGE_MODEL):
+        return None
+    if LLM_HEDGE_PROVIDER not in PROVIDERS:
+        print(f"WARN: LLM_HEDGE_PROVIDER '{LLM_HEDGE_PROVIDER}' is not in PROVIDERS, hedging disabled")
+        return None
+    return {
+        "provider": LLM_HEDGE_PROVIDER,
+        "model": LLM_HEDGE_MODEL,
+        "api_key": LLM_HEDGE_API_KEY,
+        "api_base": LLM_HEDGE_BASE_URL or None,
+        "threshold": LLM_HEDGE_THRESHOLD,            # 流式：首个 token 的等待上限
+        "call_threshold": LLM_HEDGE_CALL_THRESHOLD,  # 非流式：完整回复的等待上限
+    }
+
+
+# 备用目标（未配置时为 None，即关闭对冲）
+hedge_policy: dict | None = _load_policy()
+
+hedge_stats = {"hedged": 0, "secondary_wins": 0, "failovers": 0}
+
+
+# 无状态码的传输层故障（超时 / 连接失败）
+_TRANSPORT_ERRORS = (asyncio.TimeoutError, aiohttp.ClientConnectionError, httpx.TransportError)
+
+
+def is_hard_error(exc: BaseException) -> bool:
+    """上游不可用类错误（5xx / 408 / 429 / 超时 / 连接失败）才值得切换。
+
+    请求本身的 4xx 错误以及其他异常（如网关代码缺陷）不切换，直接抛出，避免掩盖问题并重复计费。
+    """
+    if isinstance(exc, _TRANSPORT_ERRORS):
+        return True
+    litellm = sys.modules.get("litellm")  # 未导入 LiteLLM 时不可能出现它的异常
+    if litellm is not None and isinstance(exc, (litellm.APIConnectionError, litellm.Timeout)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        return isinstance(exc, OpenAICompatError)  # 流中的 error 事件未带状态码
+    return isinstance(status, int) and (status >= 500 or status in (408, 429))
+
+
+async def _first_chunk(stream: AsyncIterator[str]) -> str | None:
+    try:
+        return await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+
+
+async def _discard(task: asyncio.Task | None, stream: AsyncIterator[str] | None) -> None:
+    """取消落败的一方并关闭其上游流。"""
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except BaseException:
+            pass
+    if stream is not None:
+        try:
+            await stream.aclose()
+        except BaseException:
+            pass
+
+
+async def hedged_stream(
+    primary: Callable[[], AsyncGenerator[str, None]],
+    secondary: Callable[[], AsyncGenerator[str, None]] | None,
+    threshold: float,
+) -> AsyncGenerator[str, None]:
+    """按对冲策略产出文本分块：首个 token 先到的一方胜出。"""
+    if secondary is None:
+        async for chunk in primary():
+            yield chunk
+        return
+
+    streams = {"primary": primary()}
+    tasks = {"primary": asyncio.ensure_future(_first_chunk(streams["primary"]))}
+    errors: dict[str, BaseException] = {}
+    winner, first = None, None
+
+    try:
+        await asyncio.wait([tasks["primary"]], timeout=threshold)
+        while winner is None:
+            for name, task in list(tasks.items()):
+                if not task.done():
+                    continue
+                if task.exception() is None:
+                    winner, first = name, task.result()
+                    break
+                errors[name] = task.exception()
+                del tasks[name]
+                if name == "primary" and not is_hard_error(errors[name]):
+                    raise errors[name]
+            if winner is not None:
+                break
+
+            if "secondary" not in streams:
+                # 超时未出首个 token，或主请求硬错误 → 启动备用请求
+                if "primary" in errors:
+                    hedge_stats["failovers"] += 1
+                else:
+                    hedge_stats["hedged"] += 1
+                streams["secondary"] = secondary()
+                tasks["secondary"] = asyncio.ensure_future(_first_chunk(streams["secondary"]))
+
+            if not tasks:
+                raise errors.get("primary") or errors["secondary"]
+            await asyncio.wait(list(tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+
+        for name in list(tasks):
+            if name != winner:
+                await _discard(tasks.pop(name), streams.pop(name))
+        if winner == "secondary":
+            hedge_stats["secondary_wins"] += 1
+
+        if first is None:
+            return
+        yield first
+        async for chunk in streams[winner]:
+            yield chunk
+    finally:
+        for name, task in tasks.items():
+            if name != winner:
+                await _discard(task, streams.get(name))
+        if winner is not None:
+            await streams[winner].aclose()
+
+
+async def hedged_call(
+    primary: Callable[[], Awaitable[Any]],
+    secondary: Callable[[], Awaitable[Any]] | None,
+    threshold: float,
+) -> Any:
+    """非流式版本：完整回复先返回的一方胜出。"""
+    if secondary is None:
+        return await primary()
+
+    tasks = {"primary": asyncio.ensure_future(primary())}
+    errors: dict[str, BaseException] = {}
+    try:
+        await asyncio.wait([tasks["primary"]], timeout=threshold)
+        while True:
+            for name, task in list(tasks.items()):
+                if not task.done():
+                    continue
+                if task.exception() is None:
+                    if name == "secondary":
+                        hedge_stats["secondary_wins"] += 1
+                    return task.result()
+                errors[name] = task.exception()
+                del tasks[name]
+                if name == "primary" and not is_hard_error(errors[name]):
+                    raise errors[name]
+
+            if "secondary" not in tasks and "secondary" not in errors:
+                if "primary" in errors:
+                    hedge_stats["failovers"] += 1
+                else:
+                    hedge_stats["hedged"] += 1
+                tasks["secondary"] = asyncio.ensure_future(secondary())
+
+            if not tasks:
+                raise errors.get("primary") or errors["secondary"]
+            await asyncio.wait(list(tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks.values():
+            await _discard(task, None)
@@ -0,0 +1,199 @@
+"""Office AI Mate — LLM 调用指标
+
+逐次记录上游调用的排队时间、首 token 时间（TTFT）、token 间隔、总耗时、
+prompt / completion token 数与生成速度，按 provider / 模型 / 调用端点聚合为直方图。
+模型名来自客户端，每个 provider 只为前若干个模型建立单独的序列，其余合并为 "other"。
+"""
+
+from __future__ import annotations
+
+import bisect
+import time
+from contextvars import ContextVar
+from typing import Any
+
+from config import (
+    LLM_METRICS_GAP_BUCKETS, LLM_METRICS_LATENCY_BUCKETS, LLM_METRICS_MAX_MODELS, LLM_METRICS_RATE_BUCKETS,
+)
+
+# 当前请求的 API 路径，由 EndpointLabelMiddleware 设置；脚本调用时为 "-"
+endpoint_label: ContextVar[str] = ContextVar("llm_endpoint", default="-")
+
+# 超出模型数上限后使用的模型标签
+OTHER_MODEL = "other"
+
+
+class EndpointLabelMiddleware:
+    """纯 ASGI 中间件：在请求上下文中设置 endpoint_label（不包装响应，流式输出与断开取消不受影响）。"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = endpoint_label.set(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            endpoint_label.reset(token)
+
+_HISTOGRAMS = {
+    "queue_seconds": LLM_METRICS_LATENCY_BUCKETS,
+    "ttft_seconds": LLM_METRICS_LATENCY_BUCKETS,
+    "inter_token_seconds": LLM_METRICS_GAP_BUCKETS,
+    "duration_seconds": LLM_METRICS_LATENCY_BUCKETS,
+    "tokens_per_second": LLM_METRICS_RATE_BUCKETS,
+}
+
+
+def _round(value: float | None) -> float | None:
+    return round(value, 4) if value is not None else None
+
+
+class Histogram:
+    """固定桶直方图，分位数在桶内线性插值估算。"""
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 最后一个为 +Inf 桶
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float | None:
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+    def snapshot(self) -> dict:
+        cumulative, buckets = 0, {}
+        for bound, n in zip([*map(str, self.buckets), "+Inf"], self.counts):
+            cumulative += n
+            buckets[bound] = cumulative
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 4),
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            **{f"p{round(q * 100)}": _round(self.quantile(q)) for q in (0.5, 0.95, 0.99)},
+            "buckets": buckets,
+        }
+
+
+class CallTimer:
+    """单次上游调用的计时器：创建时开始计时，限流器放行时调用 dispatched()。"""
+
+    def __init__(self, series: dict, stream: bool):
+        self.series = series
+        self.stream = stream
+        self.start = time.perf_counter()
+        self.dispatched_at: float | None = None
+        self.first_token_at: float | None = None
+        self.last_token_at: float | None = None
+        self.chunks = 0
+        self.done = False
+
+    def dispatched(self) -> None:
+        # 429 重试时会再次调用，只记录第一次放行前的排队时间
+        if self.dispatched_at is None:
+            self.dispatched_at = time.perf_counter()
+            self.series["histograms"]["queue_seconds"].observe(self.dispatched_at - self.start)
+
+    def token(self) -> None:
+        now = time.perf_counter()
+        if self.first_token_at is None:
+            self.first_token_at = now
+            self.series["histograms"]["ttft_seconds"].observe(now - self.start)
+        else:
+            self.series["histograms"]["inter_token_seconds"].observe(now - self.last_token_at)
+        self.last_token_at = now
+        self.chunks += 1
+
+    def finish(self, usage: Any = None, error: BaseException | None = None) -> None:
+        """结束计时；error 为 None 表示成功，CancelledError 等计为取消。"""
+        if self.done:
+            return
+        self.done = True
+        end = time.perf_counter()
+        series, histograms = self.series, self.series["histograms"]
+        series["calls"] += 1
+        histograms["duration_seconds"].observe(end - self.start)
+        if error is not None:
+            series["errors" if isinstance(error, Exception) else "cancelled"] += 1
+            return
+
+        prompt = getattr(usage, "prompt_tokens", None)
+        completion = getattr(usage, "completion_tokens", None)
+        if not isinstance(completion, int):
+            # 上游未返回 usage 时，以流式分块数近似生成的 token 数
+            completion = self.chunks if self.stream else None
+        series["prompt_tokens"] += prompt if isinstance(prompt, int) else 0
+        series["completion_tokens"] += completion or 0
+
+        # 流式按首 token 之后的生成阶段计算速度，非流式按发出请求后的总时长计算
+        begin = self.first_token_at if self.stream else self.dispatched_at
+        if completion and begin is not None and end > begin:
+            histograms["tokens_per_second"].observe(completion / (end - begin))
+
+
+class LLMMetrics:
+    """按 (provider, model, endpoint) 聚合的调用指标。"""
+
+    def __init__(self, max_models: int = 32):
+        self.max_models = max_models
+        self._series: dict[tuple[str, str, str], dict] = {}
+        self._models: dict[str, set[str]] = {}  # provider → 已单独统计的模型
+
+    def _model_label(self, provider: str, model: str) -> str:
+        models = self._models.setdefault(provider, set())
+        if model not in models:
+            if len(models) >= self.max_models:
+                return OTHER_MODEL
+            models.add(model)
+        return model
+
+    def start_call(self, provider: str, model: str, stream: bool = False) -> CallTimer:
+        labels = (provider, self._model_label(provider, model), endpoint_label.get())
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = {
+                "calls": 0, "errors": 0, "cancelled": 0,
+                "prompt_tokens": 0, "completion_tokens": 0,
+                "histograms": {name: Histogram(buckets) for name, buckets in _HISTOGRAMS.items()},
+            }
+        return CallTimer(series, stream)
+
+    def clear(self) -> None:
+        self._series.clear()
+        self._models.clear()
+
+    def stats(self, provider: str | None = None, model: str | None = None) -> list[dict]:
+        """返回各标签组合的计数与直方图快照，可按 provider / 模型过滤。"""
+        result = []
+        for (p, m, endpoint), series in self._series.items():
+            if (provider and p != provider) or (model and m != model):
+                continue
+            result.append({
+                "provider": p, "model": m, "endpoint": endpoint,
+                **{k: v for k, v in series.items() if k != "histograms"},
+                **{name: h.snapshot() for name, h in series["histograms"].items()},
+            })
+        return result
+
+
+# 进程级默认实例
+llm_metrics = LLMMetrics(max_models=LLM_METRICS_MAX_MODELS)
@@ -0,0 +1,219 @@
+"""Office AI Mate — 按提供者的限流与自适应并发
+
+每个 provider 一个限流器：
+- 令牌桶：平滑请求速率，超出的请求排队等待而不是直接失败
+- AIMD 并发上限：成功时缓慢加性增长，遇到 429 时乘性减半（同一次过载的一串 429 只减半一次）
+- 429 重试：优先遵循 Retry-After，否则指数退避并加入随机抖动
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+from config import LLM_DECREASE_INTERVAL, LLM_RATE_LIMITS, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_ATTEMPTS
+
+
+def is_rate_limited(exc: BaseException) -> bool:
+    """判断异常是否为上游 429 限流。"""
+    return getattr(exc, "status_code", None) == 429
+
+
+def retry_after_seconds(exc: BaseException) -> float | None:
+    """从异常携带的响应头中解析 Retry-After（秒数或 HTTP 日期）。"""
+    headers = None
+    response = getattr(exc, "response", None)
+    if response is not None:
+        headers = getattr(response, "headers", None)
+    headers = headers or getattr(exc, "litellm_response_headers", None) or {}
+    try:
+        value = headers.get("retry-after") or headers.get("Retry-After")
+    except AttributeError:
+        return None
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """异步令牌桶：rate 为每秒补充的令牌数，burst 为桶容量。"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        # 持锁等待，保证排队请求按 FIFO 顺序取得令牌
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+
+class ProviderLimiter:
+    """单个 provider 的令牌桶 + AIMD 自适应并发上限。"""
+
+    def __init__(self, rate: float, burst: int, max_concurrency: int, min_concurrency: int = 1,
+                 decrease_interval: float = 1.0):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.decrease_interval = decrease_interval
+        self.limit = float(max_concurrency)
+        self._last_decrease = float("-inf")
+        self.inflight = 0
+        self.waiting = 0
+        self.throttled = 0
+        self.retries = 0
+        self.completed = 0
+        self._cond = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        """等待令牌与并发槽位。"""
+        self.waiting += 1
+        try:
+            await self.bucket.acquire()
+            async with self._cond:
+                await self._cond.wait_for(lambda: self.inflight < int(self.limit))
+                self.inflight += 1
+        finally:
+            self.waiting -= 1
+
+    async def release(self, throttled: bool = False) -> None:
+        """归还槽位并按结果调整并发上限（AIMD）。"""
+        async with self._cond:
+            self.inflight -= 1
+            if throttled:
+                self.throttled += 1
+                # 并发中的请求会同时收到同一次过载的 429：间隔内只减半一次
+                now = time.monotonic()
+                if now - self._last_decrease >= self.decrease_interval:
+                    self._last_decrease = now
+                    self.limit = max(self.min_concurrency, self.limit / 2)
+            else:
+                self.completed += 1
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.waiting,
+            "inflight": self.inflight,
+            "concurrency_limit": round(self.limit, 2),
+            "max_concurrency": self.max_concurrency,
+            "rate": self.bucket.rate,
+            "burst": self.bucket.burst,
+            "completed": self.completed,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
+
+
+class RateLimiterRegistry:
+    """按 provider 懒创建限流器，并负责 429 重试。"""
+
+    def __init__(self, limits: dict[str, dict], max_attempts: int = 4, base_delay: float = 1.0,
+                 decrease_interval: float = 1.0):
+        self.limits = limits
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.decrease_interval = decrease_interval
+        self._limiters: dict[str, ProviderLimiter] = {}
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+    def get(self, provider: str) -> ProviderLimiter:
+        # asyncio 原语绑定事件循环；循环变化（如测试）时重建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._limiters.clear()
+            self._loop = loop
+        limiter = self._limiters.get(provider)
+        if limiter is None:
+            cfg = self.limits.get(provider) or self.limits["default"]
+            limiter = ProviderLimiter(cfg["rate"], cfg["burst"], cfg["max_concurrency"],
+                                      decrease_interval=self.decrease_interval)
+            self._limiters[provider] = limiter
+        return limiter
+
+    def backoff(self, exc: BaseException, attempt: int) -> float:
+        """计算第 attempt 次重试前的等待时间。"""
+        delay = retry_after_seconds(exc)
+        if delay is None:
+            delay = self.base_delay * (2 ** attempt)
+        return delay + random.uniform(0, self.base_delay / 2)
+
+    def stats(self) -> dict:
+        return {provider: limiter.stats() for provider, limiter in self._limiters.items()}
+
+
+async def _hold_until_done(stream: Any, limiter: ProviderLimiter):
+    """流式响应在消费完毕（或中断）后才归还并发槽位。"""
+    try:
+        async for chunk in stream:
+            yield chunk
+    finally:
+        try:
+            # 提前中断时立即关闭上游流，释放连接
+            aclose = getattr(stream, "aclose", None)
+            if aclose is not None:
+                await aclose()
+        finally:
+            await limiter.release()
+
+
+async def limited_call(provider: str, call, stream: bool = False) -> Any:
+    """在 provider 限流器下执行 call()，遇到 429 时排队重试。"""
+    limiter = rate_limiters.get(provider)
+    attempt = 0
+    while True:
+        await limiter.acquire()
+        try:
+            response = await call()
+        except Exception as e:
+            if is_rate_limited(e):
+                await limiter.release(throttled=True)
+                if attempt + 1 < rate_limiters.max_attempts:
+                    delay = rate_limiters.backoff(e, attempt)
+                    limiter.retries += 1
+                    attempt += 1
+                    print(f"WARN: {provider} rate limited, retrying in {delay:.2f}s (attempt {attempt})")
+                    await asyncio.sleep(delay)
+                    continue
+            else:
+                await limiter.release()
+            raise
+        except BaseException:
+            await limiter.release()
+            raise
+
+        if stream:
+            return _hold_until_done(response, limiter)
+        await limiter.release()
+        return response
+
+
+# 进程级默认实例
+rate_limiters = RateLimiterRegistry(
+    LLM_RATE_LIMITS, max_attempts=LLM_RETRY_MAX_ATTEMPTS, base_delay=LLM_RETRY_BASE_DELAY,
+    decrease_interval=LLM_DECREASE_INTERVAL,
+)
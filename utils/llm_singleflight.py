@@ -0,0 +1,142 @@
+"""Office AI Mate — 相同 LLM 请求的合并（single-flight）
+
+同一时刻内容完全相同的请求只向上游发送一次：
+- 普通调用：后到的调用方等待首个请求的结果；所有调用方都取消时取消上游请求
+- 流式调用：后到的订阅者先收到已缓冲的分块，再继续接收实时分块
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Any, AsyncGenerator, Awaitable, Callable
+
+
+def make_flight_key(cache_key: str, api_key: str | None) -> str:
+    """在缓存键的基础上加入凭据指纹，避免不同 Key 的请求共享鉴权错误。"""
+    raw = f"{cache_key}:{api_key or ''}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SingleFlight:
+    """合并进行中的相同协程调用。"""
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._waiters: dict[asyncio.Task, int] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """执行 fn()；若相同 key 已在执行中，则等待其结果。"""
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        # shield：某个调用方被取消时不影响其他等待者；最后一个等待者离开时取消上游请求（释放限流槽位）
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if self._waiters[task] == 0:
+                del self._waiters[task]
+                if not task.done():
+                    if self._inflight.get(key) is task:
+                        del self._inflight[key]  # 之后的相同请求重新发起，不再加入已取消的任务
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 标记异常已被读取，避免 "never retrieved" 警告
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+class _Broadcast:
+    """单个上游流的分块缓冲区，供多个订阅者读取。"""
+
+    def __init__(self, source: AsyncGenerator[str, None]):
+        self.chunks: list[str] = []
+        self.done = False
+        self.error: BaseException | None = None
+        self.subscribers = 0
+        self._changed = asyncio.Event()
+        self.task = asyncio.ensure_future(self._pump(source))
+
+    async def _pump(self, source: AsyncGenerator[str, None]) -> None:
+        try:
+            async for chunk in source:
+                self.chunks.append(chunk)
+                self._notify()
+        except BaseException as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+
+    def _notify(self) -> None:
+        event, self._changed = self._changed, asyncio.Event()
+        event.set()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        index = 0
+        while True:
+            if index < len(self.chunks):
+                yield self.chunks[index]
+                index += 1
+            elif self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            else:
+                await self._changed.wait()
+
+
+class StreamFlight:
+    """合并进行中的相同流式调用。"""
+
+    def __init__(self):
+        self._inflight: dict[str, _Broadcast] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def stream(
+        self, key: str, factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> AsyncGenerator[str, None]:
+        """订阅 key 对应的上游流；不存在时用 factory() 创建。"""
+        self.calls += 1
+        broadcast = self._inflight.get(key)
+        if broadcast is None or broadcast.done:
+            broadcast = _Broadcast(factory())
+            self._inflight[key] = broadcast
+        else:
+            self.coalesced += 1
+
+        broadcast.subscribers += 1
+        try:
+            async for chunk in broadcast.subscribe():
+                yield chunk
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.done or broadcast.subscribers == 0:
+                if self._inflight.get(key) is broadcast:
+                    del self._inflight[key]
+                # 所有订阅者都已离开（如客户端断开）时取消上游请求
+                if not broadcast.done:
+                    broadcast.task.cancel()
+
+    def stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+# 进程级默认实例
+inflight_calls = SingleFlight()
+inflight_streams = StreamFlight()
@@ -0,0 +1,142 @@
+"""Office AI Mate — OpenAI 兼容协议轻量客户端
+
+直接用 aiohttp 调用 {api_base}/chat/completions（流式与非流式），
+接受与 litellm.acompletion 相同的关键字参数，返回字段结构一致的响应对象，
+因此网关可以按请求在两者之间切换。不导入 LiteLLM，也不涉及其模型价格表。
+"""
+
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import aiohttp
+
+from config import LLM_NATIVE_CLIENT, LLM_NATIVE_CONNECT_TIMEOUT, LLM_NATIVE_READ_TIMEOUT
+
+# 走 OpenAI 兼容协议的 LiteLLM 模型前缀（发送前去掉）
+ROUTE_PREFIXES = ("openai/", "openrouter/")
+
+# 仅供 LiteLLM / 网关使用、不应发给上游的参数
+_LOCAL_PARAMS = {"api_key", "api_base", "shared_session", "model", "messages", "stream"}
+
+
+class OpenAICompatError(Exception):
+    """上游返回非 2xx 或在流中返回 error 事件；status_code / response 与 LiteLLM 异常同名，
+    限流重试与对冲逻辑可按相同方式判断。"""
+
+    def __init__(self, message: str, status_code: int | None = None, response: Any = None):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+        self.response = response
+
+
+class _Obj(SimpleNamespace):
+    """JSON 对象的属性视图；缺失字段返回 None（与 LiteLLM 响应对象的行为一致）。"""
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return None
+
+
+def _to_obj(value: Any) -> Any:
+    if isinstance(value, dict):
+        return _Obj(**{k: _to_obj(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return [_to_obj(v) for v in value]
+    return value
+
+
+def handles(kwargs: dict) -> bool:
+    """该请求是否由本客户端处理：启用且为带 api_base 的 OpenAI 兼容路由。"""
+    return LLM_NATIVE_CLIENT and bool(kwargs.get("api_base")) and kwargs["model"].startswith(ROUTE_PREFIXES)
+
+
+def _payload(kwargs: dict) -> dict:
+    model = kwargs["model"]
+    for prefix in ROUTE_PREFIXES:
+        if model.startswith(prefix):
+            model = model[len(prefix):]
+            break
+    payload = {"model": model, "messages": kwargs["messages"]}
+    if kwargs.get("stream"):
+        payload["stream"] = True
+    payload.update((k, v) for k, v in kwargs.items() if k not in _LOCAL_PARAMS and v is not None)
+    return payload
+
+
+async def _raise_for_status(response: aiohttp.ClientResponse) -> None:
+    if response.status < 400:
+        return
+    text = await response.text()
+    message = text
+    try:
+        error = json.loads(text).get("error")
+        message = error.get("message", text) if isinstance(error, dict) else (error or text)
+    except (ValueError, AttributeError):
+        pass
+    raise OpenAICompatError(f"{response.status}: {message}", status_code=response.status, response=response)
+
+
+async def _iter_events(response: aiohttp.ClientResponse, session: aiohttp.ClientSession | None):
+    """解析 SSE 数据行，逐个产出 chunk；结束或提前关闭时释放连接（临时会话一并关闭）。"""
+    try:
+        async for raw in response.content:
+            line = raw.strip()
+            if not line.startswith(b"data:"):
+                continue  # 空行、注释心跳与 event: 行
+            data = line[5:].strip()
+            if data == b"[DONE]":
+                break
+            chunk = json.loads(data)
+            if "error" in chunk:
+                error = chunk["error"]
+                message = error.get("message", str(error)) if isinstance(error, dict) else str(error)
+                code = error.get("code") if isinstance(error, dict) else None
+                raise OpenAICompatError(message, status_code=code if isinstance(code, int) else None)
+            yield _to_obj(chunk)
+    finally:
+        response.release()
+        if session is not None:
+            await session.close()
+
+
+async def acompletion(**kwargs) -> Any:
+    """与 litellm.acompletion 相同的调用方式；stream=True 时返回异步迭代器。"""
+    session = kwargs.get("shared_session")
+    owned = None
+    if session is None:
+        # 连接池未启动（脚本 / 测试）时使用一次性会话
+        session = owned = aiohttp.ClientSession()
+
+    headers = {"Content-Type": "application/json"}
+    if kwargs.get("api_key"):
+        headers["Authorization"] = f"Bearer {kwargs['api_key']}"
+    timeout = aiohttp.ClientTimeout(
+        total=None, sock_connect=LLM_NATIVE_CONNECT_TIMEOUT, sock_read=LLM_NATIVE_READ_TIMEOUT
+    )
+    url = kwargs["api_base"].rstrip("/") + "/chat/completions"
+
+    try:
+        response = await session.post(url, json=_payload(kwargs), headers=headers, timeout=timeout)
+        try:
+            await _raise_for_status(response)
+        except BaseException:
+            response.release()
+            raise
+    except BaseException:
+        if owned is not None:
+            await owned.close()
+        raise
+
+    if kwargs.get("stream"):
+        return _iter_events(response, owned)
+    try:
+        return _to_obj(await response.json(content_type=None))
+    finally:
+        response.release()
+        if owned is not None:
+            await owned.close()
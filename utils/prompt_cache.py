@@ -0,0 +1,134 @@
+"""Office AI Mate — 提示词前缀缓存
+
+人格克隆提示词、嵌入整篇文档的对话提示词、跑团 DM 设定等长 system 提示词每轮都会重复发送。
+对支持显式缓存标记的 provider，在稳定前缀末尾添加 cache_control 断点，
+并按 provider / 模型统计上游报告的缓存读取 / 写入 token 数。
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+from config import PROMPT_CACHE_ENABLED, PROMPT_CACHE_MIN_CHARS, PROMPT_CACHE_OPENROUTER_MODELS
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def supports_cache_hints(provider: str, model: str) -> bool:
+    """provider 是否接受消息级 cache_control 标记。"""
+    if provider == "Anthropic":
+        return True
+    if provider == "OpenRouter":
+        return model.startswith(PROMPT_CACHE_OPENROUTER_MODELS)
+    return False
+
+
+def _text_length(content: Any) -> int:
+    if isinstance(content, str):
+        return len(content)
+    if isinstance(content, list):
+        return sum(len(part.get("text", "")) for part in content if isinstance(part, dict))
+    return 0
+
+
+def _with_breakpoint(message: dict[str, Any]) -> dict[str, Any]:
+    content = message.get("content")
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    elif isinstance(content, list) and content and isinstance(content[-1], dict):
+        blocks = [*content[:-1], {**content[-1], "cache_control": CACHE_CONTROL}]
+    else:
+        return message
+    return {**message, "content": blocks}
+
+
+def mark_stable_prefix(
+    provider: str,
+    model: str,
+    messages: list[dict[str, Any]],
+    min_chars: int = PROMPT_CACHE_MIN_CHARS,
+) -> list[dict[str, Any]]:
+    """为开头连续的 system 消息添加缓存断点，返回新列表（不修改原消息）。
+
+    断点放在第一条 system 消息（人格 / 文档，最稳定）与最后一条 system 消息
+    （可能是滚动摘要）上，摘要变化时仍能读取前面的缓存。
+    """
+    if not PROMPT_CACHE_ENABLED or not supports_cache_hints(provider, model):
+        return messages
+    head = 0
+    while head < len(messages) and messages[head].get("role") == "system":
+        head += 1
+    if head == 0 or sum(_text_length(m.get("content")) for m in messages[:head]) < min_chars:
+        return messages
+
+    marked = list(messages)
+    for i in {0, head - 1}:
+        marked[i] = _with_breakpoint(marked[i])
+    return marked
+
+
+def has_cache_hints(messages: list[dict[str, Any]]) -> bool:
+    """消息中是否带有 cache_control 断点。"""
+    for message in messages:
+        content = message.get("content")
+        if isinstance(content, list) and any(
+            isinstance(part, dict) and "cache_control" in part for part in content
+        ):
+            return True
+    return False
+
+
+def cache_token_usage(usage: Any) -> tuple[int, int, int]:
+    """从上游 usage 中取出 (prompt_tokens, 缓存读取, 缓存写入)。
+
+    兼容 Anthropic 的 cache_read/creation_input_tokens 与
+    OpenAI 兼容接口的 prompt_tokens_details.cached_tokens / cache_write_tokens。
+    """
+    def tokens(obj: Any, name: str) -> int:
+        value = getattr(obj, name, None)
+        return value if isinstance(value, int) else 0
+
+    details = getattr(usage, "prompt_tokens_details", None)
+    prompt = tokens(usage, "prompt_tokens")
+    read = tokens(usage, "cache_read_input_tokens") or tokens(details, "cached_tokens")
+    write = tokens(usage, "cache_creation_input_tokens") or tokens(details, "cache_write_tokens")
+    return prompt, read, write
+
+
+class PromptCacheStats:
+    """按 provider / 模型累计提示词缓存的读写 token。"""
+
+    def __init__(self):
+        self._models: dict[str, dict] = {}
+
+    def record(self, provider: str, kwargs: dict, usage: Any) -> None:
+        if usage is None:
+            return
+        prompt, read, write = cache_token_usage(usage)
+        entry = self._models.setdefault(f"{provider}/{kwargs.get('model')}", {
+            "requests": 0, "hinted_requests": 0,
+            "prompt_tokens": 0, "cache_read_tokens": 0, "cache_write_tokens": 0,
+        })
+        entry["requests"] += 1
+        entry["hinted_requests"] += has_cache_hints(kwargs.get("messages") or [])
+        entry["prompt_tokens"] += prompt
+        entry["cache_read_tokens"] += read
+        entry["cache_write_tokens"] += write
+
+    def clear(self) -> None:
+        self._models.clear()
+
+    def stats(self) -> dict:
+        """返回各模型的累计值及缓存读取占 prompt token 的比例。"""
+        return {
+            name: {
+                **entry,
+                "cache_read_ratio": round(entry["cache_read_tokens"] / entry["prompt_tokens"], 4)
+                if entry["prompt_tokens"] else 0.0,
+            }
+            for name, entry in self._models.items()
+        }
+
+
+# 进程级默认实例
+prompt_cache_stats = PromptCacheStats()
@@ -0,0 +1,228 @@
+"""Office AI Mate — 搜索结果缓存
+
+按查询词缓存 /api/search 的结果，供翻页直接读取：
+- 有界：最大条目数 + 字节预算，超出时按 LRU 淘汰
+- 过期：TTL 固定，按写入顺序维护过期队列，只检查队首，无需全量扫描
+- 写时复制：结果列表以元组保存，追加时生成新元组，正在翻页的读者不受影响
+- 追加时在锁内按 URL 与当前条目去重（预取与前台请求可能基于不同快照各自追加同一批结果）
+- 条目被淘汰或过期时通知 on_evict 回调（用于取消该查询的后台预取）；回调在释放锁之后执行
+- 近似命中（可选，默认关闭）：lookup 在精确未命中时，找出仅差停用词、标点或单复数的已缓存查询；
+  命中统计区分精确命中与近似命中
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable
+
+from utils.search_dedupe import normalize_url
+from utils.search_query import QueryIndex
+from config import SEARCH_CACHE_FUZZY, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_TTL
+
+# 每条结果除字符串内容外的估算开销（字典与键）
+_ITEM_OVERHEAD = 64
+
+
+def estimate_size(results: tuple[dict, ...]) -> int:
+    """估算结果列表占用的字节数（字符串按 UTF-8 长度计）。"""
+    size = 0
+    for r in results:
+        size += _ITEM_OVERHEAD
+        for value in r.values():
+            if isinstance(value, str):
+                size += len(value.encode("utf-8"))
+    return size
+
+
+class _Entry:
+    __slots__ = ("results", "expires_at", "size")
+
+    def __init__(self, results: tuple[dict, ...], expires_at: float, size: int):
+        self.results = results
+        self.expires_at = expires_at
+        self.size = size
+
+
+class SearchCache:
+    """有界 LRU + TTL 的搜索结果缓存（线程安全）。"""
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024, ttl: float = 600,
+                 fuzzy: bool = False):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()  # LRU 顺序
+        self._expiry: OrderedDict[str, float] = OrderedDict()    # 写入顺序 = 过期顺序（TTL 固定）
+        self._lock = threading.Lock()
+        self._index = QueryIndex() if fuzzy else None
+        self.bytes = 0
+        self.hits = 0
+        self.fuzzy_hits = 0  # hits 中由近似查询命中的次数
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.on_evict: list[Callable[[str], None]] = []
+        self._evicted: list[str] = []  # 持锁期间被淘汰 / 过期的键，释放锁后通知
+
+    @contextmanager
+    def _locked(self):
+        # 持锁执行操作，释放锁后再通知 on_evict：回调不会在锁内运行，也可以再访问缓存
+        with self._lock:
+            try:
+                yield
+            finally:
+                evicted, self._evicted = self._evicted, []
+        for key in evicted:
+            for callback in self.on_evict:
+                callback(key)
+
+    def get(self, key: str) -> tuple[dict, ...] | None:
+        """返回缓存的结果元组；不存在或已过期返回 None。"""
+        with self._locked():
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.results
+
+    def lookup(self, key: str) -> tuple[str, tuple[dict, ...] | None]:
+        """与 get 相同，但精确未命中时尝试近似查询；返回 (命中条目的键, 结果)，未命中时键为 key 本身。"""
+        with self._locked():
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is None and self._index is not None:
+                similar = self._index.find(key)
+                if similar is not None:
+                    key, entry = similar, self._entries[similar]
+                    self.fuzzy_hits += 1
+            if entry is None:
+                self.misses += 1
+                return key, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return key, entry.results
+
+    def peek(self, key: str) -> tuple[dict, ...] | None:
+        """与 get 相同，但不计入命中统计、不更新 LRU 顺序（供后台任务检查条目是否仍在）。"""
+        with self._locked():
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            return entry.results if entry is not None else None
+
+    def set(self, key: str, results: list[dict] | tuple[dict, ...]) -> None:
+        """写入（或替换）一个查询的结果，重新计算过期时间。"""
+        results = tuple(results)
+        now = time.time()
+        with self._locked():
+            self._discard(key)
+            entry = _Entry(results, now + self.ttl, estimate_size(results))
+            if self._index is not None:
+                self._index.add(key)
+            self._entries[key] = entry
+            self._expiry[key] = entry.expires_at
+            self.bytes += entry.size
+            self._expire(now)
+            self._evict(keep=key)
+
+    def extend(self, key: str, items: list[dict]) -> tuple[dict, ...] | None:
+        """在已有结果后追加条目（写时复制，不改变过期时间，跳过 URL 已在条目中的结果）；条目不存在时返回 None。"""
+        if not items:
+            return self.get(key)
+        with self._locked():
+            self._expire(time.time())
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            # Dedupe against the entry as it is now, not the snapshot the caller searched from
+            seen = {normalize_url(r["href"]) for r in entry.results}
+            added = []
+            for r in items:
+                url = normalize_url(r["href"])
+                if url not in seen:
+                    seen.add(url)
+                    added.append(r)
+            if not added:
+                return entry.results
+            added = tuple(added)
+            size = estimate_size(added)
+            self._entries[key] = _Entry(entry.results + added, entry.expires_at, entry.size + size)
+            self._entries.move_to_end(key)
+            self.bytes += size
+            self._evict(keep=key)
+            return self._entries[key].results if key in self._entries else None
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._expiry.pop(key, None)
+            self.bytes -= entry.size
+            if self._index is not None:
+                self._index.remove(key)
+
+    def _expire(self, now: float) -> None:
+        # 过期队列按过期时间递增，只需从队首弹出（均摊 O(1)）
+        while self._expiry:
+            key, expires_at = next(iter(self._expiry.items()))
+            if expires_at > now:
+                break
+            self._discard(key)
+            self.expirations += 1
+            self._evicted.append(key)
+
+    def _evict(self, keep: str) -> None:
+        # 超出条目数或字节预算时淘汰最久未使用的条目；刚写入的条目单独超出预算时也会被淘汰
+        while self._entries and (len(self._entries) > self.max_entries or self.bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            if key == keep and len(self._entries) > 1:
+                self._entries.move_to_end(key)
+                continue
+            self._discard(key)
+            self.evictions += 1
+            self._evicted.append(key)
+
+    def clear(self) -> None:
+        """清空缓存与计数器。"""
+        with self._locked():
+            for key in self._entries:
+                self._evicted.append(key)
+            self._entries.clear()
+            self._expiry.clear()
+            if self._index is not None:
+                self._index.clear()
+            self.bytes = self.hits = self.fuzzy_hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict:
+        """返回命中率（含精确 / 近似命中的细分）、淘汰 / 过期次数及内存占用。"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "exact_hits": self.hits - self.fuzzy_hits,
+                "fuzzy_hits": self.fuzzy_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "fuzzy_hit_rate": round(self.fuzzy_hits / total, 4) if total else 0.0,
+                "fuzzy": self._index is not None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+# 进程级默认实例
+search_cache = SearchCache(
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=SEARCH_CACHE_MAX_BYTES,
+    ttl=SEARCH_CACHE_TTL,
+    fuzzy=SEARCH_CACHE_FUZZY,
+)
@@ -0,0 +1,369 @@
+"""Office AI Mate — 深度搜索
+
+抓取搜索结果前 K 个网页的正文，交给模型写出带引用的综合回答：
+- 并发抓取：全局并发上限 + 按域名限流（同一域名的并发数与请求间隔），截止时间到期仍未完成的页面被放弃
+- 正文提取：用 lxml 删除导航、页眉页脚、侧栏等模板元素，按段落文本量与链接密度选出正文容器
+- token 预算：在各来源间按水位法分配，短页面用不完的额度留给其他页面，超出部分在句子边界截断
+- 抓取与提取分别计时
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Any
+from urllib.parse import urlsplit
+
+try:
+    from lxml import etree, html as lxml_html
+except ImportError:  # pragma: no cover - lxml 是 python-pptx / pdf2docx 的依赖，通常已安装
+    etree = lxml_html = None
+
+from utils.chat_context import count_tokens
+from utils.search_http import search_sessions
+from utils.web_search import BASE_HEADERS, USER_AGENTS_POOL
+from config import (
+    SEARCH_DEEP_CONCURRENCY, SEARCH_DEEP_DEADLINE, SEARCH_DEEP_DOMAIN_INTERVAL, SEARCH_DEEP_MAX_PAGE_BYTES,
+    SEARCH_DEEP_PER_DOMAIN,
+)
+
+_ANSWER_PROMPT = (
+    "你是联网搜索助手。请只根据下面编号的网页内容回答用户的问题：综合多个来源的信息，"
+    "在用到某个来源的句子后用 [编号] 标注出处（如 [1]、[2][3]）；资料不足或来源之间有矛盾时如实说明，不要编造。\n\n"
+    "【问题】\n{query}\n\n【网页内容】\n{sources}"
+)
+
+# 直接删除的模板元素；class / id 命中 _BOILERPLATE_HINT 的元素同样删除
+_BOILERPLATE_TAGS = (
+    "script", "style", "noscript", "template", "svg", "iframe", "form", "button", "select",
+    "nav", "header", "footer", "aside",
+)
+_BOILERPLATE_HINT = re.compile(
+    r"\b(nav|navbar|menu|footer|sidebar|side-bar|breadcrumb|comments?|share|related|recommend|copyright|"
+    r"advert|ads?|banner|popup|login|toolbar)\b|[-_](nav|menu|footer|sidebar|comments?|share|ads?)\b",
+    re.I,
+)
+_KEEP_TAGS = {"html", "body", "article", "main"}
+_BLOCK_TAGS = ("p", "h1", "h2", "h3", "h4", "li", "pre", "blockquote", "td")
+_HEADINGS = {"h1", "h2", "h3", "h4"}
+# 短于该长度（字符）的段落不计入正文得分；链接文字占比超过该值的段落视为导航
+_MIN_BLOCK_CHARS = 20
+_MAX_LINK_DENSITY = 0.5
+# 段落拼出的正文过短时（如全部用 <div><br> 排版的页面）改用容器的全部文本
+_MIN_ARTICLE_CHARS = 200
+_SENTENCE_END = re.compile(r"[。！？!?.；;\n]")
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+def _link_density(element, text_len: int) -> float:
+    if not text_len:
+        return 1.0
+    return sum(len(_squash(a.text_content())) for a in element.iter("a")) / text_len
+
+
+def extract_main_text(html: str) -> str:
+    """提取网页正文：删除模板元素后，选出段落文本量最大、链接最少的容器，按段落拼接。"""
+    if lxml_html is None or not html.strip():
+        return ""
+    try:
+        try:
+            doc = lxml_html.fromstring(html)
+        except ValueError:
+            # 带 <?xml encoding=...?> 声明的 XHTML 不能以 str 解析
+            doc = lxml_html.fromstring(html.encode("utf-8"))
+    except (ValueError, etree.ParserError):
+        return ""
+
+    doomed = doc.xpath("|".join(f"//{tag}" for tag in _BOILERPLATE_TAGS))
+    for element in doc.xpath("//*[@class or @id]"):
+        if element.tag not in _KEEP_TAGS and _BOILERPLATE_HINT.search(f"{element.get('class', '')} {element.get('id', '')}"):
+            doomed.append(element)
+    for element in doomed:
+        if element.getparent() is not None:
+            element.drop_tree()
+
+    # 每个段落按有效文本量给父容器加分、给祖父容器加一半分，得分最高的即正文容器
+    scores: dict[Any, float] = {}
+    for block in doc.iter("p", "pre", "td", "blockquote"):
+        text_len = len(_squash(block.text_content()))
+        if text_len < _MIN_BLOCK_CHARS:
+            continue
+        score = text_len * (1 - _link_density(block, text_len))
+        parent = block.getparent()
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0) + score
+            grandparent = parent.getparent()
+            if grandparent is not None:
+                scores[grandparent] = scores.get(grandparent, 0) + score / 2
+    body = doc.find("body")
+    container = max(scores, key=scores.get) if scores else (body if body is not None else doc)
+
+    paragraphs = []
+    for block in container.iter(*_BLOCK_TAGS):
+        if any(child.tag in _BLOCK_TAGS for child in block.iterdescendants()):
+            continue  # 只取最内层的段落，避免 <li><p> 重复
+        text = _squash(block.text_content())
+        if not text:
+            continue
+        if block.tag not in _HEADINGS and (
+            len(text) < _MIN_BLOCK_CHARS and not _SENTENCE_END.search(text[-1])
+            or _link_density(block, len(text)) > _MAX_LINK_DENSITY
+        ):
+            continue
+        paragraphs.append(text)
+    article = "\n".join(paragraphs)
+    if len(article) < _MIN_ARTICLE_CHARS:
+        lines = (_squash(line) for line in container.text_content().splitlines())
+        fallback = "\n".join(line for line in lines if line)
+        if len(fallback) > len(article):
+            article = fallback
+    return article
+
+
+def allocate_budget(token_counts: list[int], budget: int) -> list[int]:
+    """按水位法在各来源间分配 token：需求低于平均份额的来源全部保留，剩余额度平分给其他来源。"""
+    allowance = [0] * len(token_counts)
+    remaining = sorted(range(len(token_counts)), key=lambda i: token_counts[i])
+    left = budget
+    while remaining:
+        share = left // len(remaining)
+        smallest = remaining[0]
+        if token_counts[smallest] > share:
+            for i in remaining:
+                allowance[i] = share
+            break
+        allowance[smallest] = token_counts[smallest]
+        left -= token_counts[smallest]
+        remaining.pop(0)
+    return allowance
+
+
+def trim_text(text: str, tokens: int, allowance: int) -> str:
+    """把 text（共 tokens 个 token）按比例截断到约 allowance 个 token，尽量停在句子边界。"""
+    if tokens <= allowance:
+        return text
+    if allowance <= 0:
+        return ""
+    cut = len(text) * allowance // tokens
+    boundary = max((m.end() for m in _SENTENCE_END.finditer(text, 0, cut)), default=0)
+    if boundary >= cut * 0.7:
+        cut = boundary
+    return text[:cut].rstrip() + "…"
+
+
+def deep_answer_messages(model: str, query: str, sources: list[dict], budget: int) -> tuple[list[dict], list[int]]:
+    """把各来源正文裁剪到 token 预算内并拼成回答提示词，返回 (messages, 各来源使用的 token 数)。"""
+    counts = count_tokens(model, [{"role": "user", "content": s["text"]} for s in sources])
+    allowance = allocate_budget(counts, budget)
+    blocks = [
+        f"[{i}] {s['title']}\n{s['href']}\n{trim_text(s['text'], n, a)}"
+        for i, (s, n, a) in enumerate(zip(sources, counts, allowance), 1)
+    ]
+    prompt = _ANSWER_PROMPT.format(query=query, sources="\n\n".join(blocks))
+    return [{"role": "user", "content": prompt}], allowance
+
+
+def format_references(sources: list[dict]) -> str:
+    """回答末尾附加的参考来源列表（与提示词中的编号一致）。"""
+    return "\n\n参考来源：\n" + "\n".join(f"[{i}] {s['title']} {s['href']}" for i, s in enumerate(sources, 1))
+
+
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+
+def decode_page(body: bytes, charset: str | None = None) -> str:
+    """按响应头、<meta charset>、UTF-8、GB18030 的顺序解码网页。"""
+    if not charset:
+        match = _META_CHARSET.search(body[:4096])
+        charset = match.group(1).decode("ascii") if match else None
+    for encoding in (charset, "utf-8"):
+        if encoding:
+            try:
+                return body.decode(encoding)
+            except (LookupError, UnicodeDecodeError):
+                pass
+    return body.decode("gb18030", errors="replace")
+
+
+class PageFetchError(Exception):
+    """网页抓取失败（非 HTML、HTTP 错误或缺少 httpx）。"""
+
+
+class _Domain:
+    __slots__ = ("semaphore", "last_request", "users")
+
+    def __init__(self, per_domain: int):
+        self.semaphore = asyncio.Semaphore(per_domain)
+        self.last_request = 0.0
+        self.users = 0
+
+
+class PageFetcher:
+    """抓取结果网页：全局并发上限 + 按域名的并发数与请求间隔（进程内所有深度搜索共享）。"""
+
+    def __init__(self, concurrency: int = 8, per_domain: int = 1, domain_interval: float = 0.5,
+                 max_bytes: int = 2 * 1024 * 1024):
+        self.concurrency = concurrency
+        self.per_domain = per_domain
+        self.domain_interval = domain_interval
+        self.max_bytes = max_bytes
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._domains: dict[str, _Domain] = {}
+        self.fetched = self.failed = self.abandoned = 0
+
+    def _bind(self) -> None:
+        # 信号量绑定所属事件循环；在新的循环（测试 / 脚本）中使用时重新创建
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._domains = {}
+
+    @asynccontextmanager
+    async def _slot(self, host: str):
+        domain = self._domains.get(host)
+        if domain is None:
+            domain = self._domains[host] = _Domain(self.per_domain)
+        domain.users += 1
+        try:
+            # 先在域名内排队并等待间隔，再占用全局名额，等待中的请求不占全局并发
+            async with domain.semaphore:
+                wait = domain.last_request + self.domain_interval - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                async with self._semaphore:
+                    domain.last_request = time.monotonic()
+                    yield
+        finally:
+            domain.users -= 1
+            self._prune()
+
+    def _prune(self) -> None:
+        # 空闲且已过请求间隔的域名不再需要记录
+        now = time.monotonic()
+        for host in [h for h, d in self._domains.items() if not d.users and now - d.last_request >= self.domain_interval]:
+            del self._domains[host]
+
+    async def fetch(self, deps: dict, url: str, timeout: float) -> str:
+        """抓取一个网页并解码为文本（最多读取 max_bytes 字节）。"""
+        if not deps.get("httpx"):
+            raise PageFetchError("httpx is not installed")
+        self._bind()
+        # httpx 未安装 brotli 时无法解码 br 压缩
+        headers = {**BASE_HEADERS, "Accept-Encoding": "gzip, deflate", "User-Agent": random.choice(USER_AGENTS_POOL)}
+        async with self._slot(urlsplit(url).netloc.lower()):
+            try:
+                client = search_sessions.httpx()
+                if client is not None:
+                    page = await self._read(client, url, headers, timeout)
+                else:
+                    async with deps["httpx"].AsyncClient(verify=False) as client:
+                        page = await self._read(client, url, headers, timeout)
+            except Exception:
+                self.failed += 1
+                raise
+        self.fetched += 1
+        return page
+
+    async def _read(self, client, url: str, headers: dict, timeout: float) -> str:
+        async with client.stream("GET", url, headers=headers, timeout=timeout, follow_redirects=True) as resp:
+            if resp.status_code >= 400:
+                raise PageFetchError(f"HTTP {resp.status_code}")
+            content_type = resp.headers.get("content-type", "")
+            if content_type and "html" not in content_type:
+                raise PageFetchError(f"Not an HTML page ({content_type.split(';')[0]})")
+            body = bytearray()
+            async for chunk in resp.aiter_bytes():
+                body += chunk
+                if len(body) >= self.max_bytes:
+                    break  # 超长页面只取开头部分
+        return decode_page(bytes(body), resp.charset_encoding)
+
+    def stats(self) -> dict:
+        """返回抓取计数与当前正在限流的域名数。"""
+        return {
+            "fetched": self.fetched,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "domains": len(self._domains),
+            "concurrency": self.concurrency,
+            "per_domain": self.per_domain,
+            "domain_interval": self.domain_interval,
+        }
+
+
+async def fetch_sources(
+    deps: dict,
+    results: list[dict],
+    top_k: int,
+    deadline: float = SEARCH_DEEP_DEADLINE,
+    fetcher: PageFetcher | None = None,
+) -> tuple[list[dict], dict]:
+    """并发抓取前 top_k 个结果并提取正文，返回 (有正文的来源, 诊断信息)。
+
+    每个页面的抓取与提取分别计时；截止时间到期仍未完成的页面被取消，记入 failed。
+    """
+    fetcher = fetcher or page_fetcher
+    candidates = [r for r in results if r.get("href", "").startswith("http")][:top_k]
+    loop = asyncio.get_running_loop()
+    timings = [{"fetch_ms": 0.0, "extract_ms": 0.0} for _ in candidates]
+
+    async def load(index: int, result: dict) -> str:
+        start = time.perf_counter()
+        try:
+            page = await fetcher.fetch(deps, result["href"], timeout=deadline)
+        finally:
+            timings[index]["fetch_ms"] = round((time.perf_counter() - start) * 1e3, 1)
+        start = time.perf_counter()
+        # lxml 解析是 CPU 密集的同步操作，放到线程池，不阻塞事件循环
+        text = await loop.run_in_executor(None, extract_main_text, page)
+        timings[index]["extract_ms"] = round((time.perf_counter() - start) * 1e3, 1)
+        return text
+
+    started = time.perf_counter()
+    tasks = [asyncio.ensure_future(load(i, r)) for i, r in enumerate(candidates)]
+    pending: set = set()
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=deadline)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        fetcher.abandoned += len(pending)
+    wall_ms = round((time.perf_counter() - started) * 1e3, 1)
+
+    sources, failed = [], []
+    for result, task, timing in zip(candidates, tasks, timings):
+        if task in pending:
+            error = f"Deadline: not finished after {deadline}s"
+        elif task.exception() is not None:
+            error = str(task.exception()) or type(task.exception()).__name__
+        elif not task.result():
+            error = "No main text found"
+        else:
+            sources.append({"title": result.get("title", ""), "href": result["href"], "text": task.result(), **timing})
+            continue
+        failed.append({"href": result["href"], "error": error, **timing})
+
+    return sources, {
+        "wall_ms": wall_ms,
+        "fetch_ms": round(sum(t["fetch_ms"] for t in timings), 1),
+        "extract_ms": round(sum(t["extract_ms"] for t in timings), 1),
+        "fetched": len(sources),
+        "failed": failed,
+    }
+
+
+# 进程级默认实例
+page_fetcher = PageFetcher(
+    concurrency=SEARCH_DEEP_CONCURRENCY,
+    per_domain=SEARCH_DEEP_PER_DOMAIN,
+    domain_interval=SEARCH_DEEP_DOMAIN_INTERVAL,
+    max_bytes=SEARCH_DEEP_MAX_PAGE_BYTES,
+)
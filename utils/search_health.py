@@ -0,0 +1,198 @@
+"""Office AI Mate — 搜索引擎健康度与熔断
+
+按引擎记录最近若干次查询的结果（成功 / 出错 / 被拦截 / 超时）与耗时：
+- 健康分 = 窗口内成功率 × 延迟系数；fan_out_search 按健康分从高到低启动各引擎
+- 熔断：连续失败达到阈值，或窗口内失败率过高时断开，冷却期内直接跳过该引擎，不再等待它超时
+- 冷却期结束后进入半开状态，只放行一次探测请求：成功则恢复，失败则重新断开并加倍冷却时间
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from collections import deque
+
+from config import (
+    SEARCH_BREAKER_COOLDOWN, SEARCH_BREAKER_FAILURE_RATE, SEARCH_BREAKER_FAILURES, SEARCH_BREAKER_LATENCY_REF,
+    SEARCH_BREAKER_MAX_COOLDOWN, SEARCH_BREAKER_MIN_CALLS, SEARCH_BREAKER_WINDOW, SEARCH_BREAKER_WINDOW_SECONDS,
+)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+# 查询结果类别；cancelled（凑够结果后被提前取消）不计入健康度
+OUTCOMES = ("ok", "error", "blocked", "timeout")
+
+
+class EngineHealth:
+    """单个引擎的滑动窗口统计与熔断状态。"""
+
+    def __init__(self, window: int, window_seconds: float):
+        self.window_seconds = window_seconds
+        self.calls: deque[tuple[float, str, float]] = deque(maxlen=window)  # (时间, 结果, 耗时)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.cooldown = 0.0
+        self.probing = False
+        self.times_opened = 0
+        self.skipped = 0
+
+    def recent(self, now: float) -> list[tuple[float, str, float]]:
+        while self.calls and now - self.calls[0][0] > self.window_seconds:
+            self.calls.popleft()
+        return list(self.calls)
+
+    def success_rate(self, now: float) -> float:
+        calls = self.recent(now)
+        return sum(outcome == "ok" for _, outcome, _ in calls) / len(calls) if calls else 1.0
+
+    def median_latency(self, now: float) -> float | None:
+        latencies = [latency for _, outcome, latency in self.recent(now) if outcome == "ok"]
+        return statistics.median(latencies) if latencies else None
+
+
+class EngineHealthRegistry:
+    """所有引擎的健康度与熔断器（线程安全）。"""
+
+    def __init__(self, window: int = 20, window_seconds: float = 300, failures: int = 3,
+                 failure_rate: float = 0.5, min_calls: int = 6, cooldown: float = 30,
+                 max_cooldown: float = 300, latency_ref: float = 2.0):
+        self.window = window
+        self.window_seconds = window_seconds
+        self.failures = failures
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.latency_ref = latency_ref
+        self._engines: dict[str, EngineHealth] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str) -> EngineHealth:
+        health = self._engines.get(name)
+        if health is None:
+            health = self._engines[name] = EngineHealth(self.window, self.window_seconds)
+        return health
+
+    def _score(self, health: EngineHealth, now: float) -> float:
+        if health.state == OPEN:
+            return 0.0
+        latency = health.median_latency(now)
+        factor = 1.0 if latency is None else self.latency_ref / (self.latency_ref + latency)
+        return health.success_rate(now) * factor
+
+    def order(self, names: list[str]) -> list[str]:
+        """按健康分从高到低排序（同分保持原顺序）。"""
+        now = time.monotonic()
+        with self._lock:
+            scores = {name: self._score(self._get(name), now) for name in names}
+        return sorted(names, key=lambda name: -scores[name])
+
+    def allow(self, name: str, force: bool = False) -> bool:
+        """该引擎本次是否可以查询；冷却期结束后（force=True 时立即）放行一次半开探测。"""
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(name)
+            if health.state == OPEN and (force or now - health.opened_at >= health.cooldown):
+                health.state = HALF_OPEN
+            if health.state == CLOSED or (health.state == HALF_OPEN and not health.probing):
+                health.probing = health.state == HALF_OPEN
+                return True
+            health.skipped += 1
+            return False
+
+    def retry_in(self, name: str) -> float:
+        """断开的引擎距离下一次探测的秒数（未断开时为 0）。"""
+        with self._lock:
+            health = self._get(name)
+            if health.state != OPEN:
+                return 0.0
+            return max(health.opened_at + health.cooldown - time.monotonic(), 0.0)
+
+    def record(self, name: str, outcome: str, latency: float) -> None:
+        """记录一次查询结果（outcome 取值见 OUTCOMES），并更新熔断状态。"""
+        now = time.monotonic()
+        with self._lock:
+            health = self._get(name)
+            health.calls.append((now, outcome, latency))
+            was_probe, health.probing = health.probing, False
+            if outcome == "ok":
+                health.consecutive_failures = 0
+                if health.state == HALF_OPEN:
+                    # 恢复后重新开始统计，避免窗口里残留的失败让它立即再次断开
+                    health.state = CLOSED
+                    health.cooldown = 0.0
+                    health.calls.clear()
+                    health.calls.append((now, outcome, latency))
+                return
+            health.consecutive_failures += 1
+            if was_probe or health.state == HALF_OPEN:
+                self._open(health, now, min(max(health.cooldown, self.base_cooldown) * 2, self.max_cooldown))
+                return
+            calls = health.recent(now)
+            failed = sum(outcome != "ok" for _, outcome, _ in calls)
+            if health.state == CLOSED and (
+                health.consecutive_failures >= self.failures
+                or (len(calls) >= self.min_calls and failed / len(calls) >= self.failure_rate)
+            ):
+                self._open(health, now, self.base_cooldown)
+
+    def release(self, name: str) -> None:
+        """查询被提前取消（凑够结果）：不计入统计，释放半开探测名额。"""
+        with self._lock:
+            self._get(name).probing = False
+
+    def _open(self, health: EngineHealth, now: float, cooldown: float) -> None:
+        health.state = OPEN
+        health.opened_at = now
+        health.cooldown = cooldown
+        health.times_opened += 1
+
+    def reset(self) -> None:
+        """清空所有引擎的统计与熔断状态。"""
+        with self._lock:
+            self._engines.clear()
+
+    def stats(self) -> dict:
+        """返回各引擎的熔断状态、健康分、窗口内成功率 / 延迟 / 被拦截次数（按健康分排序）。"""
+        now = time.monotonic()
+        with self._lock:
+            engines = []
+            for name, health in self._engines.items():
+                calls = health.recent(now)
+                latency = health.median_latency(now)
+                engines.append({
+                    "engine": name,
+                    "state": health.state,
+                    "score": round(self._score(health, now), 4),
+                    "calls": len(calls),
+                    "success_rate": round(health.success_rate(now), 4),
+                    "median_latency_ms": round(latency * 1e3, 1) if latency is not None else None,
+                    **{outcome: sum(o == outcome for _, o, _ in calls) for outcome in OUTCOMES[1:]},
+                    "consecutive_failures": health.consecutive_failures,
+                    "retry_in": round(max(health.opened_at + health.cooldown - now, 0.0), 1)
+                                if health.state == OPEN else 0.0,
+                    "times_opened": health.times_opened,
+                    "skipped": health.skipped,
+                })
+        engines.sort(key=lambda e: -e["score"])
+        return {
+            "engines": engines,
+            "failures": self.failures,
+            "failure_rate": self.failure_rate,
+            "cooldown": self.base_cooldown,
+            "max_cooldown": self.max_cooldown,
+        }
+
+
+# 进程级默认实例
+engine_health = EngineHealthRegistry(
+    window=SEARCH_BREAKER_WINDOW,
+    window_seconds=SEARCH_BREAKER_WINDOW_SECONDS,
+    failures=SEARCH_BREAKER_FAILURES,
+    failure_rate=SEARCH_BREAKER_FAILURE_RATE,
+    min_calls=SEARCH_BREAKER_MIN_CALLS,
+    cooldown=SEARCH_BREAKER_COOLDOWN,
+    max_cooldown=SEARCH_BREAKER_MAX_COOLDOWN,
+    latency_ref=SEARCH_BREAKER_LATENCY_REF,
+)
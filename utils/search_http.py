@@ -0,0 +1,101 @@
+"""Office AI Mate — 搜索引擎 HTTP 长连接会话
+
+为抓取搜索结果页维护两个进程级会话，由 FastAPI lifespan 启动与关闭：
+- curl_cffi AsyncSession（模拟 Chrome 指纹，已安装时）
+- httpx.AsyncClient（安装了 h2 时启用 HTTP/2）
+各引擎请求复用连接，避免每次都重新进行 TLS 握手。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib.util
+from typing import Any
+
+from config import SEARCH_HTTP_KEEPALIVE, SEARCH_HTTP_POOL_SIZE
+
+# curl_cffi 模拟的浏览器指纹
+IMPERSONATE = "chrome120"
+
+
+class SearchSessions:
+    """curl_cffi + httpx 长连接会话对。"""
+
+    def __init__(self, pool_size: int = 20, keepalive: float = 60):
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.http2 = False
+        self._curl: Any = None
+        self._httpx: Any = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.requests = {"curl_cffi": 0, "httpx": 0}
+
+    @property
+    def started(self) -> bool:
+        return self._loop is not None
+
+    async def start(self, deps: dict) -> None:
+        """按已解析的依赖创建会话（缺失的库对应会话为 None）。"""
+        self._loop = asyncio.get_running_loop()
+        if deps.get("AsyncSession"):
+            self._curl = deps["AsyncSession"](impersonate=IMPERSONATE, verify=False, max_clients=self.pool_size)
+        if deps.get("httpx"):
+            httpx = deps["httpx"]
+            self.http2 = importlib.util.find_spec("h2") is not None
+            self._httpx = httpx.AsyncClient(
+                verify=False,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.pool_size,
+                    max_keepalive_connections=self.pool_size,
+                    keepalive_expiry=self.keepalive,
+                ),
+            )
+
+    async def aclose(self) -> None:
+        """关闭会话。"""
+        curl, client = self._curl, self._httpx
+        self._curl = self._httpx = self._loop = None
+        if curl is not None:
+            await curl.close()
+        if client is not None:
+            await client.aclose()
+
+    def _usable(self) -> bool:
+        # 会话绑定启动时的事件循环；其他循环（脚本 / 测试）中返回 None，由调用方临时建连
+        if self._loop is None:
+            return False
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def curl(self) -> Any:
+        """返回 curl_cffi 会话；未启动、未安装或不在所属事件循环时返回 None。"""
+        if self._curl is None or not self._usable():
+            return None
+        self.requests["curl_cffi"] += 1
+        return self._curl
+
+    def httpx(self) -> Any:
+        """返回 httpx 客户端；未启动、未安装或不在所属事件循环时返回 None。"""
+        if self._httpx is None or not self._usable():
+            return None
+        self.requests["httpx"] += 1
+        return self._httpx
+
+    def stats(self) -> dict:
+        """返回会话状态与各会话处理的请求数。"""
+        return {
+            "started": self.started,
+            "curl_cffi": self._curl is not None,
+            "httpx": self._httpx is not None,
+            "http2": self.http2,
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "requests": dict(self.requests),
+        }
+
+
+# 进程级默认实例
+search_sessions = SearchSessions(pool_size=SEARCH_HTTP_POOL_SIZE, keepalive=SEARCH_HTTP_KEEPALIVE)
@@ -0,0 +1,136 @@
+"""Office AI Mate — 搜索结果页解析
+
+按引擎提供基于 lxml 的专用提取器：只定位结果容器（Bing 的 li.b_algo、百度 #content_left 下的结果块），
+不为整页构建 BeautifulSoup 树。专用提取器不可用（未安装 lxml）或没有解析出结果（页面改版）时，
+退回通用的 generic_parse。
+"""
+
+from __future__ import annotations
+
+from typing import Callable
+
+try:
+    from lxml import html as lxml_html
+except ImportError:  # pragma: no cover - lxml 是 python-pptx / pdf2docx 的依赖，通常已安装
+    lxml_html = None
+
+
+def _has_class(name: str) -> str:
+    """XPath 谓词：class 属性中包含完整的类名 name。"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def _text(nodes) -> str:
+    return " ".join(nodes[0].text_content().split()) if nodes else ""
+
+
+# --- Bing: <li class="b_algo"><h2><a href=...>title</a></h2><div class="b_caption"><p>snippet</p></div></li>
+_BING_ITEMS = f"//li[{_has_class('b_algo')}]"
+_BING_TITLE = "./h2/a[@href] | ./div/h2/a[@href]"
+_BING_SNIPPET = f".//div[{_has_class('b_caption')}]/p | .//p[{_has_class('b_lineclamp2')} or {_has_class('b_algoSlug')}]"
+
+
+def parse_bing(html: str) -> list[dict]:
+    found = []
+    for item in lxml_html.fromstring(html).xpath(_BING_ITEMS):
+        links = item.xpath(_BING_TITLE)
+        if not links:
+            continue
+        link = links[0].get("href", "")
+        title = _text(links)
+        if not title or not link.startswith("http"):
+            continue
+        found.append({"title": title, "href": link, "body": _text(item.xpath(_BING_SNIPPET))})
+    return found
+
+
+# --- Baidu: <div id="content_left"><div class="result c-container" mu=...><h3><a href=...>title</a></h3>
+#            <span class="content-right_xxx">snippet</span></div>
+_BAIDU_ITEMS = f"//div[@id='content_left']/div[{_has_class('result')} or {_has_class('c-container')}]"
+_BAIDU_TITLE = ".//h3/a[@href]"
+_BAIDU_SNIPPET = (
+    ".//span[starts-with(@class, 'content-right')] | .//div[starts-with(@class, 'content-right')]"
+    f" | .//div[{_has_class('c-abstract')}] | .//span[{_has_class('c-font-normal')}]"
+)
+
+
+def parse_baidu(html: str) -> list[dict]:
+    found = []
+    for item in lxml_html.fromstring(html).xpath(_BAIDU_ITEMS):
+        links = item.xpath(_BAIDU_TITLE)
+        if not links:
+            continue  # 推荐词、相关搜索等非结果块
+        link = links[0].get("href", "")
+        if link.startswith("/"):
+            link = "https://www.baidu.com" + link
+        title = _text(links)
+        if not title or not link.startswith("http"):
+            continue
+        found.append({"title": title, "href": link, "body": _text(item.xpath(_BAIDU_SNIPPET))})
+    return found
+
+
+# 引擎名 → 专用提取器
+EXTRACTORS: dict[str, Callable[[str], list[dict]]] = {
+    "Bing": parse_bing,
+    "Baidu": parse_baidu,
+}
+
+
+# --- Helper: Generic Parser ---
+def generic_parse(html: str, source_name: str, soup_cls) -> list[dict]:
+    soup = soup_cls(html, "html.parser")
+    found = []
+
+    # 1. Try Common Search Result Containers
+    # Baidu: .result, .c-container, .new-pmd
+    # Sogou: .vrwrap, .rb, .result
+    # 360: .res-list, .result
+    # Bing: .b_algo
+    potential_items = soup.select(".result, .c-result, .c-container, .vrwrap, .rb, .res-list, .b_algo, .lib-box, li")
+
+    for item in potential_items:
+        # Title is usually in h3 > a or h2 > a
+        title_tag = item.select_one("h3 a, h2 a, h3, h2")
+        if not title_tag: continue
+
+        # If title tag is h3/h2 itself, check if it has 'a' child, or text
+        if title_tag.name in ['h3', 'h2']:
+            if title_tag.find('a'):
+                title_tag = title_tag.find('a')
+            else:
+                # Sometimes the h3 itself is usable? No, usually needs a link.
+                continue
+
+        link = title_tag.get("href", "")
+        if not link or link.startswith("javascript") or link == "#": continue
+
+        title = title_tag.get_text(strip=True)
+        if not title: continue
+
+        # Body/Snippet
+        snippet_cat = item.select_one(".c-abstract, .text-layout, .res-desc, .b_caption p, .b_snippet, .content-right_8Zs40, .ft, p")
+        body = snippet_cat.get_text(strip=True) if snippet_cat else ""
+
+        # Fix Relative Links
+        if source_name == "Sogou" and link.startswith("/link"): link = "https://www.sogou.com" + link
+        if source_name == "Baidu" and link.startswith("/"): link = "https://www.baidu.com" + link
+
+        found.append({'title': title, 'href': link, 'body': body})
+
+    return found
+
+
+def parse_results(html: str, source_name: str, soup_cls) -> list[dict]:
+    """优先使用引擎专用提取器；不可用、出错或结果为空时退回 generic_parse。"""
+    extractor = EXTRACTORS.get(source_name)
+    if extractor is not None and lxml_html is not None:
+        try:
+            found = extractor(html)
+            if found:
+                return found
+        except Exception as e:
+            print(f"WARN: {source_name} extractor failed, falling back to generic parser: {e}")
+    if soup_cls is None:
+        return []
+    return generic_parse(html, source_name, soup_cls)
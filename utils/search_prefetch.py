@@ -0,0 +1,141 @@
+"""Office AI Mate — 搜索结果后台预取
+
+返回第 N 页后，在后台为同一查询预取接下来几页并写入搜索缓存，使“加载更多”直接命中缓存：
+- 低优先级：延迟启动，全局并发上限，两次预取请求之间保持最小间隔（对搜索引擎保持礼貌）
+- 缓存条目被淘汰或过期时取消对应的预取任务
+- 前台请求的页恰好正在预取时，等待该次预取完成而不重复请求引擎
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from utils.search_cache import SearchCache, search_cache
+from config import (
+    SEARCH_PREFETCH_CONCURRENCY, SEARCH_PREFETCH_DELAY, SEARCH_PREFETCH_INTERVAL, SEARCH_PREFETCH_PAGES,
+)
+
+# fetch(page) → 本次新增的结果（已写入缓存）
+PageFetcher = Callable[[int], Awaitable[list[dict]]]
+
+
+class SearchPrefetcher:
+    """按查询管理后台预取任务（每个查询同时最多一个）。"""
+
+    def __init__(self, cache: SearchCache, pages: int = 2, concurrency: int = 2,
+                 interval: float = 1.0, delay: float = 0.5):
+        self.cache = cache
+        self.pages = pages
+        self.interval = interval
+        self.delay = delay
+        self._concurrency = concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._last_fetch = 0.0
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._inflight: dict[str, tuple[int, asyncio.Future]] = {}  # 查询 → (正在预取的页, 完成信号)
+        self.scheduled = self.completed = self.cancelled = self.pages_fetched = 0
+        cache.on_evict.append(self.cancel)
+
+    def schedule(self, key: str, page_size: int, next_page: int, fetch: PageFetcher) -> bool:
+        """为 key 预取 next_page 起的 pages 页；已有任务或无需预取时返回 False。"""
+        if self.pages <= 0 or key in self._tasks:
+            return False
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        task = asyncio.get_running_loop().create_task(self._run(key, page_size, next_page, fetch))
+        self._tasks[key] = task
+        self.scheduled += 1
+        return True
+
+    async def _run(self, key: str, page_size: int, next_page: int, fetch: PageFetcher) -> None:
+        try:
+            await asyncio.sleep(self.delay)  # 让出前台请求
+            for page in range(next_page, next_page + self.pages):
+                cached = self.cache.peek(key)
+                if cached is None:
+                    return  # 已淘汰 / 过期
+                if len(cached) >= page * page_size:
+                    continue  # 该页已在缓存中
+                async with self._semaphore:
+                    wait = self._last_fetch + self.interval - time.monotonic()
+                    if wait > 0:
+                        await asyncio.sleep(wait)
+                    self._last_fetch = time.monotonic()
+                    done = asyncio.get_running_loop().create_future()
+                    self._inflight[key] = (page, done)
+                    try:
+                        added = await fetch(page)
+                    finally:
+                        self._inflight.pop(key, None)
+                        done.set_result(None)
+                self.pages_fetched += 1
+                if not added:
+                    break  # 引擎没有更多结果
+            self.completed += 1
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            print(f"WARN: Search prefetch for '{key}' failed: {e}")
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+
+    async def wait_for_page(self, key: str, page: int, timeout: float) -> bool:
+        """若 key 的第 page 页正在预取，等待其完成（最多 timeout 秒）；返回是否等待过。"""
+        inflight = self._inflight.get(key)
+        if inflight is None or inflight[0] != page:
+            return False
+        try:
+            await asyncio.wait_for(asyncio.shield(inflight[1]), timeout)
+        except asyncio.TimeoutError:
+            pass
+        return True
+
+    def cancel(self, key: str) -> None:
+        """取消 key 的预取任务（缓存淘汰时回调，可能来自任意线程：取消交给任务所属的事件循环执行）。"""
+        task = self._tasks.get(key)
+        if task is None:
+            return
+        try:
+            task.get_loop().call_soon_threadsafe(self._cancel, key, task)
+        except RuntimeError:  # 事件循环已关闭，任务不会再运行
+            self._tasks.pop(key, None)
+
+    def _cancel(self, key: str, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        task.cancel()
+
+    async def aclose(self) -> None:
+        """取消全部预取任务（应用关闭时调用）。"""
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._semaphore = None
+
+    def stats(self) -> dict:
+        """返回预取任务计数与当前进行中的查询数。"""
+        return {
+            "active": len(self._tasks),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "pages_fetched": self.pages_fetched,
+            "pages_ahead": self.pages,
+            "interval": self.interval,
+        }
+
+
+# 进程级默认实例
+search_prefetcher = SearchPrefetcher(
+    search_cache,
+    pages=SEARCH_PREFETCH_PAGES,
+    concurrency=SEARCH_PREFETCH_CONCURRENCY,
+    interval=SEARCH_PREFETCH_INTERVAL,
+    delay=SEARCH_PREFETCH_DELAY,
+)
@@ -0,0 +1,136 @@
+"""Office AI Mate — 搜索查询规范化
+
+搜索缓存以规范化后的查询为键，写法不同的同一查询共用一份结果：
+- Unicode NFKC（全角转半角）、大小写折叠、空白折叠（中日韩文字两侧的空格去掉，其余连续空白合并为一个）
+- 繁体转简体：安装了 opencc 时使用 opencc，否则使用内置的常用字对照表
+- 近似查询（可选）：按顺序切分为词（拉丁字母 / 数字串、单个汉字），去掉停用词与标点、英文复数还原为单数后，
+  词序列完全相同才视为同一查询。词序或任何实词不同（install / uninstall、int to string / string to int、
+  dict / list）都不会命中
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+
+try:
+    import opencc
+except ImportError:  # opencc 为可选依赖，未安装时使用内置对照表
+    opencc = None
+
+# 常用繁体字 → 简体字（每项两个字符：繁 + 简）
+_T2S_PAIRS = """
+們们 個个 來来 時时 為为 說说 國国 後后 會会 對对 這这 學学 麼么 發发 當当 還还 過过 從从 動动 種种
+開开 問问 題题 機机 關关 點点 經经 與与 現现 實实 見见 長长 東东 門门 電电 話话 氣气 車车 書书 業业
+產产 號号 體体 區区 軍军 師师 員员 頭头 聽听 寫写 讀读 語语 認认 識识 應应 該该 計计 劃划 處处 務务
+總总 統统 級级 網网 絡络 銷销 價价 錢钱 買买 賣卖 萬万 億亿 歲岁 歷历 際际 陸陆 島岛 廣广 場场 聯联
+繫系 係系 環环 響响 韓韩 華华 準准 備备 導导 傳传 據据 報报 紙纸 記记 錄录 藝艺 術术 圖图 館馆 運运
+營营 權权 標标 誌志 質质 優优 勢势 藥药 醫医 療疗 臺台 灣湾 廳厅 漢汉 條条 樣样 間间 無无 將将 愛爱
+讓让 給给 嗎吗 聲声 歡欢 樂乐 腦脑 筆笔 視视 頻频 戲戏 遊游 雲云 數数 庫库 碼码 軟软 設设 層层 鍵键
+盤盘 鐘钟 錶表 飛飞 鐵铁 線线 飯饭 麵面 雞鸡 魚鱼 鳥鸟 馬马 龍龙 貓猫 豬猪 風风 陽阳 陰阴 熱热 溫温
+濕湿 乾干 淨净 髮发 顏颜 紅红 綠绿 藍蓝 黃黄 銀银 銅铜 錯错 難难 簡简 單单 複复 雜杂 試试 驗验 練练
+習习 課课 講讲 評评 論论 議议 請请 謝谢 訊讯 詢询 調调 資资 費费 購购 貨货 幣币 稅税 貸贷 險险 證证
+職职 農农 廠厂 礦矿 壓压 塊块 鏈链 舊旧 親亲 夢梦 詞词 劇剧 攝摄 輸输 贏赢 敗败 勝胜 戰战 爭争 隊队
+賽赛 籃篮 邊边 遠远 進进 達达 遲迟 選选 擇择 規规 範范 則则 歸归 檔档 審审 測测 繪绘 畫画 紀纪 節节
+慶庆 禮礼 餘余 鬆松 緊紧 貴贵 寶宝 麗丽 醜丑 強强 彎弯 滿满 兩两 雙双 幾几 隻只 張张 裡里 裏里 於于
+並并 衛卫 護护 戶户 帳账 賬账 釋释 譯译 韻韵 辭辞 彙汇 匯汇 類类 獨独 專专 縣县 鄉乡 鎮镇 軌轨 輛辆
+駕驾 駛驶 態态 狀状 況况 顯显 較较 轉转 換换 變变 靜静 聞闻 覺觉 觀观 啟启 閉闭 闆板 貼贴 樓楼 燈灯
+燒烧 煙烟 爐炉 災灾 擊击 壞坏 齡龄 嬰婴 兒儿 孫孙 婦妇 媽妈 爺爷 傷伤 瘋疯 診诊 斷断 臟脏 腸肠 膽胆
+檢检 儀仪 構构 築筑 蓋盖 牆墙 鋼钢 針针 鍋锅 餅饼 飲饮 湯汤 鹽盐 醬酱 漿浆 蘋苹 葉叶 樹树 園园 蘭兰
+蓮莲 團团 黨党 憲宪 舉举 義义 歐欧 亞亚 倫伦 紐纽 約约 滬沪 蘇苏 遼辽 寧宁 陝陕 閩闽 麥麦 壽寿 顧顾
+嚴严 擴扩 詳详 細细 紹绍 維维 閱阅 驅驱 週周 預预
+""".split()
+_T2S = str.maketrans({pair[0]: pair[1] for pair in _T2S_PAIRS})
+
+# 中日韩文字（汉字、假名、谚文）：与相邻字符之间的空格不影响语义
+_CJK = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+# 近似匹配的词：拉丁字母 / 数字串，或单个中日韩字符（先在其两侧插入空格）；标点、符号忽略
+_WORD = re.compile(r"[^\W_]+")
+# 不改变查询含义的虚词（不含 to / from / vs 等表示方向、对比的词）
+_STOPWORDS = frozenset("""
+a an the of in on at for is are be do does how what which please
+的 吗 呢 啊 吧
+""".split())
+
+
+_converter = None
+
+
+def to_simplified(text: str) -> str:
+    """繁体转简体（优先 opencc，其次内置对照表）。"""
+    global _converter
+    if opencc is None:
+        return text.translate(_T2S)
+    if _converter is None:
+        _converter = opencc.OpenCC("t2s")
+    return _converter.convert(text)
+
+
+def canonical_query(query: str) -> str:
+    """查询的规范形式：NFKC、大小写折叠、繁转简、空白折叠。"""
+    text = to_simplified(unicodedata.normalize("NFKC", query).casefold())
+    tokens = text.split()
+    if not tokens:
+        return ""
+    parts = [tokens[0]]
+    for token in tokens[1:]:
+        if not (_CJK.match(parts[-1][-1]) or _CJK.match(token[0])):
+            parts.append(" ")
+        parts.append(token)
+    return "".join(parts)
+
+
+def _singular(word: str) -> str:
+    # 只处理规则的英文复数；两侧按同一规则还原，偶有误差也不会让不同的词相等
+    if len(word) <= 3 or not word.isascii() or not word.isalpha():
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def query_signature(key: str) -> tuple[str, ...]:
+    """近似匹配用的查询签名：有序的词序列（去停用词、复数还原）；key 需已规范化。"""
+    tokens = _WORD.findall(_CJK.sub(r" \g<0> ", key))
+    return tuple(_singular(token) for token in tokens if token not in _STOPWORDS)
+
+
+class QueryIndex:
+    """已缓存查询的签名索引，用于找出与新查询仅差停用词、标点或单复数的查询（键需已规范化）。"""
+
+    def __init__(self):
+        self._signatures: dict[str, tuple[str, ...]] = {}
+        self._keys: dict[tuple[str, ...], set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: str) -> None:
+        signature = query_signature(key)
+        if key in self._signatures or not signature:
+            return
+        self._signatures[key] = signature
+        self._keys.setdefault(signature, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        keys = self._keys[signature]
+        keys.discard(key)
+        if not keys:
+            del self._keys[signature]
+
+    def find(self, key: str) -> str | None:
+        """返回签名相同的已索引查询（不含 key 本身）；没有则返回 None。"""
+        signature = query_signature(key)
+        candidates = self._keys.get(signature, set()) - {key} if signature else set()
+        return min(candidates, default=None)
+
+    def clear(self) -> None:
+        self._signatures.clear()
+        self._keys.clear()
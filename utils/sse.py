@@ -0,0 +1,96 @@
+"""Office AI Mate — Server-Sent Events 流式输出
+
+把 LLM 的细碎文本增量按时间 / 大小窗口合并为 SSE 帧：
+- 事件类型：delta（文本）、usage（统计）、error（错误）、done（结束）
+- 空闲时发送注释行心跳，防止代理断开长连接
+- 上游与输出之间使用有界队列：客户端读取变慢时上游读取随之暂停（背压）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, AsyncIterator
+
+from config import SSE_COALESCE_MAX_BYTES, SSE_COALESCE_WINDOW, SSE_PING_INTERVAL, SSE_QUEUE_SIZE
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # 关闭 Nginx 等反向代理的响应缓冲
+}
+
+_END = object()
+
+
+def format_event(event: str, data: Any) -> str:
+    """编码单个 SSE 事件。"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def sse_stream(
+    chunks: AsyncIterator[str],
+    usage: dict | None = None,
+    window: float = SSE_COALESCE_WINDOW,
+    max_bytes: int = SSE_COALESCE_MAX_BYTES,
+    ping_interval: float = SSE_PING_INTERVAL,
+    queue_size: int = SSE_QUEUE_SIZE,
+) -> AsyncIterator[str]:
+    """将文本分块转换为合并后的 SSE 事件流。"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    stats = {"chunks": 0, "frames": 0, "chars": 0}
+
+    async def pump() -> None:
+        try:
+            async for chunk in chunks:
+                await queue.put(chunk)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            # 客户端断开时关闭上游流（取消请求、归还限流槽位）
+            aclose = getattr(chunks, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    producer = asyncio.ensure_future(pump())
+    buffer: list[str] = []
+    size = 0
+    deadline = 0.0
+
+    def flush() -> str:
+        nonlocal size
+        text = "".join(buffer)
+        buffer.clear()
+        size = 0
+        stats["frames"] += 1
+        return format_event("delta", {"text": text})
+
+    try:
+        while True:
+            timeout = max(deadline - loop.time(), 0) if buffer else ping_interval
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout)
+            except asyncio.TimeoutError:
+                yield flush() if buffer else ": ping\n\n"
+                continue
+
+            if item is _END or isinstance(item, Exception):
+                if buffer:
+                    yield flush()
+                if isinstance(item, Exception):
+                    yield format_event("error", {"message": str(item), "type": type(item).__name__})
+                yield format_event("usage", {**stats, **(usage or {})})
+                yield format_event("done", {"ok": item is _END})
+                return
+
+            if not buffer:
+                deadline = loop.time() + window
+            buffer.append(item)
+            size += len(item.encode("utf-8"))
+            stats["chunks"] += 1
+            stats["chars"] += len(item)
+            if size >= max_bytes:
+                yield flush()
+    finally:
+        producer.cancel()
@@ -0,0 +1,369 @@
+"""Office AI Mate — 联网搜索
+
+同时查询 DuckDuckGo / Bing / 百度，在请求截止时间内按到达顺序合并并排序结果；
+凑够所需条数即返回，取消仍在进行的引擎请求。
+DuckDuckGo 库是同步阻塞的，在专用的有界线程池中运行，不占用事件循环。
+第三方依赖只在首次使用时导入一次；结果页通过 search_http 的长连接会话抓取。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import importlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable
+
+from utils.search_http import IMPERSONATE, search_sessions
+from utils.search_parsers import generic_parse, parse_results  # noqa: F401 (generic_parse re-exported)
+from utils.search_dedupe import Deduper
+from utils.search_health import engine_health
+from config import (
+    SEARCH_DDG_BACKEND_TIMEOUT, SEARCH_DDG_WORKERS, SEARCH_DEADLINE, SEARCH_ENGINE_WEIGHTS, SEARCH_NEAR_DUPLICATES,
+)
+
+# Random User-Agent Pool (High Quality Real UAs)
+USER_AGENTS_POOL = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:123.0) Gecko/20100101 Firefox/123.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+]
+
+# Base Headers
+BASE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate, br",
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "User-Agent": USER_AGENTS_POOL[0]  # Ensure a default UA is present
+}
+
+
+class SearchEngineError(Exception):
+    """单个引擎没有返回可用结果（被拦截、解析为空、无响应）。"""
+
+
+class EngineBlockedError(SearchEngineError):
+    """引擎返回了验证码 / 拦截页而不是结果页。"""
+
+
+# deps 键 → (模块, 属性, pip 包名, 是否必需)；curl_cffi 缺失时退回 httpx
+_DEPENDENCIES = {
+    "httpx": ("httpx", None, "httpx", True),
+    "BeautifulSoup": ("bs4", "BeautifulSoup", "beautifulsoup4", True),
+    "DDGS": ("duckduckgo_search", "DDGS", "duckduckgo-search", True),
+    "AsyncSession": ("curl_cffi.requests", "AsyncSession", "curl_cffi", False),
+}
+
+_resolved: tuple[dict[str, Any], list[str]] | None = None
+
+
+def resolve_dependencies() -> tuple[dict[str, Any], list[str]]:
+    """导入搜索所需的第三方库（仅首次调用时导入，之后直接返回缓存）。返回 (依赖, 缺失提示)。
+
+    不在请求中安装依赖：缺失的库对应值为 None，依赖它的引擎被跳过。
+    """
+    global _resolved
+    if _resolved is None:
+        deps: dict[str, Any] = {}
+        errors: list[str] = []
+        for key, (module, attr, package, required) in _DEPENDENCIES.items():
+            try:
+                imported = importlib.import_module(module)
+                deps[key] = getattr(imported, attr) if attr else imported
+            except ImportError:
+                deps[key] = None
+                if required:
+                    errors.append(f"Missing dependency: {package} (pip install {package})")
+                print(f"WARN: Search dependency '{package}' is not installed")
+        _resolved = (deps, errors)
+    deps, errors = _resolved
+    return deps, list(errors)
+
+
+async def _fetch_html(deps: dict, url: str, params: dict, headers: dict, timeout: float, errors: list[str], name: str) -> str:
+    """优先使用 curl_cffi（浏览器指纹），失败时退回 httpx；会话已启动时复用长连接。"""
+    resp_text = ""
+    if deps["AsyncSession"]:
+        try:
+            session = search_sessions.curl()
+            if session is not None:
+                resp = await session.get(url, params=params, headers=headers, timeout=timeout)
+            else:
+                async with deps["AsyncSession"](impersonate=IMPERSONATE, verify=False, timeout=timeout) as session:
+                    resp = await session.get(url, params=params, headers=headers)
+            resp_text = resp.text
+        except Exception as cf_e:
+            errors.append(f"{name} (curl_cffi error): {str(cf_e)}")
+
+    if not resp_text and deps["httpx"]:
+        headers = {**headers, "User-Agent": random.choice(USER_AGENTS_POOL)}
+        client = search_sessions.httpx()
+        if client is not None:
+            resp = await client.get(url, params=params, headers=headers, timeout=timeout)
+        else:
+            async with deps["httpx"].AsyncClient(timeout=timeout, verify=False) as client:
+                resp = await client.get(url, params=params, headers=headers)
+        resp_text = resp.text
+    return resp_text
+
+
+_ddg_pool: ThreadPoolExecutor | None = None
+_ddg_pool_lock = threading.Lock()
+
+
+def ddg_pool() -> ThreadPoolExecutor:
+    """DuckDuckGo 查询专用线程池（按需创建）；并发查询超出线程数时排队，不会占满默认线程池。"""
+    global _ddg_pool
+    with _ddg_pool_lock:
+        if _ddg_pool is None:
+            _ddg_pool = ThreadPoolExecutor(max_workers=SEARCH_DDG_WORKERS, thread_name_prefix="ddg")
+        return _ddg_pool
+
+
+def shutdown_ddg_pool() -> None:
+    """关闭线程池，丢弃尚未开始的查询（应用关闭时调用）。"""
+    global _ddg_pool
+    with _ddg_pool_lock:
+        pool, _ddg_pool = _ddg_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def search_ddg(deps: dict, query: str, page: int, max_results: int, needed: int,
+                     backend_timeout: float = SEARCH_DDG_BACKEND_TIMEOUT) -> list[dict]:
+    """DuckDuckGo：依次尝试 api / html / lite 后端，跳过前几页已返回的条目。
+
+    每个后端在线程池中运行并受 backend_timeout 限制；协程被取消时，尚未开始的查询不再执行，
+    已在运行的线程由 DDGS 自身的网络超时兜底结束。
+    """
+    start_index = (page - 1) * max_results
+    failures = []
+    loop = asyncio.get_running_loop()
+    for backend in ['api', 'html', 'lite']:
+        print(f"INFO: Trying DuckDuckGo (Backend: {backend}) for '{query}' (Need {needed})...")
+
+        def lookup(backend=backend):
+            with deps["DDGS"](timeout=backend_timeout) as ddgs:
+                return ddgs.text(
+                    query,
+                    region='wt-wt',
+                    safesearch='moderate',
+                    timelimit='y',
+                    max_results=needed,
+                    backend=backend
+                )
+
+        try:
+            ddgs_results = await asyncio.wait_for(loop.run_in_executor(ddg_pool(), lookup), backend_timeout)
+        except asyncio.TimeoutError:
+            print(f"WARN: DuckDuckGo ({backend}) timed out after {backend_timeout}s")
+            failures.append(f"DDG-{backend}: timeout after {backend_timeout}s")
+            continue
+        except Exception as ddg_e:
+            print(f"WARN: DuckDuckGo ({backend}) failed: {ddg_e}")
+            failures.append(f"DDG-{backend}: {str(ddg_e)}")
+            continue
+
+        items = [
+            {"title": r.get('title', ''), "href": r.get('href', ''), "body": r.get('body', '')}
+            for r in ddgs_results or [] if r.get('href')
+        ][start_index:]
+        if items:
+            print(f"INFO: DuckDuckGo ({backend}) success. Found {len(items)} items.")
+            return items
+        failures.append(f"DDG-{backend}: No results")
+    raise SearchEngineError("; ".join(failures))
+
+
+async def search_bing(deps: dict, query: str, page: int, max_results: int, needed: int) -> list[dict]:
+    errors: list[str] = []
+    first = (page - 1) * 10 + 1
+    params = {"q": query, "first": first, "count": 10, "setmkt": "en-US"}
+    resp_text = await _fetch_html(deps, "https://www.bing.com/search", params, BASE_HEADERS.copy(), 15, errors, "Bing")
+    if not resp_text:
+        raise SearchEngineError("; ".join(errors + ["No response text"]))
+    items = parse_results(resp_text, "Bing", deps["BeautifulSoup"])
+    if not items:
+        raise SearchEngineError(f"No results (Len: {len(resp_text)})")
+    return items
+
+
+async def search_baidu(deps: dict, query: str, page: int, max_results: int, needed: int) -> list[dict]:
+    errors: list[str] = []
+    params: dict[str, Any] = {"wd": query}
+    headers = {**BASE_HEADERS, "Host": "www.baidu.com"}
+    if page > 1: params["pn"] = (page - 1) * 10
+    resp_text = await _fetch_html(deps, "https://www.baidu.com/s", params, headers, 10, errors, "Baidu")
+
+    if len(resp_text) > 2000:
+        items = parse_results(resp_text, "Baidu", deps["BeautifulSoup"])
+        if not items:
+            raise SearchEngineError(f"Parsed 0 items (Len: {len(resp_text)})")
+        return items
+    if resp_text:
+        snippet = resp_text[:100].replace("\n", " ")
+        raise EngineBlockedError(f"Blocked (Len: {len(resp_text)}, Content: {snippet}...)")
+    raise SearchEngineError("; ".join(errors + ["No response text"]))
+
+
+EngineFn = Callable[[dict, str, int, int, int], Awaitable[list[dict]]]
+
+# 引擎名 → (查询函数, 所需依赖)
+ENGINES: dict[str, tuple[EngineFn, str]] = {
+    "DuckDuckGo": (search_ddg, "DDGS"),
+    "Bing": (search_bing, "BeautifulSoup"),
+    "Baidu": (search_baidu, "BeautifulSoup"),
+}
+
+
+class ResultMerger:
+    """合并多个引擎的结果：按规范化 URL / 标题哈希去重并折叠近似重复，倒数排名融合（RRF）打分排序。
+
+    重复结果不再单独出现，其得分累加到首次出现的结果上（多个引擎都返回的结果排名更靠前）。
+    """
+
+    RRF_K = 60
+
+    def __init__(self, exclude: Iterable[dict] = (), near_duplicates: bool = SEARCH_NEAR_DUPLICATES):
+        self.dedupe = Deduper(near_duplicates=near_duplicates)
+        self.items: dict[str, dict] = {}  # 去重键 → item（保持到达顺序）
+        self.scores: dict[str, float] = {}
+        self._excluded: set[str] = set()
+        for r in exclude:
+            # Cached results were deduplicated when they were merged; only index them
+            sig = self.dedupe.signature(r['title'], r['href'], r.get('body', ''))
+            self.dedupe.add(sig.url, sig)
+            self._excluded.add(sig.url)
+
+    def add(self, engine: str, items: list[dict]) -> list[dict]:
+        """合并一个引擎的结果，返回其中新出现（未与已有结果重复）的条目。"""
+        weight = SEARCH_ENGINE_WEIGHTS.get(engine, 1.0)
+        added = []
+        for rank, r in enumerate(items):
+            title, href = (r.get('title') or '').strip(), (r.get('href') or '').strip()
+            # Filter relative links that accidentally got through
+            if not href.startswith("http"): continue
+            body = (r.get('body') or '').strip()
+            score = weight / (self.RRF_K + rank + 1)
+
+            sig = self.dedupe.signature(title, href, body)
+            existing = self.dedupe.match(sig)
+            if existing in self._excluded:
+                continue  # already returned on an earlier page
+            if existing is not None:
+                self.scores[existing] += score
+                continue
+
+            self.items[sig.url] = {"title": title, "href": href, "body": body, "source": engine}
+            self.scores[sig.url] = score
+            self.dedupe.add(sig.url, sig)
+            added.append(self.items[sig.url])
+        return added
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def ranked(self) -> list[dict]:
+        order = {key: i for i, key in enumerate(self.items)}
+        return [self.items[key] for key in sorted(self.items, key=lambda key: (-self.scores[key], order[key]))]
+
+
+async def _tracked(name: str, run: Awaitable[list[dict]]) -> list[dict]:
+    """运行一个引擎查询并把结果与耗时记入健康度统计。"""
+    start = time.monotonic()
+    try:
+        items = await run
+    except asyncio.CancelledError:
+        engine_health.release(name)  # 凑够结果后被取消；截止时间到期的超时由 stream_search 记录
+        raise
+    except EngineBlockedError:
+        engine_health.record(name, "blocked", time.monotonic() - start)
+        raise
+    except Exception:
+        engine_health.record(name, "error", time.monotonic() - start)
+        raise
+    engine_health.record(name, "ok", time.monotonic() - start)
+    return items
+
+
+async def stream_search(
+    deps: dict,
+    query: str,
+    page: int,
+    max_results: int,
+    needed: int,
+    merger: ResultMerger,
+    errors: list[str],
+    deadline: float = SEARCH_DEADLINE,
+) -> AsyncIterator[tuple[str, list[dict], str | None]]:
+    """并发查询所有可用引擎，每个引擎结束时产出 (引擎名, 新增的去重结果, 错误信息)。
+
+    结果合并进调用方持有的 merger，错误同时追加到 errors；凑够 max_results 条或到达截止时间即停止，
+    取消仍在进行的引擎请求（生成器被提前关闭时同样取消）。
+    引擎按健康分从高到低启动；熔断中的引擎直接跳过。所有引擎都在熔断时，立即探测最快恢复的一个。
+    """
+    available = engine_health.order([name for name, (fn, requires) in ENGINES.items() if deps.get(requires)])
+    allowed = [name for name in available if engine_health.allow(name)]
+    skipped = [name for name in available if name not in allowed]
+    if not allowed and skipped:
+        soonest = min(skipped, key=engine_health.retry_in)
+        if engine_health.allow(soonest, force=True):
+            allowed, skipped = [soonest], [name for name in skipped if name != soonest]
+    for name in skipped:
+        errors.append(f"{name}: skipped (circuit open, retry in {engine_health.retry_in(name):.0f}s)")
+
+    tasks = {
+        asyncio.ensure_future(_tracked(name, ENGINES[name][0](deps, query, page, max_results, needed))): name
+        for name in allowed
+    }
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=max(end - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                errors.append(f"Deadline: {', '.join(tasks[t] for t in pending)} not finished after {deadline}s")
+                for task in pending:
+                    engine_health.record(tasks[task], "timeout", deadline)
+                break
+            for task in done:
+                try:
+                    added, error = merger.add(tasks[task], task.result()), None
+                except Exception as e:
+                    added, error = [], str(e)
+                    errors.append(f"{tasks[task]}: {error}")
+                yield tasks[task], added, error
+            if len(merger) >= max_results:
+                break
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def fan_out_search(
+    deps: dict,
+    query: str,
+    page: int,
+    max_results: int,
+    needed: int,
+    exclude: Iterable[dict] = (),
+    deadline: float = SEARCH_DEADLINE,
+    near_duplicates: bool = SEARCH_NEAR_DUPLICATES,
+) -> tuple[list[dict], list[str]]:
+    """并发查询所有可用引擎；凑够 max_results 条或到达截止时间即返回 (排序后的结果, 错误信息)。"""
+    merger = ResultMerger(exclude, near_duplicates=near_duplicates)
+    errors: list[str] = []
+    async for _ in stream_search(deps, query, page, max_results, needed, merger, errors, deadline):
+        pass
+    return merger.ranked(), errors